@@ -1,12 +1,64 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from typing import List
-import os
 from datetime import datetime
+from pathlib import Path
+import mimetypes
+import cv2
+from config import MEDIA_STORE_DIR, REFERENCE_CATALOG_DB, LEGACY_REFERENCES_DIR
+from utils.media_store import MediaStore
+from utils.catalog import ReferenceCatalog
 
 router = APIRouter()
+media_store = MediaStore(MEDIA_STORE_DIR / "references")
+catalog = ReferenceCatalog(REFERENCE_CATALOG_DB)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def _image_size(digest: str) -> tuple:
+    """解析图像尺寸 (宽, 高)，不是图像时返回 (None, None)"""
+    image = cv2.imread(str(media_store.path(digest)), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None, None
+    return image.shape[1], image.shape[0]
+
+def backfill_catalog(legacy_dir: Path = LEGACY_REFERENCES_DIR) -> int:
+    """
+    一次性登记元数据目录建立之前已有的参考文件（应用启动时在后台执行）：
+    旧版 references/ 目录中的文件（导入媒体存储，上传时间取文件名中的时间戳）
+    和媒体存储中尚未登记的对象。
+    持进程间锁执行，多个工作进程同时启动时只有一个导入；全部登记完成后才写入 user_version，
+    中途失败下次启动重新导入（登记按哈希去重，可重复执行）。
+    
+    Returns:
+        新登记的文件数
+    """
+    if not catalog.needs_backfill:
+        return 0
+    with catalog.backfill_lock():
+        if not catalog.needs_backfill:  # 其他工作进程已完成导入
+            return 0
+        before = catalog.count()
+        if legacy_dir.is_dir():
+            for path in sorted(p for p in legacy_dir.iterdir() if p.is_file()):
+                with open(path, "rb") as f:
+                    digest, size, _ = media_store.put_stream(iter(lambda: f.read(media_store.chunk_size), b""))
+                stamp, _, name = path.name.partition("_")
+                try:
+                    uploaded_at = datetime.strptime(stamp, "%Y%m%d%H%M%S").timestamp()
+                except ValueError:
+                    name, uploaded_at = path.name, path.stat().st_mtime
+                catalog.add(digest, name, size, *_image_size(digest), content_type=mimetypes.guess_type(name)[0],
+                            uploaded_at=uploaded_at)
+        for digest, path in media_store.iter_objects():
+            if catalog.get(digest) is None:
+                stat = path.stat()
+                catalog.add(digest, digest, stat.st_size, *_image_size(digest), uploaded_at=stat.st_mtime)
+        catalog.mark_backfilled()
+        imported = catalog.count() - before
+    if imported:
+        print(f"✅ 参考文件元数据目录已导入 {imported} 个已有文件")
+    return imported
+
 # 模拟用户验证
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     if token != "admin_token":
@@ -16,40 +68,43 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 @router.post("/upload-reference")
 async def upload_reference_file(
     file: UploadFile = File(...),
+    tags: str = None,
     user: dict = Depends(get_current_user)
 ):
-    """上传参考文件接口"""
-    upload_dir = "references"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    filepath = os.path.join(upload_dir, filename)
+    """上传参考文件接口（按内容SHA-256去重存储，tags为逗号分隔的标签）"""
+    digest, size, created = await media_store.save_upload(file)
     
-    with open(filepath, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # 图像尺寸只在上传时解析一次，写入元数据目录
+    width = height = None
+    if created or catalog.get(digest) is None:
+        width, height = _image_size(digest)
+    record = catalog.add(digest, file.filename, size, width, height,
+                         content_type=file.content_type, uploaded_by=user["username"],
+                         tags=tags.split(",") if tags else ())
     
     return {
         "status": "success",
-        "filepath": filepath,
-        "filename": filename
+        "duplicate": not created,
+        "filepath": str(media_store.path(digest)),
+        **record
     }
 
 @router.get("/list-references")
-async def list_reference_files(user: dict = Depends(get_current_user)):
-    """列出所有参考文件"""
-    ref_dir = "references"
-    if not os.path.exists(ref_dir):
-        return []
-    
-    files = []
-    for filename in os.listdir(ref_dir):
-        path = os.path.join(ref_dir, filename)
-        files.append({
-            "filename": filename,
-            "path": path,
-            "size": os.path.getsize(path)
-        })
-    
-    return files
\ No newline at end of file
+async def list_reference_files(
+    cursor: str = None,
+    limit: int = 50,
+    sort: str = "uploaded_at",
+    order: str = "desc",
+    tag: str = None,
+    filename: str = None,
+    content_type: str = None,
+    min_size: int = None,
+    max_size: int = None,
+    user: dict = Depends(get_current_user)
+):
+    """分页列出参考文件（只查询元数据目录，next_cursor为空表示已到最后一页）"""
+    try:
+        return catalog.list(cursor, limit, sort, order, tag=tag, filename=filename,
+                            content_type=content_type, min_size=min_size, max_size=max_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,29 +1,92 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, HTTPException
 from models.cleanliness_scorer import CleanlinessScorer
-from models.tooth_detection import ToothDetector
+from models.tooth_detection import ToothDetector, TraditionalToothDetector
 import cv2
-import numpy as np
 from typing import Dict
 from schemas.cleanliness import CleanlinessResponse
+from functools import partial
+from config import (WARMUP_SHAPES, MEDIA_STORE_DIR, ENSEMBLE_ENABLED, ENSEMBLE_MEMBERS, ENSEMBLE_IOU_THRESHOLD,
+                    ENSEMBLE_SKIP_THRESHOLD, ENSEMBLE_MIN_VOTES, TOOTH_DETECTION_CONF)
+from utils.warmup import warmup_manager
+from utils.media_store import MediaStore
+from utils.scheduler import inference_scheduler
+from utils.ensemble import EnsembleDetector
 
 router = APIRouter()
+media_store = MediaStore(MEDIA_STORE_DIR / "uploads")
 scorer = CleanlinessScorer()
 detector = ToothDetector()
+warmup_manager.register("cleanliness_detector", lambda: detector.warmup(WARMUP_SHAPES))
+warmup_manager.register("cleanliness_scorer", lambda: scorer.warmup(WARMUP_SHAPES))
+
+def _ensemble_member(options: Dict):
+    """构建集成成员的检测函数（每个成员独立的模型副本，模型文件相同、输入尺寸不同的成员可并行推理）"""
+    if options["model"] is None:
+        return TraditionalToothDetector().detect
+    return partial(ToothDetector(options["model"]).detect, imgsz=options.get("imgsz"))
+
+ensemble = None
+if ENSEMBLE_ENABLED:
+    ensemble = EnsembleDetector(
+        [(options["name"], _ensemble_member(options), options.get("weight", 1.0)) for options in ENSEMBLE_MEMBERS],
+        inference_scheduler, "interactive", ENSEMBLE_IOU_THRESHOLD, ENSEMBLE_SKIP_THRESHOLD,
+        TOOTH_DETECTION_CONF, ENSEMBLE_MIN_VOTES
+    )
+    # 推理槽少于成员数时成员会排队串行执行，集成延迟变为各成员延迟之和
+    inference_scheduler.require_slots(len(ENSEMBLE_MEMBERS))
 
 @router.post("/score-cleanliness", response_model=CleanlinessResponse)
-async def score_cleanliness(file: UploadFile = File(...)) -> Dict:
-    """牙齿清洁度评分API"""
-    contents = await file.read()
-    image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+async def score_cleanliness(file: UploadFile = File(...), ensemble_mode: bool = False) -> Dict:
+    """
+    牙齿清洁度评分API
     
-    # 1. 检测牙齿区域
-    teeth_regions = detector.detect(image)
+    Args:
+        ensemble_mode: 使用多模型并行集成检测（加权框融合，精度优先，见 ENSEMBLE_MEMBERS）
+    """
+    if ensemble_mode and ensemble is None:
+        raise HTTPException(status_code=400, detail="集成检测未启用")
+    result_key = "score-cleanliness-ensemble" if ensemble_mode else "score-cleanliness"
+    # 相同内容的重复上传直接返回缓存结果
+    digest, _, _ = await media_store.save_upload(file)
+    cached = media_store.get_result(digest, result_key)
+    if cached is not None:
+        return cached
     
-    # 2. 计算清洁度评分
-    overall_score, detailed_scores = scorer.score(image, teeth_regions)
+    image = cv2.imread(str(media_store.path(digest)), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPException(status_code=400, detail="无法解码图像")
     
-    return {
+    if ensemble_mode:
+        # 1. 各成员并行检测并融合牙齿区域
+        try:
+            teeth_regions = await ensemble.detect(image)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        # 2. 计算清洁度评分
+        overall_score, detailed_scores = await inference_scheduler.run(
+            "interactive", scorer.score, image, teeth_regions
+        )
+    else:
+        def analyze():
+            # 1. 检测牙齿区域
+            teeth_regions = detector.detect(image)
+            # 2. 计算清洁度评分
+            return teeth_regions, scorer.score(image, teeth_regions)
+        
+        teeth_regions, (overall_score, detailed_scores) = await inference_scheduler.run("interactive", analyze)
+    warmup_manager.mark_first_inference()
+    
+    result = {
         "overall_score": round(overall_score, 1),
         "detailed_scores": detailed_scores,
         "teeth_count": len(teeth_regions)
-    }
\ No newline at end of file
+    }
+    media_store.put_result(digest, result_key, result)
+    return result
+
+@router.get("/score-cleanliness/ensemble-metrics")
+async def ensemble_metrics() -> Dict:
+    """集成检测各成员、融合及整体的延迟，以及成员失败次数"""
+    if ensemble is None:
+        raise HTTPException(status_code=400, detail="集成检测未启用")
+    return ensemble.metrics()
\ No newline at end of file
@@ -1,21 +1,45 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, HTTPException
 from models.tooth_detection import ToothDetector
 import cv2
-import numpy as np
 from typing import List, Dict
 import io
+from config import WARMUP_SHAPES, MEDIA_STORE_DIR
+from utils.warmup import warmup_manager
+from utils.masks import MASK_FORMATS
+from utils.media_store import MediaStore
+from utils.scheduler import inference_scheduler
 
 router = APIRouter()
+media_store = MediaStore(MEDIA_STORE_DIR / "uploads")
 detector = ToothDetector()
+warmup_manager.register("tooth_detector", lambda: detector.warmup(WARMUP_SHAPES))
 
 @router.post("/detect-teeth")
-async def detect_teeth(file: UploadFile = File(...)) -> List[Dict]:
-    """牙齿检测API端点"""
-    contents = await file.read()
-    image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
-    detections = detector.detect(image)
-    return [
-        {
+async def detect_teeth(
+    file: UploadFile = File(...),
+    mask_format: str = None,
+    full_resolution_masks: bool = False
+) -> List[Dict]:
+    """牙齿检测API端点（mask_format可选rle/polygon）"""
+    if mask_format is not None and mask_format not in MASK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的掩码格式: {mask_format}")
+    # 相同内容的重复上传直接返回缓存结果
+    digest, _, _ = await media_store.save_upload(file)
+    result_key = MediaStore.result_key("detect-teeth", mask_format=mask_format,
+                                       full_resolution_masks=full_resolution_masks)
+    cached = media_store.get_result(digest, result_key)
+    if cached is not None:
+        return cached
+    
+    image = cv2.imread(str(media_store.path(digest)), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPException(status_code=400, detail="无法解码图像")
+    detections = await inference_scheduler.run("interactive", detector.detect, image,
+                                               mask_format, full_resolution_masks)
+    warmup_manager.mark_first_inference()
+    response = []
+    for det in detections:
+        item = {
             "type": det["class"],
             "confidence": det["confidence"],
             "position": {
@@ -24,5 +48,8 @@ async def detect_teeth(file: UploadFile = File(...)) -> List[Dict]:
             },
             "bbox": det["bbox"]
         }
-        for det in detections
-    ]
\ No newline at end of file
+        if "mask" in det:
+            item["mask"] = det["mask"]
+        response.append(item)
+    media_store.put_result(digest, result_key, response)
+    return response
\ No newline at end of file
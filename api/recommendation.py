@@ -1,12 +1,21 @@
 from fastapi import APIRouter
 from models.recommendation_engine import RecommendationEngine
 from schemas.recommendation import RecommendationResponse
-from typing import Dict
+from typing import Dict, List
+from utils.warmup import warmup_manager
+from utils.scheduler import inference_scheduler
 
 router = APIRouter()
 engine = RecommendationEngine()
+warmup_manager.register("recommendation_engine", engine.warmup)
 
 @router.post("/generate-recommendation", response_model=RecommendationResponse)
 async def generate_recommendation(inputs: Dict) -> Dict:
     """生成个性化刷牙方案API"""
-    return engine.generate_recommendation(inputs)
\ No newline at end of file
+    return engine.generate_recommendation(inputs)
+
+@router.post("/generate-recommendation/batch", response_model=List[RecommendationResponse])
+async def generate_recommendation_batch(profiles: List[Dict]) -> List[Dict]:
+    """批量生成刷牙方案API（用于模型更新后重新评估用户群，在管理批处理通道中执行）"""
+    # 特征编码也在批处理通道中进行，与规则推理使用同一个规则集快照
+    return await inference_scheduler.run("admin", engine.generate_recommendations_for_profiles, profiles)
\ No newline at end of file
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+小记录批量加密性能测试
+比较逐条 encrypt()（每次新建密码对象 + base64 + dict）与 encrypt_batch 二进制列的每秒记录数
+"""
+
+import json
+import sys
+import time
+
+from utils.encryption import DataEncryptor, AESGCM_AVAILABLE
+
+def create_records(count: int) -> list:
+    """生成模拟的检测结果/问卷字段记录"""
+    return [
+        json.dumps({"tooth": i % 32, "score": (i * 37) % 100, "answer": "twice_daily"}).encode("utf-8")
+        for i in range(count)
+    ]
+
+def main(count: int = 1_000_000):
+    """主测试函数"""
+    print(f"小记录批量加密性能测试 ({count:,} 条记录)")
+    print(f"AESGCM(cryptography): {'可用' if AESGCM_AVAILABLE else '不可用，回退pycryptodome'}")
+    print("=" * 60)
+
+    encryptor = DataEncryptor()
+    records = create_records(count)
+
+    # 逐条加密很慢，取子集测量后换算
+    sample = records[:min(count, 50_000)]
+    start = time.perf_counter()
+    legacy = [encryptor.encrypt(record) for record in sample]
+    legacy_rate = len(sample) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for item in legacy:
+        encryptor.decrypt(item)
+    legacy_decrypt_rate = len(sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    column = encryptor.encrypt_batch(records)
+    batch_rate = count / (time.perf_counter() - start)
+    start = time.perf_counter()
+    decrypted = encryptor.decrypt_batch(column)
+    batch_decrypt_rate = count / (time.perf_counter() - start)
+    assert decrypted[-1] == records[-1]
+
+    print(f"{'模式':<24} {'加密 记录/秒':<16} {'解密 记录/秒':<16}")
+    print("-" * 60)
+    print(f"{'逐条 encrypt()':<24} {legacy_rate:<16,.0f} {legacy_decrypt_rate:<16,.0f}")
+    print(f"{'encrypt_batch':<24} {batch_rate:<16,.0f} {batch_decrypt_rate:<16,.0f}")
+    print(f"\n加速比: 加密 {batch_rate / legacy_rate:.1f}x, 解密 {batch_decrypt_rate / legacy_decrypt_rate:.1f}x")
+    print(f"二进制列大小: {len(column['data']) / 2**20:.1f}MB "
+          f"(明文 {sum(map(len, records)) / 2**20:.1f}MB)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+模型级联测试
+对一组照片比较 仅n / 级联(n -> x) / 仅x 三种方式：
+升级率、延迟分布，以及以yolov8x-seg结果为参照的检测一致性（IoU>=0.5的F1）
+需要 models/yolov8n-seg.pt 和 models/yolov8x-seg.pt
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import CASCADE_MIN_TEETH, CASCADE_UNCERTAIN_BAND, CASCADE_MAX_UNCERTAIN_FRACTION
+from teeth_detection_api import HybridTeethDetector
+from utils.cascade import needs_escalation
+from utils.tracking import detection_f1
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+def load_images(paths):
+    files = []
+    for path in map(Path, paths):
+        files += sorted(p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES) if path.is_dir() else [path]
+    return [(f.name, cv2.imread(str(f))) for f in files]
+
+def main(paths, confidence_threshold: float = 0.3):
+    """主测试函数"""
+    detector = HybridTeethDetector()
+    detector.ensure_dl_model()
+    if not {"n", "x"} <= set(detector.available_variants()):
+        print("❌ 需要同时存在 yolov8n-seg 和 yolov8x-seg 模型")
+        return
+    images = [(name, image) for name, image in load_images(paths) if image is not None]
+    if not images:
+        print("❌ 没有可用的测试图像")
+        return
+    detector.warmup([images[0][1].shape[:2]])
+
+    print(f"模型级联测试 ({len(images)} 张图像)")
+    print("=" * 60)
+    times = {"n": [], "cascade": [], "x": []}
+    f1 = {"n": [], "cascade": []}
+    escalated = 0
+    for name, image in images:
+        small, small_time = detector.deep_learning_detect(image, confidence_threshold, variant="n")
+        large, large_time = detector.deep_learning_detect(image, confidence_threshold, variant="x")
+        reason = needs_escalation(small, CASCADE_MIN_TEETH, CASCADE_UNCERTAIN_BAND, CASCADE_MAX_UNCERTAIN_FRACTION)
+        cascade = large if reason and large else small
+        escalated += reason is not None
+        times["n"].append(small_time)
+        times["x"].append(large_time)
+        times["cascade"].append(small_time + (large_time if reason else 0.0))
+        f1["n"].append(detection_f1(small, large))
+        f1["cascade"].append(detection_f1(cascade, large))
+        print(f"  {name}: n={len(small)} x={len(large)} 升级={reason or '-'}")
+
+    print("-" * 60)
+    print(f"升级率: {escalated / len(images):.1%}")
+    for mode in ("n", "cascade", "x"):
+        p50, p95 = np.percentile(times[mode], [50, 95]) * 1000
+        agreement = f"  与x一致性F1 {np.mean(f1[mode]):.3f}" if mode in f1 else ""
+        print(f"{mode:8s} p50 {p50:8.1f} ms  p95 {p95:8.1f} ms{agreement}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["t1.jpg", "t2.jpg"])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+训练数据集缓存测试
+对比每个epoch都解码并letterbox JPEG 与 从内存映射缓存按批切片读取 的epoch数据加载耗时
+（训练本身的前向/反向不计入，只衡量CPU训练机上作为瓶颈的数据准备部分）；
+加 --train 时再用两种训练器各实际训练几个epoch，报告含前向/反向的每epoch训练耗时（需要ultralytics）。
+未指定数据集目录时生成一组模拟的牙齿照片和YOLO分割标签。
+
+用法: python benchmark_dataset_cache.py [数据集images/train目录] [--train]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from teeth_detection.dataset_cache import open_cache, cache_dir_for, letterbox, IMAGE_SUFFIXES
+
+def synthesize_dataset(image_dir: Path, count: int = 200, size=(1280, 960)):
+    """模拟数据集: 手机拍摄尺寸的牙齿照片，每张一排牙齿框标签"""
+    rng = np.random.default_rng(0)
+    label_dir = image_dir.parent.parent / "labels" / image_dir.name
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(label_dir, exist_ok=True)
+    w, h = size
+    for n in range(count):
+        image = np.clip(rng.normal(90, 30, (h, w, 3)), 0, 255).astype(np.uint8)
+        lines = []
+        for k in range(8):
+            x1, y1 = 150 + k * 120, 380 + int(rng.integers(-20, 20))
+            cv2.rectangle(image, (x1, y1), (x1 + 90, y1 + 160), (235, 235, 240), -1)
+            polygon = [(x1, y1), (x1 + 90, y1), (x1 + 90, y1 + 160), (x1, y1 + 160)]
+            lines.append("0 " + " ".join(f"{x / w:.6f} {y / h:.6f}" for x, y in polygon))
+        cv2.imwrite(str(image_dir / f"{n:05d}.jpg"), image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        (label_dir / f"{n:05d}.txt").write_text("\n".join(lines))
+
+def to_tensor(batch: np.ndarray) -> float:
+    """模拟训练器组批: BGR->RGB、HWC->CHW、归一化到0-1"""
+    tensor = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255
+    return float(tensor[:, :, ::64, ::64].mean())
+
+def decode_epoch(image_dir: Path, imgsz: int, batch_size: int) -> float:
+    """不使用缓存: 逐张解码并letterbox，组成批次"""
+    files = sorted(p for p in image_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    checksum = 0.0
+    for start in range(0, len(files), batch_size):
+        batch = np.stack([letterbox(cv2.imread(str(f)), imgsz)[0] for f in files[start:start + batch_size]])
+        checksum += to_tensor(batch)
+    return checksum
+
+def cached_epoch(cache, batch_size: int, epoch: int) -> float:
+    """使用缓存: 内存映射上的连续切片"""
+    checksum = 0.0
+    for images, boxes in cache.iter_batches(batch_size, shuffle=True, seed=epoch):
+        checksum += to_tensor(images)
+    return checksum
+
+def train_epochs(image_dir: Path, imgsz: int, batch_size: int, epochs: int):
+    """两种训练器各训练epochs个epoch（从零初始化的yolov8n-seg，训练集兼作验证集），打印每epoch耗时"""
+    try:
+        from teeth_detection.train_yolov8 import train_model
+    except ImportError as e:
+        print(f"跳过实际训练测试（{e}）")
+        return
+    data = image_dir.parent.parent / "bench_data.yaml"
+    split = f"images/{image_dir.name}"
+    data.write_text(yaml.dump({"path": str(image_dir.parent.parent), "train": split, "val": split,
+                               "names": {0: "tooth"}}))
+    for dataset_cache in (False, True):
+        print(f"\n实际训练（数据集缓存: {'开启' if dataset_cache else '关闭'}）:")
+        train_model(dataset_cache=dataset_cache, model="yolov8n-seg.yaml", data=str(data), epochs=epochs,
+                    imgsz=imgsz, batch=batch_size, device="cpu", plots=False, verbose=False,
+                    project=str(image_dir.parent.parent / "runs"), name=f"cache{int(dataset_cache)}")
+
+def main(dataset_dir: str = None, imgsz: int = 640, batch_size: int = 16, epochs: int = 3, train: bool = False):
+    """主测试函数"""
+    image_dir = Path(dataset_dir) if dataset_dir else Path(tempfile.mkdtemp()) / "teeth" / "images" / "train"
+    if dataset_dir is None:
+        synthesize_dataset(image_dir)
+    count = sum(p.suffix.lower() in IMAGE_SUFFIXES for p in image_dir.iterdir())
+    print(f"训练数据集缓存测试 ({count} 张图像, imgsz {imgsz}, batch {batch_size}, {epochs} 个epoch)")
+    print("=" * 60)
+
+    times = []
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        decode_epoch(image_dir, imgsz, batch_size)
+        times.append(time.perf_counter() - start)
+    print(f"每epoch解码:    平均 {np.mean(times) * 1000:8.1f} ms/epoch")
+
+    start = time.perf_counter()
+    cache = open_cache(image_dir, imgsz)
+    build_time = time.perf_counter() - start
+    size = sum(f.stat().st_size for f in cache_dir_for(image_dir, imgsz).iterdir())
+    print(f"构建缓存(一次): {build_time * 1000:8.1f} ms  ({size / 1024 ** 2:.1f} MiB)")
+
+    times = []
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        cached_epoch(cache, batch_size, epoch)
+        times.append(time.perf_counter() - start)
+    print(f"内存映射缓存:   平均 {np.mean(times) * 1000:8.1f} ms/epoch  (首个epoch {times[0] * 1000:.1f} ms)")
+
+    if train:
+        train_epochs(image_dir, imgsz, batch_size, epochs)
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    main(args[0] if args else None, train="--train" in sys.argv)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+集成检测测试
+1. 成员串行执行 vs 在推理调度槽上并行执行的集成延迟（成员用固定耗时模拟）
+2. 按成员数保证推理槽后，集成延迟应接近最慢成员的延迟（超出容差时以非零状态退出）
+3. 加权框融合的耗时（4个成员 × 每成员若干框）
+"""
+
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from config import INFERENCE_LANES
+from utils.ensemble import EnsembleDetector, weighted_boxes_fusion
+from utils.scheduler import LaneScheduler
+
+MEMBER_SECONDS = {"yolov8n-640": 0.08, "yolov8n-960": 0.15, "yolov8x-640": 0.6, "traditional": 0.01}
+PARALLEL_TOLERANCE = 1.2  # 集成延迟 / 最慢成员延迟 的上限
+
+def synthetic_member(seconds: float, rng: np.random.Generator, teeth: int = 12):
+    """返回固定耗时、框在同一组牙齿位置附近抖动的模拟成员"""
+    base = np.stack([np.arange(teeth) * 50.0, np.full(teeth, 100.0)], axis=1)
+    def detect(image):
+        time.sleep(seconds)
+        jitter = rng.normal(0, 3, (teeth, 4))
+        boxes = np.concatenate([base, base + 40], axis=1) + jitter
+        return [{'class': 'incisor', 'confidence': float(c), 'bbox': b.tolist()}
+                for b, c in zip(boxes, rng.uniform(0.3, 0.95, teeth))]
+    return detect
+
+def main(rounds: int = 5):
+    """主测试函数"""
+    rng = np.random.default_rng(0)
+    members = [(name, synthetic_member(seconds, rng), 1.0) for name, seconds in MEMBER_SECONDS.items()]
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    print(f"集成检测测试 ({len(members)} 个成员: " +
+          ", ".join(f"{name} {s * 1000:.0f} ms" for name, s in MEMBER_SECONDS.items()) + ")")
+    print("=" * 60)
+
+    for slots in (1, len(members)):
+        ensemble = EnsembleDetector(members, LaneScheduler(INFERENCE_LANES, slots=slots))
+        for _ in range(rounds):
+            asyncio.run(ensemble.detect(image))
+        latency = ensemble.metrics()["latency"]["ensemble"]
+        print(f"{slots} 个推理槽: 集成延迟 {latency['mean_ms']:7.1f} ms (p95 {latency['p95_ms']:.1f} ms)")
+
+    # 与服务相同: 默认1个推理槽，启用集成时按成员数保证
+    scheduler = LaneScheduler(INFERENCE_LANES, slots=1)
+    scheduler.require_slots(len(members))
+    ensemble = EnsembleDetector(members, scheduler)
+    for _ in range(rounds):
+        asyncio.run(ensemble.detect(image))
+    # 成员延迟统计包含排队时间，这里以最慢成员的实际执行耗时为基准
+    slowest = max(MEMBER_SECONDS.values()) * 1000
+    ratio = ensemble.metrics()["latency"]["ensemble"]["mean_ms"] / slowest
+    ok = ratio <= PARALLEL_TOLERANCE
+    print(f"保证推理槽后({scheduler.slots} 个): 集成延迟 / 最慢成员延迟 = {ratio:.2f} "
+          f"(上限 {PARALLEL_TOLERANCE}) {'✅' if ok else '❌'}")
+
+    for teeth in (12, 50, 200):
+        boxes = [np.concatenate([xy := rng.uniform(0, 1000, (teeth, 2)), xy + 40], axis=1) for _ in members]
+        scores = [rng.uniform(0.1, 1.0, teeth) for _ in members]
+        labels = [rng.integers(0, 4, teeth) for _ in members]
+        start = time.perf_counter()
+        for _ in range(20):
+            weighted_boxes_fusion(boxes, scores, labels)
+        elapsed = (time.perf_counter() - start) / 20
+        print(f"加权框融合 {len(members)}×{teeth} 个框: {elapsed * 1000:.2f} ms")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
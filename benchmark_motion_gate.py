@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+视频帧变化门控测试
+对同一视频比较 全部关键帧检测 与 门控跳帧（沿用并平移关键帧结果）：
+跳帧比例、检测耗时，以及跳过帧的沿用结果相对真实检测的F1。
+未指定视频时生成一段带静止片段、手机晃动和快速动作的模拟刷牙视频。
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_SKIP
+from preprocessing.motion_gate import FrameChangeGate
+from preprocessing.video_processor import VideoProcessor
+from teeth_detection_api import HybridTeethDetector
+from utils.tracking import IoUTracker, detection_f1, shift_regions
+
+def synthesize_video(path: str, seconds: int = 60, fps: int = 30):
+    """模拟视频: 一排牙齿，静止/轻微晃动/快速移动的牙刷交替出现"""
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 480))
+    noise = cv2.GaussianBlur(rng.normal(0, 25, (480, 640)).astype(np.float32), (0, 0), 8)
+    background = np.clip(np.stack([40 + noise, 40 + noise, 110 + 2 * noise], axis=2), 0, 255).astype(np.uint8)
+    for n in range(seconds * fps):
+        t = n / fps
+        phase = int(t // 10) % 3  # 0: 静止 1: 手机晃动 2: 快速刷牙
+        dx, dy = (int(6 * np.sin(t * 2)), int(4 * np.cos(t * 2))) if phase == 1 else (0, 0)
+        frame = np.roll(background, (dy, dx), axis=(0, 1))
+        for k in range(6):
+            x = 120 + k * 70 + dx
+            cv2.rectangle(frame, (x, 200 + dy), (x + 50, 280 + dy), (235, 235, 240), -1)
+        if phase == 2:
+            brush_x = int(320 + 200 * np.sin(t * 3))
+            cv2.rectangle(frame, (brush_x - 100, 220), (brush_x + 100, 260), (40, 40, 200), -1)
+        writer.write(frame)
+    writer.release()
+
+def main(video_path: str = None):
+    """主测试函数"""
+    temporary = None
+    if video_path is None:
+        temporary = video_path = os.path.join(tempfile.mkdtemp(), "brushing.mp4")
+        synthesize_video(video_path)
+    frames = VideoProcessor(target_fps=2).extract_key_frames(video_path)
+    detector = HybridTeethDetector()
+    detector.ensure_dl_model()
+    print(f"视频帧变化门控测试 ({len(frames)} 个关键帧, 阈值 {MOTION_GATE_THRESHOLD}, 最多连续跳过 {MOTION_GATE_MAX_SKIP})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    full = [detector.hybrid_detect(frame)['teeth_regions'] for frame in frames]
+    full_time = time.perf_counter() - start
+
+    gate = FrameChangeGate(MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_SKIP)
+    tracker = IoUTracker()
+    start = time.perf_counter()
+    gated, skipped, key_regions = [], 0, []
+    for frame in frames:
+        skip, (dx, dy), _ = gate.check(frame)
+        if skip:
+            regions = shift_regions(key_regions, dx, dy)
+            skipped += 1
+        else:
+            regions = key_regions = detector.hybrid_detect(frame)['teeth_regions']
+        gated.append(tracker.update(regions))
+    gated_time = time.perf_counter() - start
+
+    f1 = [detection_f1(g, f) for g, f in zip(gated, full)]
+    tracks = {region['track_id'] for regions in gated for region in regions}
+    print(f"全部检测: {full_time * 1000:8.1f} ms")
+    print(f"门控跳帧: {gated_time * 1000:8.1f} ms  跳过 {skipped}/{len(frames)} ({skipped / len(frames):.1%})")
+    print(f"门控结果与全部检测的F1: 平均 {np.mean(f1):.3f}  最低 {np.min(f1):.3f}")
+    print(f"轨迹数: {len(tracks)}")
+    if temporary:
+        os.remove(temporary)
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+视频抽帧测试
+对比固定1fps抽帧与按动作强度自适应抽帧：抽取帧数（即推理调用次数）、抽帧耗时，
+以及对刷牙动作的覆盖率（模拟视频中牙刷经过的位置区间有多少被抽到的帧看到）。
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import VIDEO_FPS, VIDEO_PROBE_FPS, VIDEO_UNIFORM_SHARE
+from preprocessing.video_processor import VideoProcessor
+
+FPS = 30
+BURSTS = [(8, 11), (25, 27), (41, 44), (52, 54)]  # 快速刷牙片段（秒），其余时间画面静止
+POSITION_BINS = 16
+
+def brush_position(t: float):
+    """t时刻牙刷中心的x坐标，不在刷牙片段时返回None"""
+    for start, end in BURSTS:
+        if start <= t < end:
+            return int(320 + 220 * np.sin((t - start) * 2 * np.pi / 1.3))
+    return None
+
+def synthesize_video(path: str, seconds: int = 60):
+    """模拟视频: 长时间静止，穿插几段快速左右刷牙"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (640, 480))
+    background = np.full((480, 640, 3), (50, 50, 120), dtype=np.uint8)
+    for k in range(6):
+        cv2.rectangle(background, (120 + k * 70, 200), (170 + k * 70, 280), (235, 235, 240), -1)
+    for n in range(seconds * FPS):
+        frame = background.copy()
+        x = brush_position(n / FPS)
+        if x is not None:
+            cv2.rectangle(frame, (x - 60, 220), (x + 60, 260), (40, 40, 200), -1)
+        writer.write(frame)
+    writer.release()
+
+def coverage(timestamps, seconds: int = 60) -> float:
+    """被抽到的帧看到的牙刷位置区间 / 视频中牙刷经过的全部位置区间"""
+    def bins(times):
+        return {int(x * POSITION_BINS / 640) for x in map(brush_position, times) if x is not None}
+    truth = bins(np.arange(seconds * FPS) / FPS)
+    return len(bins(timestamps) & truth) / len(truth)
+
+def main(seconds: int = 60):
+    """主测试函数"""
+    path = os.path.join(tempfile.mkdtemp(), "brushing.mp4")
+    synthesize_video(path, seconds)
+    processor = VideoProcessor(target_fps=VIDEO_FPS)
+    print(f"视频抽帧测试 ({seconds} 秒, 刷牙片段 {BURSTS})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    frames = processor.extract_key_frames(path)
+    elapsed = time.perf_counter() - start
+    fixed_times = [i / VIDEO_FPS for i in range(len(frames))]
+    print(f"固定 {VIDEO_FPS}fps: {len(frames):3d} 帧  {elapsed * 1000:7.1f} ms  覆盖率 {coverage(fixed_times, seconds):.1%}")
+
+    start = time.perf_counter()
+    frames, timestamps = processor.extract_adaptive_frames(path, None, VIDEO_PROBE_FPS, VIDEO_UNIFORM_SHARE)
+    elapsed = time.perf_counter() - start
+    in_bursts = sum(brush_position(t) is not None for t in timestamps)
+    print(f"自适应:   {len(frames):3d} 帧  {elapsed * 1000:7.1f} ms  覆盖率 {coverage(timestamps, seconds):.1%}"
+          f"  (刷牙片段内 {in_bursts} 帧)")
+    os.remove(path)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60)
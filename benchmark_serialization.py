@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+检测结果序列化性能测试
+比较逐框字典(Pydantic校验 + json)与列式格式(orjson / MessagePack)在不同框数量下的耗时与体积
+"""
+
+import json
+import time
+
+import numpy as np
+
+from teeth_detection_api import TeethDetectionResult
+from utils.serialization import (
+    to_columnar, dumps_json, dumps_msgpack, ORJSON_AVAILABLE, MSGPACK_AVAILABLE
+)
+
+def create_regions(count: int) -> list:
+    """生成模拟检测结果"""
+    rng = np.random.default_rng(0)
+    boxes = rng.integers(0, 600, size=(count, 4))
+    return [
+        {
+            'id': i,
+            'bbox': [int(v) for v in boxes[i]],
+            'confidence': float(rng.random()),
+            'class_id': 0,
+            'area': int(boxes[i][2] * boxes[i][3]),
+            'method': 'deep_learning'
+        }
+        for i in range(count)
+    ]
+
+def time_it(fn, repeat: int) -> tuple:
+    """返回 (平均耗时ms, 输出字节数)"""
+    output = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000, len(output)
+
+def main():
+    """主测试函数"""
+    print("检测结果序列化性能测试")
+    print(f"orjson: {'可用' if ORJSON_AVAILABLE else '不可用(回退json)'}, "
+          f"msgpack: {'可用' if MSGPACK_AVAILABLE else '不可用'}")
+    print("=" * 72)
+    print(f"{'框数量':<8} {'格式':<28} {'耗时(ms)':<12} {'体积(bytes)':<12}")
+    print("-" * 72)
+
+    for count in [10, 100, 1000, 10000]:
+        regions = create_regions(count)
+        repeat = max(5, 20000 // count)
+        meta = {'success': True, 'teeth_count': count, 'detection_time': 0.1,
+                'method_used': 'hybrid', 'message': ''}
+
+        def records():
+            result = TeethDetectionResult(teeth_regions=regions, **meta)
+            return json.dumps(result.dict()).encode("utf-8")
+
+        def columnar_json():
+            return dumps_json({**meta, 'teeth_regions': to_columnar(regions)})
+
+        cases = [("records (Pydantic+json)", records), ("columnar json", columnar_json)]
+        if MSGPACK_AVAILABLE:
+            cases.append(("columnar msgpack",
+                          lambda: dumps_msgpack({**meta, 'teeth_regions': to_columnar(regions)})))
+
+        for name, fn in cases:
+            elapsed, size = time_it(fn, repeat)
+            print(f"{count:<8} {name:<28} {elapsed:<12.3f} {size:<12}")
+        print("-" * 72)
+
+if __name__ == "__main__":
+    main()
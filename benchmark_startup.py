@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+服务冷启动性能测试
+测量应用模块导入耗时，以及有/无后台预热时的首次推理耗时
+"""
+
+import json
+import subprocess
+import sys
+
+# 在独立子进程中运行，保证每次测量都是真正的冷启动
+PROBE_SCRIPT = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import teeth_detection_api as app_module
+import_time = time.perf_counter() - t0
+heavy_modules = [m for m in ("torch", "ultralytics", "xgboost") if m in sys.modules]
+
+import numpy as np
+import cv2
+image = np.full((480, 640, 3), 240, dtype=np.uint8)
+for i in range(5):
+    cv2.ellipse(image, (120 + i * 100, 240), (30, 40), 0, 0, 360, (255, 255, 255), -1)
+
+warmup_time = 0.0
+if sys.argv[1] == "warm":
+    t1 = time.perf_counter()
+    app_module.warmup_manager.start()
+    app_module.warmup_manager.wait()
+    warmup_time = time.perf_counter() - t1
+
+t2 = time.perf_counter()
+app_module.detector.hybrid_detect(image, use_dl=True)
+first_inference = time.perf_counter() - t2
+
+t3 = time.perf_counter()
+app_module.detector.hybrid_detect(image, use_dl=True)
+steady_inference = time.perf_counter() - t3
+
+print(json.dumps({
+    "import_time": import_time,
+    "warmup_time": warmup_time,
+    "first_inference": first_inference,
+    "steady_inference": steady_inference,
+    "heavy_modules_loaded": heavy_modules
+}))
+'''
+
+def run_probe(mode: str) -> dict:
+    """运行一次冷启动测量"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE_SCRIPT, mode],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    """主测试函数"""
+    print("服务冷启动性能测试")
+    print("=" * 50)
+
+    for mode, name in [("cold", "无预热"), ("warm", "后台预热")]:
+        try:
+            result = run_probe(mode)
+        except Exception as e:
+            print(f"❌ {name} 测试失败: {e}")
+            continue
+
+        print(f"\n=== {name} ===")
+        print(f"模块导入耗时: {result['import_time']:.3f}s")
+        print(f"导入后已加载的重型依赖: {result['heavy_modules_loaded'] or '无'}")
+        if mode == "warm":
+            print(f"预热耗时: {result['warmup_time']:.3f}s")
+        print(f"首次推理耗时: {result['first_inference']:.3f}s")
+        print(f"稳态推理耗时: {result['steady_inference']:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,12 @@ BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
+# 内容寻址媒体存储（上传文件按SHA-256去重保存，分析结果按哈希缓存）
+MEDIA_STORE_DIR = DATA_DIR / "media"
+# 参考文件元数据目录（SQLite索引）
+REFERENCE_CATALOG_DB = MEDIA_STORE_DIR / "references" / "catalog.db"
+# 旧版参考文件目录（<时间戳>_<文件名>，相对工作目录），元数据目录首次建立时一次性导入
+LEGACY_REFERENCES_DIR = Path(os.getenv("IBRUSHPAL_LEGACY_REFERENCES_DIR", "references"))
 
 # 模型目录
 MODEL_DIR = BASE_DIR / "models" / "weights"
@@ -19,6 +25,16 @@ TOOTH_DETECTION_MODEL = MODEL_DIR / "yolov8n-seg.pt"  # 使用预训练模型
 CLEANLINESS_MODEL = MODEL_DIR / "cleanliness_scorer.pt"
 RECOMMENDATION_MODEL = MODEL_DIR / "recommendation_model.pkl"
 
+# 临床规则文件（JSON/YAML，修改后自动热加载）
+CLINICAL_RULES_FILE = BASE_DIR / "models" / "rules" / "clinical_rules.json"
+RULES_RELOAD_INTERVAL = 2.0  # 检查规则文件更新的间隔（秒）
+
+# 原始数据导入（RAW_DATA_DIR -> PROCESSED_DATA_DIR，按清单增量处理）
+INGEST_MAX_SIDE = 1280      # 处理后样本的最大长边
+INGEST_MIN_SIDE = 320       # 短边低于该值的图像视为无效
+INGEST_ANONYMIZE_MODE = os.getenv("IBRUSHPAL_INGEST_ANONYMIZE_MODE", "blur")  # blur 或 pixelate
+INGEST_WORKERS = int(os.getenv("IBRUSHPAL_INGEST_WORKERS", "0"))  # 0表示CPU核数
+
 # 创建必要的目录
 os.makedirs(RAW_DATA_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DATA_DIR, exist_ok=True)
@@ -27,7 +43,79 @@ os.makedirs(MODEL_DIR, exist_ok=True)
 # API配置
 API_HOST = "0.0.0.0"
 API_PORT = 8000
-API_WORKERS = 4
+API_WORKERS = int(os.getenv("IBRUSHPAL_WORKERS", "4"))
+
+# 线程预算（0表示自动: 可用核数按CPU亲和性和cgroup配额检测，再在工作进程间平分）
+CPU_BUDGET = int(os.getenv("IBRUSHPAL_CPU_BUDGET", "0"))
+TORCH_THREADS = int(os.getenv("IBRUSHPAL_TORCH_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("IBRUSHPAL_TORCH_INTEROP_THREADS", "1"))
+OPENCV_THREADS = int(os.getenv("IBRUSHPAL_OPENCV_THREADS", "0"))
+INFERENCE_EXECUTOR_THREADS = int(os.getenv("IBRUSHPAL_EXECUTOR_THREADS", "0"))
+CPU_PINNING = os.getenv("IBRUSHPAL_CPU_PINNING", "0") == "1"  # 每个工作进程绑定独立CPU集合
+
+# 推理调度通道: share为加权公平份额，max_inflight为并发上限（负数表示为其他通道保留的推理槽数）
+INFERENCE_LANES = {
+    "interactive": {"share": float(os.getenv("IBRUSHPAL_LANE_INTERACTIVE_SHARE", "8"))},
+    "video": {"share": float(os.getenv("IBRUSHPAL_LANE_VIDEO_SHARE", "3")), "max_inflight": -1},
+    "admin": {"share": float(os.getenv("IBRUSHPAL_LANE_ADMIN_SHARE", "1")), "max_inflight": -1},
+}
+VIDEO_BATCH_SIZE = 4  # 视频帧每批检测的帧数（批次之间可被交互请求抢占）
+# 视频抽帧: adaptive按动作强度分配帧预算（预算默认等于按VIDEO_FPS固定抽帧的帧数），fixed为固定帧率
+VIDEO_SAMPLING = os.getenv("IBRUSHPAL_VIDEO_SAMPLING", "adaptive")
+VIDEO_PROBE_FPS = 4.0        # 自适应抽帧的探测帧率（即最高采样帧率）
+VIDEO_UNIFORM_SHARE = 0.3    # 均匀分配的预算比例，保证静止片段的最低覆盖
+VIDEO_MAX_FRAMES = 120       # 每个视频最多检测的帧数
+# 视频拍摄要求: 上传时从容器元数据（MP4/MOV的moov）探测，不满足时在接收完整文件前拒绝
+VIDEO_MIN_WIDTH = 640
+VIDEO_MIN_HEIGHT = 480
+VIDEO_MIN_FPS = 15
+VIDEO_MAX_DURATION = float(os.getenv("IBRUSHPAL_VIDEO_MAX_DURATION", "300"))  # 秒
+VIDEO_PROBE_BYTES = 4 * 1024 * 1024  # 上传流中最多缓存多少字节等待moov出现
+# 视频帧变化门控: 与上一个检测关键帧的缩略图平均像素差低于阈值时跳过检测，沿用并平移上次结果
+MOTION_GATE_ENABLED = os.getenv("IBRUSHPAL_MOTION_GATE", "1") != "0"
+MOTION_GATE_THRESHOLD = float(os.getenv("IBRUSHPAL_MOTION_GATE_THRESHOLD", "0.08"))
+MOTION_GATE_MAX_SKIP = 5  # 最多连续跳过的帧数
+
+# 过载准入控制（交互通道排队过深或近期延迟过高时降级到传统检测，更深时直接拒绝）
+ADMISSION_ENABLED = os.getenv("IBRUSHPAL_ADMISSION", "1") != "0"
+ADMISSION_DEGRADE_QUEUE_DEPTH = int(os.getenv("IBRUSHPAL_DEGRADE_QUEUE_DEPTH", "8"))
+ADMISSION_SHED_QUEUE_DEPTH = int(os.getenv("IBRUSHPAL_SHED_QUEUE_DEPTH", "32"))
+ADMISSION_DEGRADE_LATENCY = float(os.getenv("IBRUSHPAL_DEGRADE_LATENCY", "2.0"))  # 近期p95延迟（秒）
+
+# 检测模型变体（文件不存在的变体不参与质量分级选择）
+MODEL_VARIANTS = {"n": "models/yolov8n-seg.pt", "x": "models/yolov8x-seg.pt"}
+# 各变体在640输入下的CPU先验延迟（秒），在线延迟模型收到实测数据前使用
+MODEL_VARIANT_PRIOR_LATENCY = {"n": 0.15, "x": 1.6}
+# 质量分级: budget为默认端到端延迟预算（秒，即SLA），plans为按精度从低到高的 (变体, 输入尺寸, 每边切片数)
+QUALITY_TIERS = {
+    "fast": {"budget": 0.5, "plans": [("n", 320, 1), ("n", 480, 1), ("n", 640, 1)]},
+    "balanced": {"budget": 1.5, "plans": [("n", 480, 1), ("n", 640, 1), ("x", 480, 1), ("x", 640, 1)]},
+    "accurate": {"budget": 6.0, "plans": [("n", 640, 1), ("x", 640, 1), ("x", 640, 2)]},
+}
+DEFAULT_QUALITY_TIER = os.getenv("IBRUSHPAL_QUALITY_TIER", "balanced")
+
+# 模型级联（n -> x）: 小模型结果牙齿数过少或不确定得分占比过高时升级到大模型
+CASCADE_MIN_TEETH = 4
+CASCADE_UNCERTAIN_BAND = (0.3, 0.6)        # 该区间内的得分视为不确定
+CASCADE_MAX_UNCERTAIN_FRACTION = 0.5
+CASCADE_BATCH_SIZE = int(os.getenv("IBRUSHPAL_CASCADE_BATCH_SIZE", "4"))  # 并发升级请求合并的批大小
+CASCADE_BATCH_WAIT = float(os.getenv("IBRUSHPAL_CASCADE_BATCH_WAIT", "0.02"))  # 凑批最长等待（秒）
+
+# 清洁度报告的集成检测成员（并行推理后加权框融合；model为None表示传统检测器，加载失败的成员被跳过）
+# 每个模型成员加载独立的模型副本。启用集成检测时推理槽数至少提升到成员数，使成员真正并行
+# （默认槽数为 核数 // torch线程数，通常只有1~2）；此时应相应减小 IBRUSHPAL_TORCH_THREADS
+# （如 核数 // 成员数）避免超额订阅。关闭后不加载成员模型，ensemble_mode请求返回400
+ENSEMBLE_ENABLED = os.getenv("IBRUSHPAL_ENSEMBLE_ENABLED", "1") == "1"
+ENSEMBLE_MEMBERS = [
+    {"name": "yolov8n-640", "model": "yolov8n.pt", "imgsz": 640, "weight": 1.0},
+    {"name": "yolov8n-960", "model": "yolov8n.pt", "imgsz": 960, "weight": 1.0},
+    {"name": "yolov8x-640", "model": "models/yolov8x-seg.pt", "imgsz": 640, "weight": 2.0},
+    {"name": "traditional", "model": None, "weight": 0.5},
+]
+ENSEMBLE_IOU_THRESHOLD = 0.55
+ENSEMBLE_SKIP_THRESHOLD = 0.1  # 乘以成员权重后低于该值的框不参与融合
+ENSEMBLE_MIN_VOTES = int(os.getenv("IBRUSHPAL_ENSEMBLE_MIN_VOTES", "1"))  # 融合框至少需要的成员数
+# 融合得分低于 TOOTH_DETECTION_CONF 的框在评分前丢弃
 
 # 安全配置
 ALLOWED_ORIGINS = ["*"]
@@ -37,6 +125,18 @@ TOOTH_DETECTION_CONF = 0.25
 IMAGE_SIZE = 640
 VIDEO_FPS = 1
 
+# 启动预热配置（代表性输入尺寸: 高, 宽）
+WARMUP_ENABLED = os.getenv("IBRUSHPAL_WARMUP", "1") != "0"
+WARMUP_SHAPES = [(640, 640), (480, 640), (1080, 1920)]
+
+# 检测叠加图渲染配置（小程序预览）
+RENDER_MAX_WIDTH = 1080      # 帧缓存保留的最大显示宽度
+RENDER_DEFAULT_WIDTH = 720
+RENDER_FORMAT = os.getenv("IBRUSHPAL_RENDER_FORMAT", "jpeg")  # jpeg编码最快；webp体积更小但编码更慢
+RENDER_QUALITY = int(os.getenv("IBRUSHPAL_RENDER_QUALITY", "80"))
+RENDER_FRAME_CACHE_SIZE = 32
+RENDER_CACHE_BYTES = 64 * 1024 * 1024
+
 # 模型下载配置
 MODEL_DOWNLOAD_URLS = {
     "yolov8n-seg.pt": [
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+原始数据导入脚本
+把 data/raw 下新增或修改的图像解码、校验、去重、脱敏、缩放后写入 data/processed，
+未变化的文件按清单跳过。可重复运行（例如定时任务）。
+"""
+
+import sys
+
+from config import (RAW_DATA_DIR, PROCESSED_DATA_DIR, INGEST_MAX_SIDE, INGEST_MIN_SIDE,
+                    INGEST_ANONYMIZE_MODE, INGEST_WORKERS)
+from utils.ingestion import IngestionPipeline
+
+def main(raw_dir=RAW_DATA_DIR, processed_dir=PROCESSED_DATA_DIR):
+    """主函数"""
+    pipeline = IngestionPipeline(raw_dir, processed_dir, INGEST_MAX_SIDE, INGEST_MIN_SIDE,
+                                 mode=INGEST_ANONYMIZE_MODE, workers=INGEST_WORKERS or None)
+    print(f"=== 导入原始数据: {raw_dir} -> {processed_dir} ===")
+    stats = pipeline.run()
+    print(f"扫描 {stats['scanned']}  跳过(未变化) {stats['skipped']}  处理 {stats['processed']}  "
+          f"重复 {stats['duplicate']}  无效 {stats['invalid']}  失败 {stats['failed']}  移除 {stats['removed']}")
+    print(f"耗时 {stats['elapsed']:.2f} 秒")
+    return 1 if stats['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:3]))
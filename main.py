@@ -1,9 +1,16 @@
+from utils.warmup import warmup_manager  # 尽早导入以记录进程启动时间
+import threading
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from api.detection import router as detection_router
 from api.cleanliness import router as cleanliness_router
 from api.recommendation import router as recommendation_router
-from api.admin import router as admin_router
+from api.admin import router as admin_router, backfill_catalog
 from fastapi.middleware.cors import CORSMiddleware
+from config import (WARMUP_ENABLED, API_WORKERS, CPU_BUDGET, TORCH_THREADS, TORCH_INTEROP_THREADS,
+                    OPENCV_THREADS, INFERENCE_EXECUTOR_THREADS, CPU_PINNING)
+from utils.cpu_budget import thread_budget
+from utils.scheduler import inference_scheduler
 
 app = FastAPI(
     title="iBrushPal AI API",
@@ -28,6 +35,36 @@ app.include_router(cleanliness_router, prefix="/api/v1")
 app.include_router(recommendation_router, prefix="/api/v1")
 app.include_router(admin_router, prefix="/api/admin")
 
+warmup_manager.mark_imported()
+
+@app.on_event("startup")
+async def start_warmup():
+    """应用本工作进程的线程预算并启动后台模型预热"""
+    thread_budget.configure(API_WORKERS, CPU_BUDGET, TORCH_THREADS, TORCH_INTEROP_THREADS,
+                            OPENCV_THREADS, INFERENCE_EXECUTOR_THREADS, CPU_PINNING)
+    if WARMUP_ENABLED:
+        warmup_manager.start()
+    else:
+        warmup_manager.skip()
+    # 参考文件元数据目录的一次性导入在后台执行，不阻塞启动
+    threading.Thread(target=backfill_catalog, name="catalog-backfill", daemon=True).start()
+
 @app.get("/")
 async def root():
-    return {"message": "iBrushPal AI Service"}
\ No newline at end of file
+    return {"message": "iBrushPal AI Service"}
+
+@app.get("/health")
+async def health_check():
+    """存活检查（进程可响应即健康）"""
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查（模型预热完成前返回503）"""
+    status = warmup_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics/scheduler")
+async def scheduler_metrics():
+    """各调度通道的队列深度、并发数和等待/总延迟分位数"""
+    return inference_scheduler.metrics()
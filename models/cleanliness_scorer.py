@@ -1,30 +1,49 @@
+import threading
 import cv2
 import numpy as np
-from typing import Tuple
-from ultralytics import YOLO
+from typing import List, Tuple
+from utils.cpu_budget import thread_budget
 
 class CleanlinessScorer:
     """牙齿清洁度评分器（混合方法）"""
     
-    def __init__(self):
-        self.plaque_model = YOLO('yolov8n-seg.pt')  # 牙菌斑分割模型
+    def __init__(self, model_path: str = 'yolov8n-seg.pt'):
+        self.model_path = model_path  # 牙菌斑分割模型
+        self._plaque_model = None
+        self._model_lock = threading.Lock()
         self.color_ranges = {
             'plaque': ([0, 0, 100], [50, 50, 255]),  # 牙菌斑颜色范围 (BGR)
             'healthy': ([200, 200, 200], [255, 255, 255])  # 健康牙齿颜色范围
         }
+    
+    @property
+    def plaque_model(self):
+        """懒加载分割模型（首次访问时才导入ultralytics）"""
+        if self._plaque_model is None:
+            with self._model_lock:
+                if self._plaque_model is None:
+                    from ultralytics import YOLO
+                    self._plaque_model = YOLO(self.model_path)
+                    thread_budget.configure_torch()
+        return self._plaque_model
+    
+    def warmup(self, shapes: List[Tuple[int, int]]):
+        """加载模型并用代表性尺寸的空白图像跑一遍推理"""
+        for height, width in shapes:
+            self.plaque_model(np.zeros((height, width, 3), dtype=np.uint8), verbose=False)
         
     def score(self, image: np.ndarray, teeth_regions: list) -> Tuple[float, dict]:
         """计算牙齿清洁度评分"""
         total_score = 0
         detailed_scores = {}
         
-        for region in teeth_regions:
+        # 方法1: 基于颜色的初步评分（整图积分图，每个框O(1)查询）
+        color_scores = self._color_scores(image, [region['bbox'] for region in teeth_regions])
+        
+        for region, color_score in zip(teeth_regions, color_scores):
             x1, y1, x2, y2 = region['bbox']
             tooth_img = image[y1:y2, x1:x2]
             
-            # 方法1: 基于颜色的初步评分
-            color_score = self._color_based_score(tooth_img)
-            
             # 方法2: 基于深度学习的精细评分
             dl_score = self._dl_based_score(tooth_img)
             
@@ -36,6 +55,41 @@ class CleanlinessScorer:
         avg_score = total_score / len(teeth_regions) if teeth_regions else 0
         return avg_score, detailed_scores
     
+    def _color_integral(self, image: np.ndarray) -> np.ndarray:
+        """计算健康/牙菌斑颜色掩码的积分图 (H+1, W+1, 2)，通道0为健康，通道1为牙菌斑"""
+        healthy_mask = cv2.inRange(image, *(np.array(b, np.uint8) for b in self.color_ranges['healthy']))
+        plaque_mask = cv2.inRange(image, *(np.array(b, np.uint8) for b in self.color_ranges['plaque']))
+        masks = cv2.merge((healthy_mask, plaque_mask))
+        # 0/255 -> 0/1，避免大图积分溢出int32
+        np.minimum(masks, 1, out=masks)
+        return cv2.integral(masks, sdepth=cv2.CV_32S)
+    
+    def _color_pixel_counts(self, image: np.ndarray, bboxes: List[List[int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """批量查询每个框内的健康像素数、牙菌斑像素数和总像素数"""
+        if not bboxes:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        
+        height, width = image.shape[:2]
+        boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+        x1 = np.clip(boxes[:, 0], 0, width)
+        y1 = np.clip(boxes[:, 1], 0, height)
+        x2 = np.clip(boxes[:, 2], x1, width)
+        y2 = np.clip(boxes[:, 3], y1, height)
+        
+        integral = self._color_integral(image)
+        sums = (integral[y2, x2].astype(np.int64) - integral[y1, x2]
+                - integral[y2, x1] + integral[y1, x1])
+        return sums[:, 0], sums[:, 1], (x2 - x1) * (y2 - y1)
+    
+    def _color_scores(self, image: np.ndarray, bboxes: List[List[int]]) -> np.ndarray:
+        """基于颜色阈值的批量评分（结果与逐框 _color_based_score 一致）"""
+        healthy_pixels, _, total_pixels = self._color_pixel_counts(image, bboxes)
+        scores = np.zeros(len(total_pixels), dtype=np.float64)
+        valid = total_pixels > 0
+        scores[valid] = healthy_pixels[valid] / total_pixels[valid] * 100
+        return scores
+    
     def _color_based_score(self, img: np.ndarray) -> float:
         """基于颜色阈值的评分"""
         healthy_mask = cv2.inRange(img, *self.color_ranges['healthy'])
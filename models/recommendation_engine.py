@@ -1,81 +1,188 @@
 from typing import Dict, List
-import xgboost as xgb
+from collections import OrderedDict
+import threading
 import numpy as np
-import json
+from config import CLINICAL_RULES_FILE, RULES_RELOAD_INTERVAL
+from .rule_engine import ClinicalRuleEngine, CompiledRuleSet
+
+# 模型输入特征（特征矩阵的前几列，其后为当前规则集引用的规则特征列）
+FEATURE_NAMES = ["cleanliness_score", "coverage_score", "caries_history", "gingivitis"]
 
 class RecommendationEngine:
     """混合推荐引擎（规则+机器学习）"""
     
-    def __init__(self):
-        self.rule_base = self._load_rules()
-        self.ml_model = self._load_model()
-        
-    def _load_rules(self) -> Dict:
-        """加载临床规则"""
-        return {
-            "caries_history": {
-                "must": ["floss"],
-                "suggest": ["fluoride_toothpaste"]
-            },
-            "gingivitis": {
-                "must": ["soft_bristle"],
-                "suggest": ["mouthwash"]
-            }
-        }
+    def __init__(self, rules_path: str = None, cache_size: int = 65536):
+        self.rule_engine = ClinicalRuleEngine(rules_path or CLINICAL_RULES_FILE, RULES_RELOAD_INTERVAL)
+        self._cache_ruleset = None
+        self._ml_model = None
+        self._model_lock = threading.Lock()
+        # 特征向量 -> 推荐结果 的记忆缓存（LRU）
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    @property
+    def ml_model(self):
+        """懒加载XGBoost模型（首次访问时才导入xgboost）"""
+        if self._ml_model is None:
+            with self._model_lock:
+                if self._ml_model is None:
+                    self._ml_model = self._load_model()
+        return self._ml_model
     
-    def _load_model(self) -> xgb.Booster:
+    def reload_model(self):
+        """重新加载模型并清空记忆缓存（模型更新后调用）"""
+        with self._model_lock:
+            self._ml_model = self._load_model()
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def warmup(self):
+        """加载模型并跑一次示例预测"""
+        self._ml_predict({})
+    
+    def _load_model(self) -> "xgb.Booster":
         """加载XGBoost模型（示例）"""
+        import xgboost as xgb
         # TODO: 替换为实际训练好的模型
         return xgb.Booster()
     
+    @staticmethod
+    def _model_features(inputs: Dict) -> np.ndarray:
+        """单个用户画像 -> 模型特征向量"""
+        return np.array([
+            inputs.get("cleanliness_score", 50) / 100,
+            inputs.get("coverage_score", 50) / 100,
+            1 if inputs.get("caries_history") else 0,
+            1 if inputs.get("gingivitis") else 0
+        ], dtype=np.float64)
+    
+    def build_features(self, inputs: Dict, ruleset: CompiledRuleSet = None) -> np.ndarray:
+        """单个用户画像 -> 特征向量（模型特征 + 规则集的规则特征，默认当前规则集）"""
+        ruleset = ruleset or self.rule_engine.ruleset
+        return np.concatenate([self._model_features(inputs), ruleset.encode_profile(inputs)])
+    
+    def build_feature_matrix(self, profiles: List[Dict], ruleset: CompiledRuleSet = None) -> np.ndarray:
+        """多个用户画像 -> 特征矩阵 (N, len(FEATURE_NAMES) + 规则特征数)"""
+        ruleset = ruleset or self.rule_engine.ruleset
+        if not profiles:
+            return np.zeros((0, len(FEATURE_NAMES) + len(ruleset.feature_names)), dtype=np.float64)
+        model_features = np.stack([self._model_features(p) for p in profiles])
+        return np.hstack([model_features, ruleset.encode_profiles(profiles)])
+    
     def generate_recommendation(self, inputs: Dict) -> Dict:
         """生成个性化刷牙方案"""
-        # 1. 应用临床规则
-        rule_results = self._apply_rules(inputs)
+        ruleset = self.rule_engine.ruleset
+        result = self.generate_recommendations_batch(self.build_features(inputs, ruleset)[None, :], ruleset)[0]
+        return {key: list(values) for key, values in result.items()}
+    
+    def generate_recommendations_for_profiles(self, profiles: List[Dict]) -> List[Dict]:
+        """批量生成刷牙方案（特征编码和规则推理使用同一个规则集快照，不受期间的热加载影响）"""
+        ruleset = self.rule_engine.ruleset
+        return self.generate_recommendations_batch(self.build_feature_matrix(profiles, ruleset), ruleset)
+    
+    def generate_recommendations_batch(self, features: np.ndarray, ruleset: CompiledRuleSet = None) -> List[Dict]:
+        """
+        批量生成刷牙方案
+
+        Args:
+            features: 特征矩阵，见 build_feature_matrix
+            ruleset: 构建特征矩阵时使用的规则集（默认当前规则集；规则热加载后需重新构建特征矩阵）
+
+        Returns:
+            与输入行一一对应的推荐结果；相同特征行共享同一个结果对象，调用方应视为只读
+        """
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        ruleset = ruleset or self.rule_engine.ruleset
+        expected_columns = len(FEATURE_NAMES) + len(ruleset.feature_names)
+        if features.ndim != 2 or features.shape[1] != expected_columns:
+            raise ValueError(f"特征矩阵应为 (N, {expected_columns})，实际为 {features.shape}")
+        if len(features) == 0:
+            return []
+        
+        # 规则集热加载后缓存结果失效
+        with self._cache_lock:
+            if self._cache_ruleset is not ruleset:
+                self._cache.clear()
+                self._cache_ruleset = ruleset
+
+        # 批内去重后再查缓存，只对未命中的特征行做预测
+        unique_rows, inverse = np.unique(features, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        unique_results = [None] * len(unique_rows)
+        missing = []
+        with self._cache_lock:
+            for i, row in enumerate(unique_rows):
+                cached = self._cache.get(row.tobytes())
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(row.tobytes())
+                    unique_results[i] = cached
+
+        if missing:
+            computed = self._predict_rows(unique_rows[missing], ruleset)
+            with self._cache_lock:
+                for i, result in zip(missing, computed):
+                    unique_results[i] = result
+                    self._cache[unique_rows[i].tobytes()] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [unique_results[i] for i in inverse]
+    
+    def _predict_rows(self, features: np.ndarray, ruleset) -> List[Dict]:
+        """对去重后的特征行执行规则+模型推理"""
+        model_features = features[:, :len(FEATURE_NAMES)]
         
-        # 2. 机器学习预测
-        ml_results = self._ml_predict(inputs)
+        # 1. 应用临床规则（编译后的向量化规则集）
+        rule_results = ruleset.recommend(features[:, len(FEATURE_NAMES):])
         
+        # 2. 机器学习预测（in-place预测，不构造DMatrix）
+        scores = self._ml_scores(model_features)
+        gingivitis = features[:, FEATURE_NAMES.index("gingivitis")] > 0.5
+
         # 3. 混合决策
-        return {
-            "must": list(set(rule_results["must"] + ml_results["must"])),
-            "suggest": list(set(rule_results["suggest"] + ml_results["suggest"])),
-            "avoid": ml_results["avoid"]
-        }
+        results = []
+        for rules, score, has_gingivitis in zip(rule_results, scores, gingivitis):
+            ml_results = self._map_prediction(score, has_gingivitis)
+            results.append({
+                "must": sorted(set(rules["must"] + ml_results["must"])),
+                "suggest": sorted(set(rules["suggest"] + ml_results["suggest"])),
+                "avoid": sorted(set(rules["avoid"] + ml_results["avoid"]))
+            })
+        return results
     
     def _apply_rules(self, inputs: Dict) -> Dict:
         """应用临床规则逻辑"""
-        recommendations = {"must": [], "suggest": []}
-        
-        # 检查龋齿历史
-        if inputs.get("caries_history"):
-            recommendations["must"].extend(self.rule_base["caries_history"]["must"])
-            recommendations["suggest"].extend(self.rule_base["caries_history"]["suggest"])
-            
-        # 检查牙龈炎
-        if inputs.get("gingivitis"):
-            recommendations["must"].extend(self.rule_base["gingivitis"]["must"])
-            recommendations["suggest"].extend(self.rule_base["gingivitis"]["suggest"])
-            
-        return recommendations
+        ruleset = self.rule_engine.ruleset
+        return ruleset.recommend(ruleset.encode_profile(inputs)[None, :])[0]
     
-    def _ml_predict(self, inputs: Dict) -> Dict:
-        """机器学习预测逻辑"""
-        # 示例特征工程
-        features = np.array([
-            inputs.get("cleanliness_score", 50) / 100,
-            inputs.get("coverage_score", 50) / 100,
-            1 if inputs.get("caries_history") else 0,
-            1 if inputs.get("gingivitis") else 0
-        ]).reshape(1, -1)
-        
+    def _ml_scores(self, features: np.ndarray) -> np.ndarray:
+        """模型打分（优先使用in-place预测）"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
         # 示例预测（实际应使用训练好的模型）
-        dmatrix = xgb.DMatrix(features)
-        pred = self.ml_model.predict(dmatrix)
-        
+        model = self.ml_model
+        if hasattr(model, "inplace_predict"):
+            pred = model.inplace_predict(features)
+        else:
+            # 旧版本xgboost不支持in-place预测（模型本身的错误如XGBoostError照常抛出）
+            import xgboost as xgb
+            pred = model.predict(xgb.DMatrix(features))
+        return np.asarray(pred, dtype=np.float32).reshape(len(features), -1)[:, 0]
+    
+    @staticmethod
+    def _map_prediction(score: float, has_gingivitis: bool) -> Dict:
+        """模型分数 -> 推荐项"""
         # 示例结果映射
         return {
-            "must": ["fluoride_toothpaste"] if pred[0] > 0.7 else [],
+            "must": ["fluoride_toothpaste"] if score > 0.7 else [],
             "suggest": ["mouthwash"],
-            "avoid": ["hard_bristle"] if inputs.get("gingivitis") else []
-        }
\ No newline at end of file
+            "avoid": ["hard_bristle"] if has_gingivitis else []
+        }
+    
+    def _ml_predict(self, inputs: Dict) -> Dict:
+        """机器学习预测逻辑"""
+        features = self._model_features(inputs)[None, :]
+        has_gingivitis = features[0, FEATURE_NAMES.index("gingivitis")] > 0.5
+        return self._map_prediction(self._ml_scores(features)[0], has_gingivitis)
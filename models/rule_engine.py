@@ -0,0 +1,318 @@
+"""
+声明式临床规则引擎
+规则文件（JSON/YAML）在加载时编译为按位运算的谓词位图：
+    1. 所有规则中出现的原子条件去重后，按运算符分组对整列特征一次性比较，得到 (N, P) 布尔矩阵，
+       再沿用户维度打包为 (P, N/8) 位图
+    2. 规则命中 = 其 all 条件位图按位与，再与 any 条件位图按位或的结果相与
+    3. 推荐项命中 = 给出该推荐项的规则命中位图按位或，每种推荐组合只展开一次
+规则文件修改后按mtime自动热加载，无需重启worker。
+
+规则文件示例:
+    {
+      "rules": [
+        {
+          "id": "teen_gingivitis",
+          "all": [
+            {"feature": "age", "op": "between", "value": [12, 18]},
+            {"feature": "gingivitis", "op": "==", "value": true}
+          ],
+          "any": [
+            {"feature": "region_scores.upper_left", "op": "<", "value": 60},
+            {"feature": "brushing_frequency", "op": "in", "value": ["once", "rarely"]}
+          ],
+          "must": ["soft_bristle"],
+          "suggest": ["mouthwash"],
+          "avoid": ["hard_bristle"]
+        }
+      ]
+    }
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+ACTION_TYPES = ("must", "suggest", "avoid")
+COMPARISON_OPS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+SUPPORTED_OPS = tuple(COMPARISON_OPS) + ("between", "in")
+
+
+def lookup_feature(profile: Dict, name: str) -> Any:
+    """按点号路径读取用户画像中的字段（如 region_scores.upper_left）"""
+    value = profile
+    for key in name.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+class CompiledRuleSet:
+    """编译后的规则集（不可变，热加载时整体替换）"""
+
+    def __init__(self, spec: Dict, source: str = "<memory>"):
+        self.source = source
+        self.rules = spec.get("rules", [])
+        self.rule_ids = [rule.get("id", f"rule_{i}") for i, rule in enumerate(self.rules)]
+
+        predicates = []
+        predicate_index = {}
+        all_links, any_links = [], []
+        for rule in self.rules:
+            for clause, links in (("all", all_links), ("any", any_links)):
+                indices = []
+                for predicate in rule.get(clause, []):
+                    self._validate_predicate(predicate, rule)
+                    key = json.dumps(predicate, sort_keys=True)
+                    if key not in predicate_index:
+                        predicate_index[key] = len(predicates)
+                        predicates.append(predicate)
+                    indices.append(predicate_index[key])
+                links.append(indices)
+        self.predicates = predicates
+
+        # 特征列：按首次出现顺序；出现字符串取值的特征视为类别特征，出现布尔取值的视为布尔特征
+        self.feature_names = list(dict.fromkeys(p["feature"] for p in predicates))
+        self._columns = {name: i for i, name in enumerate(self.feature_names)}
+        self.vocabularies = {}
+        self.boolean_features = set()
+        for predicate in predicates:
+            values = predicate["value"] if isinstance(predicate["value"], list) else [predicate["value"]]
+            if any(isinstance(v, bool) for v in values):
+                self.boolean_features.add(predicate["feature"])
+            strings = [v for v in values if isinstance(v, str)]
+            if strings:
+                vocab = self.vocabularies.setdefault(predicate["feature"], {})
+                for value in strings:
+                    vocab.setdefault(value, len(vocab))
+
+        self._compile_predicates()
+
+        # 规则 -> 条件下标表 (R, K)，按位运算时用恒真/恒假哨兵行补齐
+        self._true_row = len(predicates)
+        self._false_row = len(predicates) + 1
+        self._all_index = self._pad_index(all_links, self._true_row)
+        self._any_index = self._pad_index(
+            [indices or [self._true_row] for indices in any_links], self._false_row
+        )
+
+        # 推荐项 -> 规则下标，M 为 must/suggest/avoid 三类推荐项拼接后的总数
+        item_rules = {}
+        for r, rule in enumerate(self.rules):
+            for action in ACTION_TYPES:
+                for item in rule.get(action, []):
+                    item_rules.setdefault((action, item), []).append(r)
+        self._action_items = [(action, item) for action in ACTION_TYPES
+                              for item in sorted(i for a, i in item_rules if a == action)]
+        rule_lists = [item_rules[key] for key in self._action_items]
+        self._item_rules = np.array([r for rules in rule_lists for r in rules], dtype=np.int64)
+        self._item_offsets = np.cumsum([0] + [len(rules) for rules in rule_lists[:-1]]).astype(np.int64)
+
+    @staticmethod
+    def _pad_index(links: List[List[int]], pad: int) -> np.ndarray:
+        """将变长下标列表补齐为矩阵"""
+        width = max([len(indices) for indices in links] + [1])
+        index = np.full((len(links), width), pad, dtype=np.int64)
+        for r, indices in enumerate(links):
+            index[r, :len(indices)] = indices
+        return index
+
+    @staticmethod
+    def _validate_predicate(predicate: Dict, rule: Dict):
+        """校验单个条件"""
+        if "feature" not in predicate or "value" not in predicate:
+            raise ValueError(f"规则 {rule.get('id')} 的条件缺少 feature/value: {predicate}")
+        op = predicate.setdefault("op", "==")
+        if op not in SUPPORTED_OPS:
+            raise ValueError(f"规则 {rule.get('id')} 使用了不支持的运算符: {op}")
+        if op == "between" and (not isinstance(predicate["value"], list) or len(predicate["value"]) != 2):
+            raise ValueError(f"规则 {rule.get('id')} 的 between 条件需要 [下限, 上限]")
+        if op == "in" and not isinstance(predicate["value"], list):
+            raise ValueError(f"规则 {rule.get('id')} 的 in 条件需要取值列表")
+
+    def _encode_constant(self, feature: str, value: Any) -> float:
+        """将规则中的常量编码为与特征列一致的数值"""
+        if isinstance(value, str):
+            return float(self.vocabularies[feature][value])
+        if isinstance(value, bool):
+            return 1.0 if value else 0.0
+        return float(value)
+
+    def _compile_predicates(self):
+        """按运算符分组，预先计算列索引与阈值向量"""
+        self._comparison_groups = []
+        for op, func in COMPARISON_OPS.items():
+            members = [i for i, p in enumerate(self.predicates) if p["op"] == op]
+            if members:
+                columns = np.array([self._columns[self.predicates[i]["feature"]] for i in members])
+                thresholds = np.array([self._encode_constant(self.predicates[i]["feature"],
+                                                             self.predicates[i]["value"])
+                                       for i in members], dtype=np.float64)
+                self._comparison_groups.append((func, np.array(members), columns, thresholds))
+
+        between = [i for i, p in enumerate(self.predicates) if p["op"] == "between"]
+        self._between_group = None
+        if between:
+            self._between_group = (
+                np.array(between),
+                np.array([self._columns[self.predicates[i]["feature"]] for i in between]),
+                np.array([self._encode_constant(self.predicates[i]["feature"], self.predicates[i]["value"][0])
+                          for i in between]),
+                np.array([self._encode_constant(self.predicates[i]["feature"], self.predicates[i]["value"][1])
+                          for i in between])
+            )
+
+        self._in_predicates = [
+            (i, self._columns[p["feature"]],
+             np.array([self._encode_constant(p["feature"], v) for v in p["value"]], dtype=np.float64))
+            for i, p in enumerate(self.predicates) if p["op"] == "in"
+        ]
+
+    def encode_profile(self, profile: Dict) -> np.ndarray:
+        """用户画像 -> 规则特征向量（布尔特征按真值编码，其余缺失值为NaN，未知类别为-1）"""
+        row = np.full(len(self.feature_names), np.nan, dtype=np.float64)
+        for i, name in enumerate(self.feature_names):
+            value = lookup_feature(profile, name)
+            if name in self.boolean_features:
+                row[i] = 1.0 if value else 0.0
+            elif value is None:
+                continue
+            elif name in self.vocabularies:
+                row[i] = self.vocabularies[name].get(value, -1) if isinstance(value, str) else np.nan
+            elif isinstance(value, (bool, int, float)):
+                row[i] = float(value)
+        return row
+
+    def encode_profiles(self, profiles: List[Dict]) -> np.ndarray:
+        """多个用户画像 -> 规则特征矩阵 (N, F)"""
+        if not profiles:
+            return np.zeros((0, len(self.feature_names)), dtype=np.float64)
+        return np.stack([self.encode_profile(p) for p in profiles])
+
+    def evaluate_predicates(self, features: np.ndarray) -> np.ndarray:
+        """计算条件矩阵 (N, P)"""
+        matrix = np.zeros((len(features), len(self.predicates)), dtype=bool)
+        valid = ~np.isnan(features)
+
+        with np.errstate(invalid="ignore"):
+            for func, members, columns, thresholds in self._comparison_groups:
+                matrix[:, members] = func(features[:, columns], thresholds) & valid[:, columns]
+
+            if self._between_group is not None:
+                members, columns, lower, upper = self._between_group
+                values = features[:, columns]
+                matrix[:, members] = (values >= lower) & (values <= upper) & valid[:, columns]
+
+        for index, column, values in self._in_predicates:
+            matrix[:, index] = np.isin(features[:, column], values)
+
+        return matrix
+
+    def _evaluate_bits(self, features: np.ndarray) -> np.ndarray:
+        """
+        计算按位打包的规则命中 (R, ceil(N/8))
+
+        每个条件对所有用户的结果打包成一行位图，规则命中即对其条件行做按位与/或，
+        计算量与 规则数 × 条件数/规则 × N/8 成正比。
+        """
+        satisfied = np.packbits(self.evaluate_predicates(features).T, axis=1)
+        width = satisfied.shape[1]
+        sentinels = np.array([[0xFF] * width, [0] * width], dtype=np.uint8).reshape(2, width)
+        rows = np.concatenate([satisfied, sentinels])
+
+        active = np.bitwise_and.reduce(rows[self._all_index], axis=1)
+        active &= np.bitwise_or.reduce(rows[self._any_index], axis=1)
+        return active
+
+    def evaluate(self, features: np.ndarray) -> np.ndarray:
+        """计算规则命中矩阵 (N, R)"""
+        if not self.rules:
+            return np.zeros((len(features), 0), dtype=bool)
+        active = self._evaluate_bits(features)
+        return np.unpackbits(active, axis=1, count=len(features)).T.astype(bool)
+
+    def recommend(self, features: np.ndarray) -> List[Dict[str, List[str]]]:
+        """批量生成规则推荐：相同的推荐项组合只展开一次"""
+        if len(features) == 0:
+            return []
+        if not self._action_items:
+            return [{action: [] for action in ACTION_TYPES} for _ in range(len(features))]
+
+        # 推荐项命中 = 给出该推荐项的所有规则命中位图按位或
+        active = self._evaluate_bits(features)
+        hits = np.bitwise_or.reduceat(active[self._item_rules], self._item_offsets, axis=0)
+        hits = np.unpackbits(hits, axis=1, count=len(features)).T
+        packed = np.packbits(hits, axis=1)
+        patterns, inverse = np.unique(packed, axis=0, return_inverse=True)
+
+        expanded = []
+        for pattern in patterns:
+            bits = np.unpackbits(pattern)[:len(self._action_items)]
+            recommendation = {action: [] for action in ACTION_TYPES}
+            for index in np.flatnonzero(bits):
+                action, item = self._action_items[index]
+                recommendation[action].append(item)
+            expanded.append(recommendation)
+        return [expanded[i] for i in inverse.reshape(-1)]
+
+
+def load_rule_spec(path: str) -> Dict:
+    """读取规则文件（.json 或 .yaml/.yml）"""
+    with open(path, "r", encoding="utf-8") as f:
+        if str(path).endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+class ClinicalRuleEngine:
+    """带热加载的临床规则引擎"""
+
+    def __init__(self, rules_path: str, check_interval: float = 2.0):
+        self.rules_path = str(rules_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self._ruleset = CompiledRuleSet({}, self.rules_path)
+        self.reload(force=True)
+
+    @property
+    def ruleset(self) -> CompiledRuleSet:
+        """当前规则集（按间隔检查文件是否更新）"""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.reload()
+        return self._ruleset
+
+    def reload(self, force: bool = False) -> bool:
+        """文件有变化时重新编译规则，返回是否发生了替换"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                mtime = os.stat(self.rules_path).st_mtime_ns
+            except OSError:
+                return False
+            if not force and mtime == self._mtime:
+                return False
+            try:
+                ruleset = CompiledRuleSet(load_rule_spec(self.rules_path), self.rules_path)
+            except Exception as e:
+                # 新规则文件有误时保留旧规则集继续服务
+                print(f"❌ 临床规则加载失败，继续使用旧规则: {e}")
+                self._mtime = mtime
+                return False
+            self._ruleset = ruleset
+            self._mtime = mtime
+            print(f"✅ 临床规则已加载: {len(ruleset.rules)} 条规则, {len(ruleset.predicates)} 个条件")
+            return True
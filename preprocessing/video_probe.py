@@ -0,0 +1,235 @@
+import math
+import struct
+from typing import Dict, List, Optional
+
+import cv2
+
+# 上传流中最多缓存多少字节用于探测（moov通常在faststart文件的前几十KB）
+DEFAULT_PROBE_LIMIT = 4 * 1024 * 1024
+_LEADING_BOXES = {b"ftyp", b"moov", b"free", b"skip", b"wide", b"uuid"}
+
+
+def _boxes(data: memoryview, offset: int = 0, end: int = None):
+    """遍历ISO BMFF(MP4/MOV)盒子，产出 (类型, 负载起点, 负载终点)"""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _find(data: memoryview, path: List[bytes], start: int, end: int):
+    """按路径查找第一个子盒子，返回 (负载起点, 负载终点) 或None"""
+    for kind, payload, box_end in _boxes(data, start, end):
+        if kind == path[0]:
+            return (payload, box_end) if len(path) == 1 else _find(data, path[1:], payload, box_end)
+    return None
+
+
+def parse_moov(moov: bytes) -> Dict:
+    """
+    解析完整的moov盒子（含盒子头），返回视频轨道的尺寸、旋转角度、帧率、时长和编码
+
+    Raises:
+        ValueError: 没有视频轨道或结构损坏
+    """
+    data = memoryview(moov)
+    box = _find(data, [b"moov"], 0, len(data))
+    if box is None:
+        raise ValueError("不是moov盒子")
+    mvhd = _find(data, [b"mvhd"], *box)
+    if mvhd is None:
+        raise ValueError("缺少mvhd")
+    start = mvhd[0]
+    if data[start] == 1:
+        timescale, duration = struct.unpack(">IQ", data[start + 20:start + 32])
+    else:
+        timescale, duration = struct.unpack(">II", data[start + 12:start + 20])
+
+    for kind, payload, end in _boxes(data, *box):
+        if kind != b"trak":
+            continue
+        hdlr = _find(data, [b"mdia", b"hdlr"], payload, end)
+        if hdlr is None or bytes(data[hdlr[0] + 8:hdlr[0] + 12]) != b"vide":
+            continue
+        tkhd = _find(data, [b"tkhd"], payload, end)
+        mdhd = _find(data, [b"mdia", b"mdhd"], payload, end)
+        stts = _find(data, [b"mdia", b"minf", b"stbl", b"stts"], payload, end)
+        stsd = _find(data, [b"mdia", b"minf", b"stbl", b"stsd"], payload, end)
+        if tkhd is None or mdhd is None or stts is None:
+            raise ValueError("视频轨道缺少tkhd/mdhd/stts")
+
+        # tkhd: 末尾8字节为16.16定点的宽高，之前36字节为变换矩阵
+        width, height = (v >> 16 for v in struct.unpack(">II", data[tkhd[1] - 8:tkhd[1]]))
+        a, b = (v / 65536 for v in struct.unpack(">ii", data[tkhd[1] - 44:tkhd[1] - 36]))
+        rotation = int(round(math.degrees(math.atan2(b, a)))) % 360
+
+        start = mdhd[0]
+        if data[start] == 1:
+            track_timescale, track_duration = struct.unpack(">IQ", data[start + 20:start + 32])
+        else:
+            track_timescale, track_duration = struct.unpack(">II", data[start + 12:start + 20])
+
+        # stts: (样本数, 样本时长) 表
+        count = struct.unpack(">I", data[stts[0] + 4:stts[0] + 8])[0]
+        samples = ticks = 0
+        for i in range(count):
+            n, delta = struct.unpack(">II", data[stts[0] + 8 + 8 * i:stts[0] + 16 + 8 * i])
+            samples += n
+            ticks += n * delta
+
+        codec = None
+        if stsd is not None and stsd[1] - stsd[0] >= 16:
+            codec = bytes(data[stsd[0] + 12:stsd[0] + 16]).decode("latin-1")
+            if not width or not height:
+                # 部分文件tkhd宽高为0，退回视觉样本条目中的编码宽高
+                width, height = struct.unpack(">HH", data[stsd[0] + 8 + 32:stsd[0] + 8 + 36])
+
+        seconds = track_duration / track_timescale if track_timescale else 0.0
+        if not seconds and timescale:
+            seconds = duration / timescale
+        return {
+            "container": "mp4",
+            "width": width,
+            "height": height,
+            "rotation": rotation,
+            "fps": round(samples * track_timescale / ticks, 3) if ticks else 0.0,
+            "duration": round(seconds, 3),
+            "frame_count": samples,
+            "codec": codec
+        }
+    raise ValueError("没有视频轨道")
+
+
+class StreamProbe:
+    """
+    上传流的增量探测器
+
+    逐块喂入上传的字节，moov出现在文件前部（faststart）时在其完整到达后立即给出结果；
+    先遇到mdat（moov在文件末尾）、不是MP4/MOV或超过probe_limit时放弃流式探测，
+    由调用方在上传完成后用 probe_file 探测。
+    """
+
+    def __init__(self, probe_limit: int = DEFAULT_PROBE_LIMIT):
+        self.probe_limit = probe_limit
+        self.buffer = bytearray()
+        self.done = False
+        self.result: Optional[Dict] = None
+
+    def feed(self, chunk: bytes) -> Optional[Dict]:
+        """喂入一块数据，探测完成时返回结果（之后不再缓存数据）"""
+        if self.done:
+            return self.result
+        self.buffer += chunk
+        data = memoryview(self.buffer)
+        offset = 0
+        while offset + 8 <= len(data):
+            size, kind = struct.unpack(">I4s", data[offset:offset + 8])
+            if kind not in _LEADING_BOXES or (offset == 0 and kind != b"ftyp"):
+                # 到达mdat或其他媒体数据，或不是ISO BMFF文件
+                return self._finish(None)
+            if size == 1:
+                if offset + 16 > len(data):
+                    break
+                size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            if size < 8:
+                return self._finish(None)
+            if kind == b"moov":
+                if offset + size > len(data):
+                    break
+                try:
+                    return self._finish(parse_moov(bytes(data[offset:offset + size])))
+                except (ValueError, struct.error):
+                    return self._finish(None)
+            offset += size
+        if len(self.buffer) >= self.probe_limit:
+            return self._finish(None)
+        return None
+
+    def _finish(self, result: Optional[Dict]) -> Optional[Dict]:
+        self.done = True
+        self.result = result
+        self.buffer = bytearray()
+        return result
+
+
+def probe_file(path: str) -> Optional[Dict]:
+    """
+    探测已保存的视频文件（MP4/MOV直接定位moov，不解码；其他容器退回OpenCV读取属性）
+
+    Returns:
+        探测结果，无法打开时返回None
+    """
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, kind = struct.unpack(">I4s", header[:8])
+            if offset == 0 and kind != b"ftyp":
+                break
+            if size == 1:
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8:
+                break
+            if kind == b"moov":
+                f.seek(offset)
+                try:
+                    return parse_moov(f.read(size))
+                except (ValueError, struct.error):
+                    break
+            offset += size
+    return _probe_with_opencv(path)
+
+
+def _probe_with_opencv(path: str) -> Optional[Dict]:
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    result = {
+        "container": "opencv",
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "rotation": 0,
+        "fps": round(fps, 3),
+        "duration": round(frame_count / fps, 3) if fps else 0.0,
+        "frame_count": frame_count,
+        "codec": None
+    }
+    cap.release()
+    return result
+
+
+def check_probe(probe: Dict, min_width: int = 640, min_height: int = 480, min_fps: float = 15,
+                max_duration: float = None) -> List[str]:
+    """
+    检查探测结果是否满足拍摄要求（长边/短边分别与要求比较，竖拍视频同样适用）
+
+    Returns:
+        不满足的原因列表，为空表示合格
+    """
+    reasons = []
+    long_side, short_side = max(probe["width"], probe["height"]), min(probe["width"], probe["height"])
+    if long_side < max(min_width, min_height) or short_side < min(min_width, min_height):
+        reasons.append(f"分辨率 {probe['width']}x{probe['height']} 低于 {min_width}x{min_height}")
+    if probe["fps"] < min_fps:
+        reasons.append(f"帧率 {probe['fps']} 低于 {min_fps}")
+    if max_duration is not None and probe["duration"] > max_duration:
+        reasons.append(f"时长 {probe['duration']:.1f} 秒超过 {max_duration} 秒")
+    return reasons
@@ -1,14 +1,19 @@
+import math
 import cv2
 import numpy as np
-from typing import List
+from typing import List, Tuple
 from .image_enhancer import ImageEnhancer
+from .motion_gate import FrameChangeGate
+from .video_probe import probe_file, check_probe
 
 class VideoProcessor:
     """刷牙视频处理器"""
     
-    def __init__(self, target_fps: int = 1):
+    def __init__(self, target_fps: int = 1, fast_enhance: bool = False):
         self.target_fps = target_fps
         self.enhancer = ImageEnhancer()
+        # fast_enhance: 使用LUT近似增强（更快，色彩与标准增强略有差异）
+        self.enhance_frame = self.enhancer.enhance_video_frame if fast_enhance else self.enhancer.enhance
         
     def extract_key_frames(self, video_path: str) -> List[np.ndarray]:
         """提取关键帧(1fps)并增强"""
@@ -24,13 +29,90 @@ class VideoProcessor:
                 break
                 
             if count % frame_interval == 0:
-                enhanced = self.enhancer.enhance(frame)
+                enhanced = self.enhance_frame(frame)
                 frames.append(enhanced)
             count += 1
             
         cap.release()
         return frames
     
+    def extract_adaptive_frames(self, video_path: str, frame_budget: int = None, probe_fps: float = 4.0,
+                                uniform_share: float = 0.3, max_frames: int = None
+                                ) -> Tuple[List[np.ndarray], List[float]]:
+        """
+        按动作强度自适应抽帧并增强
+        
+        第一遍以probe_fps读取灰度缩略图，计算相邻探测帧的分块运动能量；再把帧预算按
+        uniform_share均匀分配、其余按运动能量分配（累积权重等分取样），快速刷牙片段
+        密集采样，静止片段稀疏采样。第二遍只解码并增强选中的帧。
+        
+        Args:
+            frame_budget: 最多抽取的帧数，默认与固定 target_fps 抽帧的帧数相同
+            probe_fps: 探测帧率，也是采样的最高帧率
+            uniform_share: 均匀分配的预算比例（保证静止片段的最低覆盖）
+            max_frames: 帧预算上限（长视频）
+        Returns:
+            (增强后的帧, 对应时间戳(秒))
+        """
+        cap = cv2.VideoCapture(video_path)
+        original_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        probe_interval = max(1, int(round(original_fps / probe_fps)))
+        gate = FrameChangeGate()
+        
+        # 第一遍: 只解码探测帧的缩略图
+        probes, energy, previous = [], [], None
+        count = 0
+        while cap.grab():
+            if count % probe_interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                thumb = gate.thumbnail(frame)
+                energy.append(0.0 if previous is None else gate.difference(thumb, previous))
+                probes.append(count)
+                previous = thumb
+            count += 1
+        cap.release()
+        if not probes:
+            return [], []
+        
+        if frame_budget is None:
+            frame_budget = math.ceil(count / original_fps * self.target_fps)
+        if max_frames is not None:
+            frame_budget = min(frame_budget, max_frames)
+        selected = self._allocate(np.asarray(energy), min(frame_budget, len(probes)), uniform_share)
+        wanted = {probes[i] for i in selected}
+        
+        # 第二遍: 只解码并增强选中的帧
+        frames, timestamps = [], []
+        cap = cv2.VideoCapture(video_path)
+        count = 0
+        while wanted and cap.grab():
+            if count in wanted:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                frames.append(self.enhance_frame(frame))
+                timestamps.append(count / original_fps)
+                wanted.discard(count)
+            count += 1
+        cap.release()
+        return frames, timestamps
+    
+    @staticmethod
+    def _allocate(energy: np.ndarray, budget: int, uniform_share: float) -> List[int]:
+        """按 均匀+运动能量 的混合权重，在累积权重上等间隔选取budget个探测帧"""
+        if budget <= 0:
+            return []
+        weights = np.full(len(energy), uniform_share / len(energy))
+        if energy.sum() > 0:
+            weights += (1 - uniform_share) * energy / energy.sum()
+        else:
+            weights += (1 - uniform_share) / len(energy)
+        cumulative = np.cumsum(weights)
+        targets = (np.arange(budget) + 0.5) / budget * cumulative[-1]
+        return np.unique(np.searchsorted(cumulative, targets)).tolist()
+    
     def analyze_brushing_trajectory(self, frames: List[np.ndarray]) -> dict:
         """分析刷牙动作轨迹"""
         # TODO: 实现轨迹分析算法
@@ -40,15 +122,12 @@ class VideoProcessor:
             "movement_pattern": []
         }
     
-    def check_quality(self, video_path: str) -> bool:
-        """检查视频质量是否合格"""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return False
-            
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-        
-        return width >= 640 and height >= 480 and fps >= 15
\ No newline at end of file
+    def check_quality(self, video_path: str, probe: dict = None) -> bool:
+        """
+        检查视频质量是否合格（分辨率不低于640x480、帧率不低于15fps）
+
+        Args:
+            probe: 已缓存的探测结果（上传时从容器元数据得到），提供时不再打开文件
+        """
+        probe = probe or probe_file(video_path)
+        return probe is not None and not check_probe(probe)
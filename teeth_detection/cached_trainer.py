@@ -0,0 +1,76 @@
+"""
+使用数据集缓存的YOLOv8分割训练器（对应 requirements.txt 固定的 ultralytics 8.0.x 模块布局）
+训练图像从 dataset_cache 的内存映射数组读取，不再逐epoch解码和缩放JPEG。
+"""
+
+import os
+
+from ultralytics.yolo.data.dataset import YOLODataset
+from ultralytics.yolo.utils import colorstr
+from ultralytics.yolo.utils.torch_utils import de_parallel
+from ultralytics.yolo.v8.segment import SegmentationTrainer
+
+from teeth_detection.dataset_cache import open_cache
+
+
+class CachedYOLODataset(YOLODataset):
+    """
+    从预处理缓存读取的YOLO数据集
+
+    图像直接取内存映射上的切片（写时复制，数据增强原地修改不会写回缓存），
+    标签为缓存中换算到letterbox图像的归一化坐标，不再逐epoch解码和缩放JPEG。
+    """
+
+    def get_img_files(self, img_path):
+        self.cache = open_cache(img_path, self.imgsz, mmap_mode="c")
+        return [os.path.join(img_path, name) for name in self.cache.files]
+
+    def get_labels(self):
+        labels = []
+        for i, im_file in enumerate(self.im_files):
+            boxes, segments = self.cache.labels(i)
+            labels.append({
+                "im_file": im_file,
+                "shape": (self.cache.imgsz, self.cache.imgsz),
+                "cls": boxes[:, :1].copy(),
+                "bboxes": boxes[:, 1:].copy(),
+                "segments": [segment.copy() for segment in segments] if len(segments) and all(
+                    len(segment) for segment in segments) else [],
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh"
+            })
+        return labels
+
+    def load_image(self, i):
+        image = self.cache.images[i]
+        if self.augment:
+            # 与BaseDataset一致: 记录最近加载的图像供mosaic选取
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return image, image.shape[:2], image.shape[:2]
+
+
+class CachedSegmentationTrainer(SegmentationTrainer):
+    """使用数据集缓存的分割训练器（参数与 ultralytics.yolo.data.build.build_yolo_dataset 一致）"""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        stride = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        return CachedYOLODataset(
+            img_path=img_path,
+            imgsz=self.args.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=self.args,
+            rect=self.args.rect or mode == "val",
+            cache=None,
+            single_cls=self.args.single_cls or False,
+            stride=stride,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=colorstr(f"{mode}: "),
+            use_segments=self.args.task == "segment",
+            classes=self.args.classes,
+            data=self.data,
+            fraction=self.args.fraction if mode == "train" else 1.0
+        )
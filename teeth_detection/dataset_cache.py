@@ -0,0 +1,230 @@
+"""
+训练数据集缓存
+一次性把 images/<split> 下的图像解码、letterbox到 imgsz×imgsz，写入内存映射的uint8数组，
+YOLO标签同时换算到letterbox后的归一化坐标，按图像建立偏移索引。
+训练时直接从内存映射切片读取，每个epoch不再重复解码和缩放JPEG。
+
+目录结构（<dataset>/cache/<split>-<imgsz>/）:
+    images.npy            (N, imgsz, imgsz, 3) uint8，BGR
+    boxes.npy             (M, 5) float32，[类别, cx, cy, w, h]（归一化到letterbox图像）
+    box_offsets.npy       (N+1,) int64，第i张图像的框为 boxes[box_offsets[i]:box_offsets[i+1]]
+    segments.npy          (P, 2) float32，分割多边形顶点（归一化到letterbox图像）
+    segment_offsets.npy   (M+1,) int64，第j个框的多边形为 segments[segment_offsets[j]:segment_offsets[j+1]]
+    meta.json             尺寸、源文件列表（大小和修改时间，用于判断缓存是否过期）
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+CACHE_VERSION = 1
+
+
+def cache_dir_for(image_dir, imgsz: int) -> Path:
+    """images/<split> 对应的缓存目录"""
+    image_dir = Path(image_dir)
+    return image_dir.parent.parent / "cache" / f"{image_dir.name}-{imgsz}"
+
+
+def label_path_for(image_path: Path) -> Path:
+    """YOLO约定: .../images/<split>/x.jpg -> .../labels/<split>/x.txt"""
+    parts = list(image_path.parts)
+    index = len(parts) - 1 - parts[::-1].index("images")
+    parts[index] = "labels"
+    return Path(*parts).with_suffix(".txt")
+
+
+def letterbox(image: np.ndarray, imgsz: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    等比缩放后居中填充为 imgsz×imgsz（填充值114，与 TeethImagePreprocessor.resize_image 一致）
+
+    Returns:
+        (图像, 缩放比例, (左填充, 上填充))
+    """
+    h, w = image.shape[:2]
+    scale = min(imgsz / w, imgsz / h)
+    new_w, new_h = int(w * scale), int(h * scale)
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_left, pad_top = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+    padded = cv2.copyMakeBorder(resized, pad_top, imgsz - new_h - pad_top, pad_left, imgsz - new_w - pad_left,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, (pad_left, pad_top)
+
+
+def _source_files(image_dir: Path) -> List[Dict]:
+    files = []
+    for path in sorted(p for p in image_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES):
+        stat = path.stat()
+        label = label_path_for(path)
+        label_mtime = label.stat().st_mtime if label.exists() else None
+        files.append({"name": path.name, "size": stat.st_size, "mtime": stat.st_mtime, "label_mtime": label_mtime})
+    return files
+
+
+def _read_labels(label_path: Path) -> List[Tuple[int, np.ndarray]]:
+    """读取YOLO标签: 每行为 类别 cx cy w h（检测）或 类别 x1 y1 x2 y2 ...（分割多边形）"""
+    if not label_path.exists():
+        return []
+    labels = []
+    for line in label_path.read_text().splitlines():
+        values = line.split()
+        if len(values) >= 5:
+            labels.append((int(values[0]), np.array(values[1:], dtype=np.float32)))
+    return labels
+
+
+class DatasetCache:
+    """只读打开的数据集缓存"""
+
+    def __init__(self, cache_dir, mmap_mode: str = "r"):
+        """
+        Args:
+            mmap_mode: "r" 只读; "c" 写时复制（交给会原地修改图像的数据增强时使用，不会写回文件）
+        """
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.imgsz = self.meta["imgsz"]
+        self.images = np.load(self.cache_dir / "images.npy", mmap_mode=mmap_mode)
+        self.boxes = np.load(self.cache_dir / "boxes.npy")
+        self.box_offsets = np.load(self.cache_dir / "box_offsets.npy")
+        self.segments = np.load(self.cache_dir / "segments.npy")
+        self.segment_offsets = np.load(self.cache_dir / "segment_offsets.npy")
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    @property
+    def files(self) -> List[str]:
+        return [f["name"] for f in self.meta["files"]]
+
+    def labels(self, index: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """第index张图像的 (框 (n, 5), 每个框的多边形 [(k, 2)])，均为视图"""
+        start, end = self.box_offsets[index], self.box_offsets[index + 1]
+        segments = [self.segments[self.segment_offsets[j]:self.segment_offsets[j + 1]] for j in range(start, end)]
+        return self.boxes[start:end], segments
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+        boxes, segments = self.labels(index)
+        return self.images[index], boxes, segments
+
+    def iter_batches(self, batch_size: int, shuffle: bool = False,
+                     seed: int = None) -> Iterator[Tuple[np.ndarray, List[np.ndarray]]]:
+        """
+        按批读取 (图像 (b, imgsz, imgsz, 3), 每张图像的框)
+
+        每批是内存映射上的连续切片（零拷贝）；shuffle打乱的是批的顺序而不是批内样本，
+        避免花式索引触发整批复制。
+        """
+        starts = np.arange(0, len(self), batch_size)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(starts)
+        for start in starts:
+            end = min(start + batch_size, len(self))
+            yield self.images[start:end], [self.labels(i)[0] for i in range(start, end)]
+
+
+def is_fresh(image_dir, imgsz: int) -> bool:
+    """缓存存在且源图像/标签的文件列表、大小和修改时间均未变化"""
+    meta_path = cache_dir_for(image_dir, imgsz) / "meta.json"
+    if not meta_path.exists():
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return (meta.get("version") == CACHE_VERSION and meta.get("imgsz") == imgsz
+            and meta.get("files") == _source_files(Path(image_dir)))
+
+
+def build_cache(image_dir, imgsz: int = 640, workers: int = None) -> Path:
+    """
+    解码、letterbox并写入缓存（图像解码和缩放在线程池中并行，OpenCV会释放GIL）
+
+    Returns:
+        缓存目录
+    """
+    image_dir = Path(image_dir)
+    cache_dir = cache_dir_for(image_dir, imgsz)
+    os.makedirs(cache_dir, exist_ok=True)
+    files = _source_files(image_dir)
+    if not files:
+        raise ValueError(f"没有找到训练图像: {image_dir}")
+
+    # 先写到本进程独有的临时文件，完成后再替换，避免中断留下不完整的缓存被误用
+    tmp_images = cache_dir / f"images.{os.getpid()}.tmp.npy"
+    images = np.lib.format.open_memmap(tmp_images, mode="w+", dtype=np.uint8, shape=(len(files), imgsz, imgsz, 3))
+
+    def load(index: int):
+        path = image_dir / files[index]["name"]
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"无法解码图像: {path}")
+        h0, w0 = image.shape[:2]
+        images[index], scale, (pad_left, pad_top) = letterbox(image, imgsz)
+
+        # 标签从原图归一化坐标换算到letterbox图像归一化坐标
+        boxes, segments = [], []
+        for cls, values in _read_labels(label_path_for(path)):
+            if len(values) == 4:
+                cx, cy, w, h = values
+                points = np.array([[cx - w / 2, cy - h / 2], [cx + w / 2, cy + h / 2]], dtype=np.float32)
+                polygon = np.zeros((0, 2), dtype=np.float32)
+            else:
+                points = polygon = values[:len(values) // 2 * 2].reshape(-1, 2)
+            points = (points * (w0 * scale, h0 * scale) + (pad_left, pad_top)) / imgsz
+            (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+            boxes.append([cls, (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+            if len(polygon):
+                polygon = (polygon * (w0 * scale, h0 * scale) + (pad_left, pad_top)) / imgsz
+            segments.append(polygon.astype(np.float32))
+        return boxes, segments
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loaded = list(executor.map(load, range(len(files))))
+    images.flush()
+    del images
+
+    counts = [len(boxes) for boxes, _ in loaded]
+    all_boxes = [box for boxes, _ in loaded for box in boxes]
+    all_segments = [segment for _, segments in loaded for segment in segments]
+    np.save(cache_dir / "boxes.npy", np.array(all_boxes, dtype=np.float32).reshape(-1, 5))
+    np.save(cache_dir / "box_offsets.npy", np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+    np.save(cache_dir / "segments.npy", np.concatenate(all_segments or [np.zeros((0, 2))]).astype(np.float32))
+    np.save(cache_dir / "segment_offsets.npy",
+            np.concatenate([[0], np.cumsum([len(s) for s in all_segments])]).astype(np.int64))
+    os.replace(tmp_images, cache_dir / "images.npy")
+    with open(cache_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "imgsz": imgsz, "files": files}, f, ensure_ascii=False)
+    return cache_dir
+
+
+@contextmanager
+def _build_lock(cache_dir: Path):
+    """缓存目录的进程间排他锁（并行训练的多个进程同时打开同一缓存时只有一个构建）"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_dir / ".lock", "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def open_cache(image_dir, imgsz: int = 640, mmap_mode: str = "r", workers: int = None) -> DatasetCache:
+    """打开缓存，不存在或源文件有变化时先重建（持锁后再次检查，其他进程刚建好时直接使用）"""
+    cache_dir = cache_dir_for(image_dir, imgsz)
+    if not is_fresh(image_dir, imgsz):
+        with _build_lock(cache_dir):
+            if not is_fresh(image_dir, imgsz):
+                print(f"构建数据集缓存: {image_dir} ({imgsz}x{imgsz})")
+                build_cache(image_dir, imgsz, workers)
+    return DatasetCache(cache_dir, mmap_mode)
@@ -1,9 +1,11 @@
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from ultralytics import YOLO
 import cv2
 from .preprocessing import TeethImagePreprocessor
 from .postprocessing import TeethDetectionPostprocessor
+from utils.masks import extract_masks, encode_masks
+from utils.render import to_display, draw_overlays, encode_image
 
 class TeethDetectionInference:
     """牙齿检测推理类"""
@@ -25,8 +27,9 @@ class TeethDetectionInference:
             print(f"❌ 模型加载失败: {str(e)}")
             return False
     
-    def predict(self, image_data: bytes) -> Dict[str, Any]:
-        """执行完整的牙齿检测推理"""
+    def predict(self, image_data: bytes, mask_format: str = None,
+                full_resolution_masks: bool = False) -> Dict[str, Any]:
+        """执行完整的牙齿检测推理（mask_format为rle/polygon时附带分割掩码）"""
         if self.model is None:
             if not self.load_model():
                 return {'error': '模型加载失败'}
@@ -39,7 +42,9 @@ class TeethDetectionInference:
             results = self.model(processed_image, conf=self.confidence_threshold, verbose=False)
             
             # 解析原始检测结果
-            raw_detections = self._parse_yolo_results(results, preprocess_info)
+            raw_detections = self._parse_yolo_results(
+                results, preprocess_info, mask_format, full_resolution_masks
+            )
             
             # 后处理
             final_result = self.postprocessor.postprocess(
@@ -54,7 +59,9 @@ class TeethDetectionInference:
         except Exception as e:
             return {'error': f'推理失败: {str(e)}'}
     
-    def _parse_yolo_results(self, results, preprocess_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _parse_yolo_results(self, results, preprocess_info: Dict[str, Any],
+                            mask_format: str = None,
+                            full_resolution_masks: bool = False) -> List[Dict[str, Any]]:
         """解析YOLO模型输出结果"""
         raw_detections = []
         
@@ -72,6 +79,12 @@ class TeethDetectionInference:
         confidences = result.boxes.conf.cpu().numpy()  # 置信度
         class_ids = result.boxes.cls.cpu().numpy()  # 类别ID
         
+        # 分割掩码（按需编码，默认原型分辨率）
+        masks = []
+        if mask_format:
+            masks = encode_masks(extract_masks(result), result.orig_shape[:2],
+                                 mask_format, full_resolution_masks)
+        
         for i in range(len(boxes)):
             # 转换为整数坐标
             x1, y1, x2, y2 = boxes[i].astype(int)
@@ -81,12 +94,15 @@ class TeethDetectionInference:
             # 获取类别名称
             class_name = self._get_class_name(class_id)
             
-            raw_detections.append({
+            detection = {
                 'bbox': [x1, y1, x2, y2],
                 'confidence': confidence,
                 'class_id': class_id,
                 'class_name': class_name
-            })
+            }
+            if i < len(masks):
+                detection['mask'] = masks[i]
+            raw_detections.append(detection)
         
         return raw_detections
     
@@ -101,32 +117,32 @@ class TeethDetectionInference:
         }
         return class_names.get(class_id, f'class_{class_id}')
     
-    def visualize_detections(self, image_data: bytes, detections: List[Dict[str, Any]]) -> bytes:
-        """可视化检测结果并返回图像字节数据"""
-        # 加载原始图像
-        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    def visualize_detections(self, image: Union[bytes, np.ndarray], detections: List[Dict[str, Any]],
+                             max_width: int = None, fmt: str = "jpeg", quality: int = 90) -> bytes:
+        """
+        可视化检测结果并返回图像字节数据
         
-        # 绘制检测框
-        for det in detections:
-            x1, y1, x2, y2 = map(int, det['bbox'])
-            confidence = det['confidence']
-            class_name = det['class_name']
-            
-            # 绘制边界框
-            color = self._get_class_color(class_name)
-            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
-            
-            # 绘制标签
-            label = f"{class_name}: {confidence:.2f}"
-            cv2.putText(image, label, (x1, y1 - 10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        Args:
+            image: 已解码的BGR图像（推荐，避免重复解码）或原始图像字节
+            max_width: 可选的显示宽度，超过时先缩小再绘制
+            fmt: jpeg 或 webp
+            quality: 编码质量
+        """
+        if isinstance(image, (bytes, bytearray)):
+            image = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        else:
+            image = image.copy()
+        
+        scale = 1.0
+        if max_width:
+            image, scale = to_display(image, max_width)
         
-        # 转换为字节数据
-        success, encoded_image = cv2.imencode('.jpg', image)
-        if not success:
-            raise ValueError("无法编码可视化图像")
+        boxes = np.array([det['bbox'] for det in detections], dtype=np.float32).reshape(-1, 4) * scale
+        colors = [self._get_class_color(det['class_name']) for det in detections]
+        labels = [f"{det['class_name']}: {det['confidence']:.2f}" for det in detections]
+        draw_overlays(image, boxes, colors, labels)
         
-        return encoded_image.tobytes()
+        return encode_image(image, fmt, quality)[0]
     
     def _get_class_color(self, class_name: str) -> tuple:
         """根据类别名称获取颜色"""
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+YOLOv8 超参数搜索
+在搜索空间（lr0、momentum、imgsz、数据增强强度）中随机采样若干组超参数，
+在CPU线程预算内并行训练多个试验：每个试验进程分得一组独立的CPU（torch/OpenCV线程数随之设置），
+每个epoch的验证指标写入本地SQLite结果库，表现低于同期其他试验中位数的试验提前停止（中位数剪枝）。
+完成的试验额外测量CPU推理延迟，最终按 精度-延迟 帕累托前沿给出候选配置。
+各试验用到的每种imgsz的数据集缓存在进程池启动前预先构建，试验进程只读打开。
+
+用法: python teeth_detection/sweep.py [试验数] [并行数] [每个试验的epoch数]
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+# 直接以脚本运行时把项目根目录加入模块路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.cpu_budget import thread_budget
+
+SWEEP_DB = "teeth_detection/runs/sweeps.db"
+DATA_CONFIG = "teeth_detection/data/teeth.yaml"
+# 搜索空间: log 对数均匀, uniform 均匀, choice 离散取值
+DEFAULT_SEARCH_SPACE = {
+    "lr0": {"log": [1e-4, 5e-2]},
+    "momentum": {"uniform": [0.85, 0.98]},
+    "imgsz": {"choice": [320, 480, 640]},
+    "augment": {"uniform": [0.0, 1.0]},
+}
+PRUNE_WARMUP_EPOCHS = 5  # 前几个epoch指标波动大，不剪枝
+PRUNE_MIN_TRIALS = 3     # 同一epoch至少有几个其他试验的指标才进行比较
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    space TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sweep_id INTEGER NOT NULL REFERENCES sweeps (id),
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    threads INTEGER,
+    started_at REAL,
+    finished_at REAL,
+    epochs INTEGER NOT NULL DEFAULT 0,
+    fitness REAL,
+    map50 REAL,
+    map50_95 REAL,
+    latency_ms REAL,
+    weights TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trials_sweep ON trials (sweep_id, status);
+CREATE TABLE IF NOT EXISTS trial_metrics (
+    trial_id INTEGER NOT NULL REFERENCES trials (id),
+    epoch INTEGER NOT NULL,
+    fitness REAL NOT NULL,
+    map50 REAL,
+    map50_95 REAL,
+    epoch_time REAL,
+    PRIMARY KEY (trial_id, epoch)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_trial_metrics_epoch ON trial_metrics (epoch, trial_id);
+"""
+
+
+class SweepDatabase:
+    """超参数搜索结果库（SQLite，各试验进程各自打开连接）"""
+
+    def __init__(self, db_path=SWEEP_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def create_sweep(self, name: str, space: Dict, settings: Dict, trial_params: List[Dict]) -> int:
+        """登记一次搜索及其全部待运行试验"""
+        with self._lock, self._conn:
+            sweep_id = self._conn.execute(
+                "INSERT INTO sweeps (name, space, settings, created_at) VALUES (?, ?, ?, ?)",
+                (name, json.dumps(space), json.dumps(settings), time.time())
+            ).lastrowid
+            self._conn.executemany("INSERT INTO trials (sweep_id, params, status) VALUES (?, ?, 'pending')",
+                                   [(sweep_id, json.dumps(params)) for params in trial_params])
+            return sweep_id
+
+    def start_trial(self, trial_id: int, threads: int = None):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE trials SET status = 'running', threads = ?, started_at = ? WHERE id = ?",
+                               (threads, time.time(), trial_id))
+
+    def report(self, trial_id: int, epoch: int, fitness: float, map50: float = None, map50_95: float = None,
+               epoch_time: float = None):
+        """记录一个epoch的验证指标，并更新试验的最佳指标"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trial_metrics (trial_id, epoch, fitness, map50, map50_95, epoch_time)"
+                " VALUES (?, ?, ?, ?, ?, ?)", (trial_id, epoch, fitness, map50, map50_95, epoch_time)
+            )
+            self._conn.execute(
+                "UPDATE trials SET fitness = ?, map50 = ?, map50_95 = ? WHERE id = ?"
+                " AND (fitness IS NULL OR fitness < ?)", (fitness, map50, map50_95, trial_id, fitness)
+            )
+            self._conn.execute("UPDATE trials SET epochs = ? WHERE id = ?", (epoch, trial_id))
+
+    def should_prune(self, trial_id: int, epoch: int, warmup_epochs: int = PRUNE_WARMUP_EPOCHS,
+                     min_trials: int = PRUNE_MIN_TRIALS) -> bool:
+        """
+        中位数剪枝: 本试验截至该epoch的最佳fitness低于同一搜索中
+        其他已到达该epoch的试验截至该epoch最佳fitness的中位数时剪枝
+        """
+        if epoch <= warmup_epochs:
+            return False
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.trial_id, MAX(m.fitness) AS best FROM trial_metrics m"
+                " JOIN trials t ON t.id = m.trial_id"
+                " WHERE t.sweep_id = (SELECT sweep_id FROM trials WHERE id = ?) AND m.epoch <= ?"
+                " GROUP BY m.trial_id HAVING MAX(m.epoch) >= ?", (trial_id, epoch, epoch)
+            ).fetchall()
+        own = [row["best"] for row in rows if row["trial_id"] == trial_id]
+        others = [row["best"] for row in rows if row["trial_id"] != trial_id]
+        if not own or len(others) < min_trials:
+            return False
+        return own[0] < float(np.median(others))
+
+    def finish_trial(self, trial_id: int, status: str, latency_ms: float = None, weights: str = None,
+                     error: str = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE trials SET status = ?, finished_at = ?, latency_ms = ?, weights = ?, error = ? WHERE id = ?",
+                (status, time.time(), latency_ms, weights, error, trial_id)
+            )
+
+    def trials(self, sweep_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM trials WHERE sweep_id = ? ORDER BY id", (sweep_id,)).fetchall()
+        return [{**dict(row), "params": json.loads(row["params"])} for row in rows]
+
+    def pareto(self, sweep_id: int) -> List[Dict[str, Any]]:
+        """已完成试验中 精度-延迟 的帕累托前沿（按延迟从低到高，每个都比更快的试验精度更高）"""
+        completed = sorted((t for t in self.trials(sweep_id)
+                            if t["status"] == "completed" and t["latency_ms"] is not None and t["fitness"] is not None),
+                           key=lambda t: (t["latency_ms"], -t["fitness"]))
+        front, best = [], -math.inf
+        for trial in completed:
+            if trial["fitness"] > best:
+                front.append(trial)
+                best = trial["fitness"]
+        return front
+
+
+def sample_params(space: Dict[str, Dict], rng: np.random.Generator) -> Dict[str, Any]:
+    """从搜索空间采样一组超参数"""
+    params = {}
+    for name, spec in space.items():
+        (kind, values), = spec.items()
+        if kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(values[0]), np.log(values[1]))))
+        elif kind == "uniform":
+            params[name] = float(rng.uniform(values[0], values[1]))
+        elif kind == "choice":
+            params[name] = values[int(rng.integers(len(values)))]
+        else:
+            raise ValueError(f"不支持的搜索空间类型: {name}={spec}")
+    return params
+
+
+def augmentation_params(strength: float) -> Dict[str, float]:
+    """数据增强强度（0-1）映射为ultralytics增强参数，0.5对应ultralytics默认值"""
+    factor = 2 * strength
+    return {
+        "hsv_h": 0.015 * factor,
+        "hsv_s": min(0.9, 0.7 * factor),
+        "hsv_v": min(0.9, 0.4 * factor),
+        "degrees": 10.0 * strength,
+        "translate": 0.1 * factor,
+        "scale": min(0.9, 0.5 * factor),
+        "mosaic": min(1.0, factor),
+        "mixup": 0.4 * max(0.0, strength - 0.5),
+    }
+
+
+def _init_trial_worker(slots, parallel: int, cpu_budget: int):
+    """试验进程初始化: 领取一个CPU组序号并按 并行数 切分的线程预算设置本进程"""
+    os.environ["IBRUSHPAL_WORKER_INDEX"] = str(slots.get())
+    thread_budget.configure(parallel, cpu_budget, pin=True)
+
+
+def _measure_latency(weights: str, imgsz: int, runs: int = 10) -> float:
+    """在本进程的线程预算下测量单张图像推理延迟中位数（毫秒）"""
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    image = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(2):
+        model.predict(image, imgsz=imgsz, device="cpu", verbose=False)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(image, imgsz=imgsz, device="cpu", verbose=False)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def _train_trial(task: tuple) -> int:
+    """进程池任务：训练一个试验，逐epoch上报验证指标，被剪枝时提前停止"""
+    db_path, sweep_id, trial_id, params, settings = task
+    db = SweepDatabase(db_path)
+    threads = thread_budget.budget.torch_threads if thread_budget.budget else None
+    db.start_trial(trial_id, threads)
+    try:
+        from teeth_detection.train_yolov8 import build_trainer, prepare_training_config
+        thread_budget.configure_torch()
+
+        config = prepare_training_config(
+            lr0=params["lr0"], momentum=params["momentum"], imgsz=params["imgsz"], epochs=settings["epochs"],
+            device="cpu", workers=0, name=f"sweep{sweep_id}_trial{trial_id}", **augmentation_params(params["augment"])
+        )
+        trainer = build_trainer(config)
+        state = {"pruned": False, "epoch": 0}
+
+        def on_fit_epoch_end(trainer):
+            epoch = trainer.epoch + 1
+            if epoch == state["epoch"]:
+                return  # 训练结束时验证best.pt会再次触发本回调，不覆盖最后一个epoch的指标
+            state["epoch"] = epoch
+            metrics = trainer.metrics or {}
+            db.report(trial_id, epoch, float(trainer.fitness or 0.0), metrics.get("metrics/mAP50(B)"),
+                      metrics.get("metrics/mAP50-95(B)"), getattr(trainer, "epoch_time", None))
+            if db.should_prune(trial_id, epoch, settings["warmup_epochs"], settings["min_trials"]):
+                state["pruned"] = True
+                trainer.stop = True
+
+        trainer.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+        trainer.train()
+
+        weights = str(trainer.best)
+        if state["pruned"]:
+            db.finish_trial(trial_id, "pruned", weights=weights)
+        else:
+            latency = _measure_latency(weights, params["imgsz"]) if weights and os.path.exists(weights) else None
+            db.finish_trial(trial_id, "completed", latency, weights)
+    except Exception as e:
+        db.finish_trial(trial_id, "failed", error=str(e))
+    finally:
+        db.close()
+    return trial_id
+
+
+def prebuild_dataset_caches(imgszs, data_config=DATA_CONFIG):
+    """为数据集配置中的 train/val 构建每种imgsz的缓存（已是最新的跳过）"""
+    import yaml
+    from teeth_detection.dataset_cache import open_cache
+
+    with open(data_config, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get("path", "."))
+    for split in ("train", "val"):
+        if data.get(split) and (root / data[split]).is_dir():
+            for imgsz in sorted(set(imgszs)):
+                open_cache(root / data[split], imgsz)
+
+
+def run_sweep(name: str = None, space: Dict = None, trials: int = 8, parallel: int = 2, epochs: int = 30,
+              cpu_budget: int = 0, db_path=SWEEP_DB, seed: int = 0, warmup_epochs: int = PRUNE_WARMUP_EPOCHS,
+              min_trials: int = PRUNE_MIN_TRIALS, trial_fn: Callable[[tuple], int] = _train_trial) -> int:
+    """
+    运行一次超参数搜索
+
+    Args:
+        trials: 试验总数
+        parallel: 同时运行的试验数（每个试验分得 CPU预算/parallel 个核）
+        cpu_budget: 参与搜索的CPU核数（0表示全部可用核）
+        trial_fn: 试验函数，参数为 (db_path, sweep_id, trial_id, params, settings)
+
+    Returns:
+        搜索ID（结果见 SweepDatabase.trials / pareto）
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    rng = np.random.default_rng(seed)
+    settings = {"trials": trials, "parallel": parallel, "epochs": epochs, "cpu_budget": cpu_budget,
+                "seed": seed, "warmup_epochs": warmup_epochs, "min_trials": min_trials}
+    db = SweepDatabase(db_path)
+    sweep_id = db.create_sweep(name or time.strftime("sweep_%Y%m%d_%H%M%S"), space, settings,
+                               [sample_params(space, rng) for _ in range(trials)])
+    tasks = [(str(db_path), sweep_id, trial["id"], trial["params"], settings) for trial in db.trials(sweep_id)]
+    db.close()
+    if trial_fn is _train_trial and os.path.exists(DATA_CONFIG):
+        # 试验进程同时构建同一缓存会互相覆盖临时文件，在进程池启动前一次性构建好
+        prebuild_dataset_caches(params["imgsz"] for _, _, _, params, _ in tasks)
+
+    slots = multiprocessing.Queue()
+    for index in range(parallel):
+        slots.put(index)
+    with ProcessPoolExecutor(max_workers=parallel, initializer=_init_trial_worker,
+                             initargs=(slots, parallel, cpu_budget)) as executor:
+        for trial_id in executor.map(trial_fn, tasks):
+            print(f"试验 {trial_id} 结束")
+    return sweep_id
+
+
+def print_summary(sweep_id: int, db_path=SWEEP_DB):
+    """打印所有试验结果和帕累托前沿"""
+    db = SweepDatabase(db_path)
+    print(f"\n=== 搜索 {sweep_id} 结果 ===")
+    for trial in db.trials(sweep_id):
+        params = ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in trial["params"].items())
+        latency = f"{trial['latency_ms']:.1f} ms" if trial["latency_ms"] is not None else "-"
+        fitness = f"{trial['fitness']:.4f}" if trial["fitness"] is not None else "-"
+        print(f"  #{trial['id']:<4d} {trial['status']:9s} epochs {trial['epochs']:3d}  fitness {fitness}  "
+              f"延迟 {latency}  ({params})")
+    print("帕累托前沿（延迟从低到高）:")
+    for trial in db.pareto(sweep_id):
+        print(f"  #{trial['id']} fitness {trial['fitness']:.4f}  延迟 {trial['latency_ms']:.1f} ms  {trial['params']}")
+    db.close()
+
+
+def main():
+    """主函数"""
+    trials, parallel, epochs = (int(v) for v in (sys.argv[1:4] + ["8", "2", "30"][len(sys.argv[1:4]):]))
+    print(f"=== 超参数搜索: {trials} 个试验, 并行 {parallel}, 每个 {epochs} epoch ===")
+    sweep_id = run_sweep(trials=trials, parallel=parallel, epochs=epochs)
+    print_summary(sweep_id)
+
+
+if __name__ == "__main__":
+    main()
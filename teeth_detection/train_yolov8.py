@@ -5,11 +5,16 @@ YOLOv8 牙齿检测模型训练脚本
 """
 
 import os
+import sys
+import time
 import yaml
-from ultralytics import YOLO
+import numpy as np
 import torch
 from datetime import datetime
 
+# 直接以脚本运行时把项目根目录加入模块路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 def setup_training_environment():
     """设置训练环境"""
     print("=== 设置牙齿检测训练环境 ===")
@@ -39,8 +44,8 @@ def create_dataset_config():
     
     print("✅ 数据集配置文件创建完成")
 
-def prepare_training_config():
-    """准备训练配置"""
+def prepare_training_config(**overrides):
+    """准备训练配置（overrides覆盖默认超参数，供超参数搜索使用）"""
     config = {
         'model': 'yolov8n-seg.pt',  # 使用分割模型
         'data': 'teeth_detection/data/teeth.yaml',
@@ -61,13 +66,54 @@ def prepare_training_config():
         'box': 7.5,
         'cls': 0.5,
         'dfl': 1.5,
-        'fl_gamma': 0.0,
+        'dataset_cache': True,  # 从预处理的内存映射缓存读取训练图像
     }
+    config.update(overrides)
     
     return config
 
-def train_model():
-    """训练牙齿检测模型"""
+def build_trainer(config: dict):
+    """
+    按训练配置创建分割训练器
+    
+    ultralytics 8.0.x 的 YOLO.train 不接受自定义训练器，这里直接实例化训练器，
+    模型由训练器按 config['model'] 加载；只有使用数据集缓存时才导入缓存训练器。
+    """
+    config = dict(config)
+    if config.pop('dataset_cache', False):
+        from teeth_detection.cached_trainer import CachedSegmentationTrainer as trainer_class
+    else:
+        from ultralytics.yolo.v8.segment import SegmentationTrainer as trainer_class
+    return trainer_class(overrides=config)
+
+def record_epoch_times(trainer) -> list:
+    """
+    记录每个epoch的耗时: train为训练循环（数据加载+前向/反向），total另含验证和保存
+    
+    Returns:
+        训练过程中逐epoch追加的 [{'epoch', 'train', 'total'}]
+    """
+    epochs, state = [], {}
+    trainer.add_callback("on_train_epoch_start", lambda t: state.update(start=time.perf_counter()))
+    trainer.add_callback("on_train_epoch_end", lambda t: state.update(train=time.perf_counter() - state['start']))
+    
+    def on_fit_epoch_end(t):
+        # 训练结束时用best.pt做最终验证也会触发该回调，同一epoch只记录一次
+        if not epochs or epochs[-1]['epoch'] != t.epoch + 1:
+            epochs.append({'epoch': t.epoch + 1, 'train': state['train'], 'total': t.epoch_time})
+    
+    trainer.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+    return epochs
+
+def print_epoch_times(epochs: list):
+    for item in epochs:
+        print(f"  epoch {item['epoch']:3d}: 训练 {item['train']:.1f} 秒, 含验证 {item['total']:.1f} 秒")
+    if epochs:
+        print(f"epoch耗时: 训练平均 {np.mean([e['train'] for e in epochs]):.1f} 秒, "
+              f"含验证平均 {np.mean([e['total'] for e in epochs]):.1f} 秒 (共 {len(epochs)} 个)")
+
+def train_model(dataset_cache: bool = None, **overrides):
+    """训练牙齿检测模型（记录每个epoch耗时），返回训练器"""
     print("=== 开始训练牙齿检测模型 ===")
     
     # 检查GPU可用性
@@ -77,51 +123,31 @@ def train_model():
         print(f"GPU型号: {torch.cuda.get_device_name(0)}")
         print(f"CUDA版本: {torch.version.cuda}")
     
-    # 加载模型
-    print("加载YOLOv8模型...")
-    model = YOLO('yolov8n-seg.pt')
-    
     # 训练配置
-    config = prepare_training_config()
+    config = prepare_training_config(**overrides)
+    if dataset_cache is not None:
+        config['dataset_cache'] = dataset_cache
     
-    # 开始训练
-    print("开始模型训练...")
-    results = model.train(
-        data=config['data'],
-        epochs=config['epochs'],
-        imgsz=config['imgsz'],
-        batch=config['batch'],
-        workers=config['workers'],
-        device=config['device'],
-        project=config['project'],
-        name=config['name'],
-        optimizer=config['optimizer'],
-        lr0=config['lr0'],
-        lrf=config['lrf'],
-        momentum=config['momentum'],
-        weight_decay=config['weight_decay'],
-        warmup_epochs=config['warmup_epochs'],
-        warmup_momentum=config['warmup_momentum'],
-        box=config['box'],
-        cls=config['cls'],
-        dfl=config['dfl'],
-        fl_gamma=config['fl_gamma']
-    )
+    # 开始训练（训练器按配置加载YOLOv8模型）
+    print(f"开始模型训练（数据集缓存: {'开启' if config['dataset_cache'] else '关闭'}）...")
+    trainer = build_trainer(config)
+    epochs = record_epoch_times(trainer)
+    trainer.train()
     
     print("✅ 模型训练完成")
-    return results
+    print_epoch_times(epochs)
+    return trainer
 
 def main():
     """主函数"""
     try:
         setup_training_environment()
         create_dataset_config()
-        results = train_model()
+        trainer = train_model(dataset_cache="--no-cache" not in sys.argv)
         
         print("\n=== 训练结果 ===")
-        print(f"最佳模型保存位置: {results.save_dir}")
-        print(f"训练耗时: {results.training_time}")
-        print(f"最终mAP: {results.results.get('metrics/mAP50-95(B)', 'N/A')}")
+        print(f"最佳模型保存位置: {trainer.best}")
+        print(f"最终mAP: {(trainer.metrics or {}).get('metrics/mAP50-95(B)', 'N/A')}")
         
     except Exception as e:
         print(f"❌ 训练过程中出错: {str(e)}")
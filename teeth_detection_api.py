@@ -4,22 +4,48 @@
 结合传统图像处理和深度学习模型
 """
 
+from utils.warmup import warmup_manager  # 尽早导入以记录进程启动时间
 import cv2
 import numpy as np
 import os
 import time
+import threading
+import importlib.util
+import re
+import asyncio
 from typing import Dict, List, Any
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response
 import uvicorn
 from pydantic import BaseModel
+from config import (WARMUP_ENABLED, WARMUP_SHAPES, MEDIA_STORE_DIR, RENDER_MAX_WIDTH,
+                    RENDER_DEFAULT_WIDTH, RENDER_FORMAT, RENDER_QUALITY, RENDER_FRAME_CACHE_SIZE, RENDER_CACHE_BYTES,
+                    API_HOST, API_PORT, API_WORKERS, CPU_BUDGET, TORCH_THREADS, TORCH_INTEROP_THREADS,
+                    OPENCV_THREADS, INFERENCE_EXECUTOR_THREADS, CPU_PINNING, VIDEO_FPS, VIDEO_BATCH_SIZE,
+                    ADMISSION_ENABLED, ADMISSION_DEGRADE_QUEUE_DEPTH, ADMISSION_SHED_QUEUE_DEPTH,
+                    ADMISSION_DEGRADE_LATENCY, MODEL_VARIANTS, MODEL_VARIANT_PRIOR_LATENCY, QUALITY_TIERS,
+                    DEFAULT_QUALITY_TIER, CASCADE_MIN_TEETH, CASCADE_UNCERTAIN_BAND,
+                    CASCADE_MAX_UNCERTAIN_FRACTION, CASCADE_BATCH_SIZE, CASCADE_BATCH_WAIT,
+                    MOTION_GATE_ENABLED, MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_SKIP, VIDEO_SAMPLING,
+                    VIDEO_PROBE_FPS, VIDEO_UNIFORM_SHARE, VIDEO_MAX_FRAMES, VIDEO_MIN_WIDTH, VIDEO_MIN_HEIGHT,
+                    VIDEO_MIN_FPS, VIDEO_MAX_DURATION, VIDEO_PROBE_BYTES)
+from utils.serialization import to_columnar, encode_payload
+from utils.masks import MASK_FORMATS, extract_masks, encode_masks
+from utils.media_store import MediaStore
+from utils.render import OverlayRenderer, RENDER_FORMATS
+from utils.cpu_budget import thread_budget, compute_thread_budget
+from utils.scheduler import inference_scheduler
+from utils.admission import AdmissionController
+from utils.quality_tiers import QualityPlanner, plan_dict
+from utils.cascade import needs_escalation, EscalationBatcher, CascadeMetrics
+from preprocessing.video_processor import VideoProcessor
+from preprocessing.motion_gate import FrameChangeGate
+from preprocessing.video_probe import StreamProbe, probe_file, check_probe
+from utils.tracking import IoUTracker, shift_regions, detection_f1
 
-# 尝试导入深度学习模型
-try:
-    from ultralytics import YOLO
-    DL_AVAILABLE = True
-except ImportError:
-    DL_AVAILABLE = False
+# 仅检查深度学习依赖是否存在，实际导入推迟到模型加载时
+DL_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+if not DL_AVAILABLE:
     print("警告: 未安装ultralytics，将仅使用传统图像处理方法")
 
 class TeethDetectionRequest(BaseModel):
@@ -36,29 +62,68 @@ class TeethDetectionResult(BaseModel):
     teeth_regions: List[Dict[str, Any]]
     method_used: str
     message: str = ""
+    result_id: str = ""
+    service_mode: str = "normal"
+    quality_tier: str = ""
+    plan: Dict[str, Any] = {}
+    cascade: Dict[str, Any] = {}
 
 class HybridTeethDetector:
     """混合牙齿检测器（传统+深度学习）"""
     
     def __init__(self):
         self.dl_model = None
+        self.dl_models = {}  # 模型变体 -> YOLO（dl_model为默认的n变体）
         self.dl_available = DL_AVAILABLE
+        self._dl_init_lock = threading.Lock()
+        self._dl_initialized = False
+        self._predict_locks = {}  # id(模型) -> 推理锁
         
         # 传统检测器参数
         self.lower_teeth = np.array([0, 0, 180])
         self.upper_teeth = np.array([30, 60, 255])
-        
-        # 初始化深度学习模型
-        if self.dl_available:
-            self._init_dl_model()
+    
+    def ensure_dl_model(self):
+        """确保深度学习模型已加载（懒加载，线程安全）"""
+        if self._dl_initialized:
+            return
+        with self._dl_init_lock:
+            if not self._dl_initialized:
+                if self.dl_available:
+                    self._init_dl_model()
+                self._dl_initialized = True
+    
+    def warmup(self, shapes: List[tuple]):
+        """加载模型并用代表性尺寸的输入预热两条检测路径"""
+        self.ensure_dl_model()
+        for height, width in shapes:
+            dummy = np.zeros((height, width, 3), dtype=np.uint8)
+            self.deep_learning_detect(dummy)
+            self.traditional_detect(dummy)
+        # 其他变体只需完成一次算子初始化
+        for variant in self.available_variants():
+            if self.dl_models[variant] is not self.dl_model:
+                self.deep_learning_detect(np.zeros((*shapes[0], 3), dtype=np.uint8), variant=variant)
+    
+    def available_variants(self) -> List[str]:
+        """已加载的模型变体"""
+        return list(self.dl_models) if self.dl_available else []
     
     def _init_dl_model(self):
         """初始化深度学习模型"""
         try:
-            model_path = "models/yolov8n-seg.pt"
+            model_path = MODEL_VARIANTS["n"]
             if os.path.exists(model_path):
+                from ultralytics import YOLO
                 self.dl_model = YOLO(model_path)
-                print("✅ 深度学习模型加载成功")
+                self.dl_models["n"] = self.dl_model
+                # 其他变体（如yolov8x-seg）存在时一并加载，供质量分级选择
+                for variant, path in MODEL_VARIANTS.items():
+                    if variant not in self.dl_models and os.path.exists(path):
+                        self.dl_models[variant] = YOLO(path)
+                self._predict_locks = {id(model): threading.Lock() for model in self.dl_models.values()}
+                thread_budget.configure_torch()
+                print(f"✅ 深度学习模型加载成功: {', '.join(self.dl_models)}")
             else:
                 print("⚠️  深度学习模型文件不存在，将使用传统方法")
                 self.dl_available = False
@@ -108,35 +173,39 @@ class HybridTeethDetector:
         detection_time = time.time() - start_time
         return teeth_regions, detection_time
     
-    def deep_learning_detect(self, image: np.ndarray, confidence_threshold: float = 0.3) -> List[Dict]:
-        """深度学习检测方法"""
-        if not self.dl_available or self.dl_model is None:
+    def _run_model(self, model, inputs, **options):
+        """调用YOLO模型（同一实例的调用串行执行: predictor按imgsz等参数原地重建，不是线程安全的）"""
+        with self._predict_locks[id(model)]:
+            return model(inputs, verbose=False, **options)
+    
+    def deep_learning_detect(self, image: np.ndarray, confidence_threshold: float = 0.3,
+                             mask_format: str = None, full_resolution_masks: bool = False,
+                             variant: str = None, imgsz: int = None, tiles: int = 1) -> List[Dict]:
+        """
+        深度学习检测方法（mask_format为rle/polygon时附带分割掩码）
+        
+        variant/imgsz选择模型变体和输入尺寸；tiles>1时按 tiles×tiles 切片检测后合并
+        （用于高分辨率照片上的小目标，切片模式不返回掩码）。
+        """
+        self.ensure_dl_model()
+        model = self.dl_models.get(variant) if variant else self.dl_model
+        if not self.dl_available or model is None:
             return [], 0.0
         
         start_time = time.time()
         
+        if tiles > 1:
+            return self._tiled_detect(model, image, confidence_threshold, imgsz, tiles), time.time() - start_time
+        
         try:
             # 使用YOLOv8进行检测
-            results = self.dl_model(image, conf=confidence_threshold, verbose=False)
+            options = {"imgsz": imgsz} if imgsz else {}
+            results = self._run_model(model, image, conf=confidence_threshold, **options)
             
             teeth_regions = []
             if results and len(results) > 0:
-                result = results[0]
-                
-                if result.boxes is not None:
-                    for i, box in enumerate(result.boxes):
-                        conf = box.conf[0].item()
-                        if conf >= confidence_threshold:
-                            x1, y1, x2, y2 = box.xyxy[0].tolist()
-                            w, h = x2 - x1, y2 - y1
-                            
-                            teeth_regions.append({
-                                'id': i,
-                                'bbox': [int(x1), int(y1), int(w), int(h)],
-                                'confidence': float(conf),
-                                'area': int(w * h),
-                                'method': 'deep_learning'
-                            })
+                teeth_regions = self._parse_result(results[0], image.shape[:2], confidence_threshold,
+                                                   mask_format, full_resolution_masks)
             
             detection_time = time.time() - start_time
             return teeth_regions, detection_time
@@ -145,14 +214,113 @@ class HybridTeethDetector:
             print(f"深度学习检测失败: {e}")
             return [], 0.0
     
-    def hybrid_detect(self, image: np.ndarray, use_dl: bool = True, confidence_threshold: float = 0.3) -> Dict:
-        """混合检测方法"""
+    def deep_learning_detect_batch(self, items: List[tuple], variant: str = None) -> List[tuple]:
+        """
+        一次前向批量检测多张图像
+        
+        Args:
+            items: [(图像, 置信度阈值, mask_format, full_resolution_masks)]
+        Returns:
+            与items一一对应的 (teeth_regions, 均摊检测时间)
+        """
+        self.ensure_dl_model()
+        model = self.dl_models.get(variant) if variant else self.dl_model
+        if not self.dl_available or model is None or not items:
+            return [([], 0.0)] * len(items)
+        
+        start_time = time.time()
+        try:
+            results = self._run_model(model, [item[0] for item in items], conf=min(item[1] for item in items))
+            regions = [self._parse_result(result, image.shape[:2], threshold, mask_format, full_resolution)
+                       for result, (image, threshold, mask_format, full_resolution) in zip(results, items)]
+        except Exception as e:
+            print(f"深度学习批量检测失败: {e}")
+            return [([], 0.0)] * len(items)
+        detection_time = (time.time() - start_time) / len(items)
+        return [(teeth_regions, detection_time) for teeth_regions in regions]
+    
+    def _parse_result(self, result, shape: tuple, confidence_threshold: float,
+                      mask_format: str = None, full_resolution_masks: bool = False) -> List[Dict]:
+        """将单张图像的YOLO结果转换为检测区域列表"""
+        teeth_regions = []
+        if result.boxes is not None:
+            for i, box in enumerate(result.boxes):
+                conf = box.conf[0].item()
+                if conf >= confidence_threshold:
+                    x1, y1, x2, y2 = box.xyxy[0].tolist()
+                    w, h = x2 - x1, y2 - y1
+                    
+                    teeth_regions.append({
+                        'id': i,
+                        'bbox': [int(x1), int(y1), int(w), int(h)],
+                        'confidence': float(conf),
+                        'class_id': int(box.cls[0].item()),
+                        'area': int(w * h),
+                        'method': 'deep_learning'
+                    })
+        
+        # 仅在请求时编码掩码，默认保持原型分辨率
+        if mask_format and teeth_regions:
+            encoded = encode_masks(extract_masks(result), shape, mask_format, full_resolution_masks)
+            for region in teeth_regions:
+                if region['id'] < len(encoded):
+                    region['mask'] = encoded[region['id']]
+        return teeth_regions
+    
+    def _tiled_detect(self, model, image: np.ndarray, confidence_threshold: float, imgsz: int,
+                      tiles: int, overlap: float = 0.1, iou_threshold: float = 0.5) -> List[Dict]:
+        """切片检测: 相邻切片重叠overlap比例，框映射回原图坐标后做NMS"""
+        height, width = image.shape[:2]
+        tile_h = int(np.ceil(height / tiles * (1 + overlap)))
+        tile_w = int(np.ceil(width / tiles * (1 + overlap)))
+        origins = [(min(int(r * height / tiles), height - tile_h), min(int(c * width / tiles), width - tile_w))
+                   for r in range(tiles) for c in range(tiles)]
+        crops = [image[y:y + tile_h, x:x + tile_w] for y, x in origins]
+        options = {"imgsz": imgsz} if imgsz else {}
+        
+        boxes, scores, classes = [], [], []
+        try:
+            for (y, x), result in zip(origins, self._run_model(model, crops, conf=confidence_threshold, **options)):
+                if result.boxes is None or len(result.boxes) == 0:
+                    continue
+                xyxy = result.boxes.xyxy.cpu().numpy()
+                boxes.append(np.column_stack([xyxy[:, 0] + x, xyxy[:, 1] + y,
+                                              xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]]))
+                scores.append(result.boxes.conf.cpu().numpy())
+                classes.append(result.boxes.cls.cpu().numpy())
+        except Exception as e:
+            print(f"切片检测失败: {e}")
+            return []
+        if not boxes:
+            return []
+        
+        boxes, scores, classes = np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes)
+        keep = np.array(cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), confidence_threshold,
+                                         iou_threshold)).reshape(-1)
+        return [{
+            'id': i,
+            'bbox': [int(v) for v in boxes[k]],
+            'confidence': float(scores[k]),
+            'class_id': int(classes[k]),
+            'area': int(boxes[k, 2] * boxes[k, 3]),
+            'method': 'deep_learning'
+        } for i, k in enumerate(keep)]
+    
+    def hybrid_detect(self, image: np.ndarray, use_dl: bool = True, confidence_threshold: float = 0.3,
+                      mask_format: str = None, full_resolution_masks: bool = False,
+                      plan: tuple = None) -> Dict:
+        """混合检测方法（plan为质量分级选出的 (变体, 输入尺寸, 切片数)）"""
         start_time = time.time()
         
         # 首先尝试深度学习
         dl_results, dl_time = [], 0.0
+        if use_dl:
+            self.ensure_dl_model()
         if use_dl and self.dl_available:
-            dl_results, dl_time = self.deep_learning_detect(image, confidence_threshold)
+            variant, imgsz, tiles = plan or (None, None, 1)
+            dl_results, dl_time = self.deep_learning_detect(
+                image, confidence_threshold, mask_format, full_resolution_masks, variant, imgsz, tiles
+            )
         
         # 如果深度学习没有结果或不可用，使用传统方法
         traditional_results, trad_time = [], 0.0
@@ -171,7 +339,8 @@ class HybridTeethDetector:
             'detection_time': total_time,
             'dl_time': dl_time,
             'traditional_time': trad_time,
-            'method_used': 'hybrid'
+            'method_used': 'hybrid',
+            'plan': plan_dict(plan) if plan else {}
         }
 
 # 创建FastAPI应用
@@ -181,14 +350,77 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# 全局检测器实例
+# 全局检测器实例（模型在后台预热中加载）
 detector = HybridTeethDetector()
+# 上传文件按内容哈希去重保存，检测结果按哈希+参数缓存
+media_store = MediaStore(MEDIA_STORE_DIR / "uploads")
+# 叠加图渲染器（复用检测时已解码的帧）
+renderer = OverlayRenderer(RENDER_MAX_WIDTH, RENDER_FRAME_CACHE_SIZE, RENDER_CACHE_BYTES)
+# 按质量分级/延迟预算选择模型变体、输入尺寸和切片数
+quality_planner = QualityPlanner(QUALITY_TIERS, MODEL_VARIANT_PRIOR_LATENCY, DEFAULT_QUALITY_TIER)
+# n -> x 模型级联: 并发的升级请求合并成批交给大模型
+escalation_batcher = EscalationBatcher(inference_scheduler, "interactive",
+                                       lambda items: detector.deep_learning_detect_batch(items, "x"),
+                                       CASCADE_BATCH_SIZE, CASCADE_BATCH_WAIT)
+cascade_metrics = CascadeMetrics()
+# 交互请求准入控制（过载时降级到传统检测或拒绝）
+admission = AdmissionController(inference_scheduler, "interactive", ADMISSION_DEGRADE_QUEUE_DEPTH,
+                                ADMISSION_SHED_QUEUE_DEPTH, ADMISSION_DEGRADE_LATENCY,
+                                enabled=ADMISSION_ENABLED)
+# 结果ID = 内容哈希.结果键
+RESULT_ID_PATTERN = re.compile(r"^([0-9a-f]{64})\.([\w-]+)$")
+MEDIA_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+warmup_manager.register("hybrid_detector", lambda: detector.warmup(WARMUP_SHAPES))
+warmup_manager.mark_imported()
+
+@app.on_event("startup")
+async def start_warmup():
+    """应用本工作进程的线程预算并启动后台模型预热"""
+    thread_budget.configure(API_WORKERS, CPU_BUDGET, TORCH_THREADS, TORCH_INTEROP_THREADS,
+                            OPENCV_THREADS, INFERENCE_EXECUTOR_THREADS, CPU_PINNING)
+    if WARMUP_ENABLED:
+        warmup_manager.start()
+    else:
+        warmup_manager.skip()
+
+async def cascade_detect(image: np.ndarray, confidence_threshold: float, mask_format: str = None,
+                         full_resolution_masks: bool = False) -> Dict:
+    """级联检测: 先用n变体，结果不确定时升级到x变体（与并发请求合并成批）"""
+    start_time = time.perf_counter()
+    result = await inference_scheduler.run(
+        "interactive", detector.hybrid_detect, image, True, confidence_threshold,
+        mask_format, full_resolution_masks, ("n", None, 1)
+    )
+    reason = needs_escalation([r for r in result['teeth_regions'] if r['method'] == 'deep_learning'],
+                              CASCADE_MIN_TEETH, CASCADE_UNCERTAIN_BAND, CASCADE_MAX_UNCERTAIN_FRACTION)
+    if reason is not None:
+        regions, dl_time = await asyncio.wrap_future(
+            escalation_batcher.submit((image, confidence_threshold, mask_format, full_resolution_masks))
+        )
+        # 大模型也没有结果时保留小模型（或传统方法）的结果
+        if regions:
+            result.update(teeth_regions=regions, teeth_count=len(regions), plan=plan_dict(("x", None, 1)))
+        result['dl_time'] += dl_time
+    
+    result['detection_time'] = time.perf_counter() - start_time
+    result['method_used'] = 'cascade'
+    result['cascade'] = {'escalated': reason is not None, 'reason': reason}
+    cascade_metrics.record(reason, result['detection_time'])
+    return result
 
 @app.post("/detect-teeth", response_model=TeethDetectionResult)
 async def detect_teeth(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
     use_dl_model: bool = True,
-    confidence_threshold: float = 0.3
+    confidence_threshold: float = 0.3,
+    response_format: str = "records",
+    mask_format: str = None,
+    full_resolution_masks: bool = False,
+    tier: str = None,
+    latency_budget: float = None,
+    cascade: bool = False
 ):
     """
     牙齿检测API端点
@@ -197,54 +429,401 @@ async def detect_teeth(
         file: 上传的图像文件
         use_dl_model: 是否使用深度学习模型
         confidence_threshold: 置信度阈值
+        response_format: records(逐框字典列表) 或 columnar(平行数组，
+            Accept为application/msgpack时返回MessagePack，否则返回JSON)
+        mask_format: 可选，rle 或 polygon，返回深度学习检测的分割掩码
+        full_resolution_masks: rle掩码是否上采样到原图分辨率（默认原型分辨率）
+        tier: 可选，质量分级 fast/balanced/accurate（见 QUALITY_TIERS）
+        latency_budget: 可选，端到端延迟预算（秒），覆盖分级的默认预算；
+            二者都未指定时使用默认模型和输入尺寸
+        cascade: 使用n -> x模型级联（优先于tier；没有x变体时按默认方式检测，cascade.reason为x_unavailable）
     """
+    start_time = time.perf_counter()
+    if response_format not in ("records", "columnar"):
+        raise HTTPException(status_code=400, detail=f"不支持的响应格式: {response_format}")
+    if mask_format is not None and mask_format not in MASK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的掩码格式: {mask_format}")
+    plans = None
+    if tier is not None or latency_budget is not None:
+        if latency_budget is not None and latency_budget <= 0:
+            raise HTTPException(status_code=400, detail="latency_budget应大于0")
+        try:
+            tier, budget, plans = quality_planner.resolve(tier, latency_budget)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        # 读取上传的图像
-        image_data = await file.read()
-        image_array = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="无法解码图像")
-        
-        # 进行牙齿检测
-        result = detector.hybrid_detect(image, use_dl_model, confidence_threshold)
-        
-        return TeethDetectionResult(
-            success=True,
-            teeth_count=result['teeth_count'],
-            detection_time=result['detection_time'],
-            teeth_regions=result['teeth_regions'],
-            method_used=result['method_used'],
-            message=f"成功检测到 {result['teeth_count']} 个牙齿区域"
-        )
+        # 流式保存上传的图像（边写边计算SHA-256）
+        digest, _, _ = await media_store.save_upload(file)
+        key_params = dict(use_dl_model=use_dl_model, confidence_threshold=confidence_threshold,
+                          mask_format=mask_format, full_resolution_masks=full_resolution_masks,
+                          tier=tier, latency_budget=latency_budget, cascade=cascade)
+        result_key = MediaStore.result_key("detect-teeth", **key_params)
         
+        # 相同字节的重复上传跳过检测
+        service_mode = "normal"
+        cascade_info = None
+        executed_plan = None
+        result = media_store.get_result(digest, result_key)
+        if result is None:
+            # 过载时降级或拒绝（缓存命中不受影响）
+            service_mode = admission.admit() if use_dl_model else "normal"
+            if service_mode == "shed":
+                raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试",
+                                    headers={"Retry-After": str(admission.retry_after()),
+                                             "X-Service-Mode": service_mode})
+            
+            image = cv2.imread(str(media_store.path(digest)), cv2.IMREAD_COLOR)
+            
+            if image is None:
+                raise HTTPException(status_code=400, detail="无法解码图像")
+            renderer.remember_frame(digest, image)
+            
+            if use_dl_model and service_mode != "degraded" and (cascade or plans):
+                # 模型懒加载前没有可用变体，先完成加载再判断级联/分级可用的变体
+                await asyncio.to_thread(detector.ensure_dl_model)
+            
+            if service_mode == "degraded":
+                # 降级: 绕过模型队列直接使用传统检测；结果单独存放，不作为正常结果的缓存
+                result = await asyncio.to_thread(detector.hybrid_detect, image, False)
+                result['method_used'] = 'traditional'
+                result_key = MediaStore.result_key("detect-teeth-degraded")
+            elif cascade and use_dl_model and "x" in detector.available_variants():
+                result = await cascade_detect(image, confidence_threshold, mask_format, full_resolution_masks)
+                warmup_manager.mark_first_inference()
+            else:
+                if cascade and use_dl_model:
+                    # 没有x变体时按默认方式检测，结果按非级联参数存放，级联说明只出现在本次响应中
+                    cascade_info = {'escalated': False, 'reason': 'x_unavailable'}
+                key_params['cascade'] = False
+                # 在扣除已用时间和预计排队时间后的剩余预算内选择精度最高的方案
+                plan = None
+                if plans and use_dl_model:
+                    remaining = budget - (time.perf_counter() - start_time) - admission.expected_wait()
+                    plan = quality_planner.select(plans, remaining, detector.available_variants())
+                # 交互通道中进行牙齿检测（优先于视频/批处理任务，不阻塞事件循环）
+                result = await inference_scheduler.run(
+                    "interactive", detector.hybrid_detect, image, use_dl_model,
+                    confidence_threshold, mask_format, full_resolution_masks, plan
+                )
+                if plan and result['dl_time'] > 0:
+                    quality_planner.observe(plan, result['dl_time'])
+                    executed_plan = plan
+                if plan is None:
+                    key_params.update(tier=None, latency_budget=None)
+                warmup_manager.mark_first_inference()
+            if service_mode != "degraded":
+                # 按实际执行的检测方式存放结果: 深度学习不可用时的传统回退、没有可选方案时的默认检测
+                # 和未执行的级联不能占用请求参数对应的缓存键
+                if use_dl_model and not detector.dl_available:
+                    key_params.update(use_dl_model=False, tier=None, latency_budget=None, cascade=False)
+                result_key = MediaStore.result_key("detect-teeth", **key_params)
+            media_store.put_result(digest, result_key, result)
+        result_id = f"{digest}.{result_key}"
+        
+        payload = {
+            'success': True,
+            'teeth_count': result['teeth_count'],
+            'detection_time': result['detection_time'],
+            'teeth_regions': result['teeth_regions'],
+            'method_used': result['method_used'],
+            'message': f"成功检测到 {result['teeth_count']} 个牙齿区域",
+            'result_id': result_id,
+            'service_mode': service_mode,
+            'quality_tier': tier or "",
+            'plan': result.get('plan', {}),
+            'cascade': cascade_info or result.get('cascade', {})
+        }
+        if executed_plan is not None:
+            # 只统计实际按分级方案执行的请求（缓存命中、级联、降级和回退不计入SLA）
+            quality_planner.sla.record(tier, time.perf_counter() - start_time, budget)
+        
+        if response_format == "columnar":
+            # 列式格式绕过逐框Pydantic校验，直接快速编码
+            payload['teeth_regions'] = to_columnar(payload['teeth_regions'])
+            content, media_type = encode_payload(payload, request.headers.get("accept"))
+            return Response(content=content, media_type=media_type,
+                            headers={"X-Service-Mode": service_mode})
+        
+        response.headers["X-Service-Mode"] = service_mode
+        return TeethDetectionResult(**payload)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"检测失败: {str(e)}")
 
+def _check_video(probe: Dict):
+    """不满足拍摄要求时抛出422（附带探测结果），并要求客户端断开以停止发送剩余数据"""
+    reasons = check_probe(probe, VIDEO_MIN_WIDTH, VIDEO_MIN_HEIGHT, VIDEO_MIN_FPS, VIDEO_MAX_DURATION)
+    if reasons:
+        raise HTTPException(status_code=422, detail={"reasons": reasons, "probe": probe},
+                            headers={"Connection": "close"})
+
+async def _save_video(save) -> tuple:
+    """
+    保存上传的视频并探测容器元数据
+    
+    写入时逐块喂给流式探测器，moov到达（faststart文件的前几十KB）即检查拍摄要求，
+    不满足时中止写入；moov在文件末尾时写完后再定位读取。探测结果以 "probe" 键缓存在媒体ID下。
+    
+    Args:
+        save: save(inspect) -> 媒体存储写入协程
+    
+    Returns:
+        (媒体ID, 探测结果)
+    """
+    prober = StreamProbe(VIDEO_PROBE_BYTES)
+    
+    def inspect(chunk: bytes):
+        if not prober.done and prober.feed(chunk) is not None:
+            _check_video(prober.result)
+    
+    digest, _, _ = await save(inspect)
+    return digest, await _video_probe(digest, prober.result)
+
+async def _video_probe(digest: str, probe: Dict = None) -> Dict:
+    """读取缓存的探测结果（没有时探测已保存的文件并缓存），并检查拍摄要求"""
+    cached = media_store.get_result(digest, "probe")
+    if cached is None:
+        cached = probe or await asyncio.to_thread(probe_file, str(media_store.path(digest)))
+        if cached is None:
+            raise HTTPException(status_code=400, detail="无法识别视频格式")
+        media_store.put_result(digest, "probe", cached)
+    _check_video(cached)
+    return cached
+
+@app.post("/upload-video")
+async def upload_video(request: Request):
+    """
+    流式上传视频（请求体为原始视频字节，非multipart）
+    
+    边接收边探测，faststart的MP4/MOV在moov到达时即可判断分辨率、帧率和时长，
+    不满足要求时立即返回422并断开连接，不再接收剩余数据。
+    返回的 media_id 可传给 /analyze-video，分析时直接使用缓存的探测结果。
+    """
+    digest, probe = await _save_video(
+        lambda inspect: media_store.save_async_stream(request.stream(), inspect))
+    return {'success': True, 'media_id': digest, 'probe': probe}
+
+@app.post("/analyze-video")
+async def analyze_video(
+    file: UploadFile = File(None),
+    media_id: str = None,
+    use_dl_model: bool = True,
+    confidence_threshold: float = 0.3,
+    motion_gate: bool = MOTION_GATE_ENABLED,
+    evaluate_gate: bool = False,
+    sampling: str = VIDEO_SAMPLING
+):
+    """
+    刷牙视频分析端点（后台视频通道）
+    
+    抽取关键帧（adaptive: 按动作强度在帧预算内分配；fixed: 按 VIDEO_FPS 固定抽帧），
+    每 VIDEO_BATCH_SIZE 帧作为一个批次排队检测，批次之间让出推理槽，
+    交互式照片请求不会被长视频饿死。
+    
+    Args:
+        sampling: adaptive 或 fixed
+        motion_gate: 画面相对上一个检测关键帧几乎不变时跳过检测，沿用并按估计位移平移上次结果
+        evaluate_gate: 同时检测被跳过的帧，报告沿用结果相对真实检测的F1（用于评估门控精度）
+        media_id: /upload-video 返回的媒体ID（代替file；multipart上传在进入端点前已完整接收，
+                  需要在传输中途拒绝时请先用 /upload-video 流式上传）
+    """
+    if sampling not in ("adaptive", "fixed"):
+        raise HTTPException(status_code=400, detail=f"不支持的抽帧方式: {sampling}")
+    if media_id is not None:
+        if not MEDIA_ID_PATTERN.match(media_id) or not media_store.exists(media_id):
+            raise HTTPException(status_code=404, detail="视频不存在")
+        digest, probe = media_id, await _video_probe(media_id)
+    elif file is not None:
+        digest, probe = await _save_video(lambda inspect: media_store.save_upload(file, inspect))
+    else:
+        raise HTTPException(status_code=400, detail="需要上传视频文件或提供media_id")
+    result_key = MediaStore.result_key("analyze-video", use_dl_model=use_dl_model,
+                                       confidence_threshold=confidence_threshold, fps=VIDEO_FPS,
+                                       motion_gate=motion_gate, evaluate_gate=evaluate_gate, sampling=sampling)
+    cached = media_store.get_result(digest, result_key)
+    if cached is not None:
+        return cached
+    
+    start_time = time.time()
+    processor = VideoProcessor(target_fps=VIDEO_FPS)
+    video_path = str(media_store.path(digest))
+    if sampling == "adaptive":
+        frames, timestamps = await asyncio.to_thread(
+            processor.extract_adaptive_frames, video_path, None, VIDEO_PROBE_FPS, VIDEO_UNIFORM_SHARE,
+            VIDEO_MAX_FRAMES
+        )
+    else:
+        frames = (await asyncio.to_thread(processor.extract_key_frames, video_path))[:VIDEO_MAX_FRAMES]
+        timestamps = [i / VIDEO_FPS for i in range(len(frames))]
+    if not frames:
+        raise HTTPException(status_code=400, detail="无法解码视频")
+    
+    # 门控只依赖画面本身，可在检测前一次性决定哪些帧需要调用模型
+    gate = FrameChangeGate(MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_SKIP)
+    decisions = (await asyncio.to_thread(lambda: [gate.check(frame) for frame in frames]) if motion_gate
+                 else [(False, (0.0, 0.0), 0.0)] * len(frames))
+    detect_indices = [i for i, (skip, _, _) in enumerate(decisions) if not skip or evaluate_gate]
+    
+    def detect_batch(batch):
+        return [detector.hybrid_detect(frames[i], use_dl_model, confidence_threshold) for i in batch]
+    
+    batches = [detect_indices[i:i + VIDEO_BATCH_SIZE] for i in range(0, len(detect_indices), VIDEO_BATCH_SIZE)]
+    detected = dict(zip(detect_indices, (r for batch in await inference_scheduler.run_batches(
+        "video", detect_batch, batches) for r in batch)))
+    
+    # 跳过的帧沿用关键帧结果（按位移平移），跟踪器为所有帧分配稳定的track_id
+    tracker = IoUTracker()
+    frame_reports, gate_f1 = [], []
+    key_regions = []
+    for i, (skip, (dx, dy), diff) in enumerate(decisions):
+        if skip:
+            regions = shift_regions(key_regions, dx, dy)
+            if evaluate_gate:
+                gate_f1.append(detection_f1(regions, detected[i]['teeth_regions']))
+        else:
+            regions = key_regions = detected[i]['teeth_regions']
+        tracker.update(regions)
+        frame_reports.append({
+            'index': i,
+            'time': round(timestamps[i], 3),
+            'teeth_count': len(regions),
+            'detection_time': 0.0 if skip else detected[i]['detection_time'],
+            'skipped': skip,
+            'track_ids': [region['track_id'] for region in regions]
+        })
+    
+    skipped = sum(skip for skip, _, _ in decisions)
+    response = {
+        'success': True,
+        'frame_count': len(frames),
+        'sampling': sampling,
+        'probe': probe,
+        'frames': frame_reports,
+        'skipped_frames': skipped,
+        'skip_ratio': skipped / len(frames),
+        'track_count': len({t for report in frame_reports for t in report['track_ids']}),
+        'processing_time': time.time() - start_time
+    }
+    if evaluate_gate:
+        response['gate_f1'] = float(np.mean(gate_f1)) if gate_f1 else 1.0
+    if use_dl_model and not detector.dl_available:
+        # 深度学习不可用时各帧为传统检测结果，按实际检测方式存放
+        result_key = MediaStore.result_key("analyze-video", use_dl_model=False,
+                                           confidence_threshold=confidence_threshold, fps=VIDEO_FPS,
+                                           motion_gate=motion_gate, evaluate_gate=evaluate_gate, sampling=sampling)
+    media_store.put_result(digest, result_key, response)
+    return response
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """准入控制: 当前负载、各服务模式（正常/降级/拒绝）的请求数和占比"""
+    return admission.metrics()
+
+@app.get("/metrics/quality-tiers")
+async def quality_tier_metrics():
+    """质量分级: 在线延迟模型系数、各方案预测延迟和各分级SLA达成率"""
+    return quality_planner.metrics(detector.available_variants())
+
+@app.get("/metrics/cascade")
+async def cascade_metrics_endpoint():
+    """模型级联: 升级率、升级原因、直接/升级请求的端到端延迟分位数和平均批大小"""
+    report = cascade_metrics.metrics()
+    sizes = list(escalation_batcher.batch_sizes)
+    report["mean_escalation_batch"] = sum(sizes) / len(sizes) if sizes else 0.0
+    return report
+
+@app.get("/metrics/scheduler")
+async def scheduler_metrics():
+    """各调度通道的队列深度、并发数和等待/总延迟分位数"""
+    return inference_scheduler.metrics()
+
+@app.get("/render/{result_id}")
+async def render_detection(
+    request: Request,
+    result_id: str,
+    width: int = RENDER_DEFAULT_WIDTH,
+    format: str = None,
+    quality: int = RENDER_QUALITY,
+    labels: bool = True
+):
+    """
+    渲染检测叠加图（供小程序预览）
+    
+    Args:
+        result_id: /detect-teeth 返回的结果ID
+        width: 显示宽度（不超过原图和帧缓存宽度）
+        format: jpeg 或 webp（默认见 RENDER_FORMAT）
+        quality: 编码质量 1-100
+        labels: 是否绘制类别/置信度文字
+    """
+    match = RESULT_ID_PATTERN.match(result_id)
+    if match is None:
+        raise HTTPException(status_code=400, detail=f"无效的结果ID: {result_id}")
+    format = format or RENDER_FORMAT
+    if format not in RENDER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的渲染格式: {format}")
+    if not 1 <= quality <= 100 or not 16 <= width <= 4096:
+        raise HTTPException(status_code=400, detail="quality应为1-100，width应为16-4096")
+    
+    # 先确认结果和原图仍然存在（已删除的结果不能因客户端缓存的ETag返回304）
+    digest, result_key = match.groups()
+    if not media_store.has_result(digest, result_key) or not media_store.exists(digest):
+        raise HTTPException(status_code=404, detail="检测结果不存在")
+    
+    headers = {"ETag": OverlayRenderer.etag(result_id, width, format, quality, labels),
+               "Cache-Control": "public, max-age=86400, immutable"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    result = media_store.get_result(digest, result_key)
+    if result is None:
+        raise HTTPException(status_code=404, detail="检测结果不存在")
+    
+    try:
+        content, media_type, _ = renderer.render(
+            result_id, digest, result['teeth_regions'],
+            lambda: cv2.imread(str(media_store.path(digest)), cv2.IMREAD_COLOR),
+            width, format, quality, labels
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=content, media_type=media_type, headers=headers)
+
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
     return {
         "status": "healthy",
         "dl_available": detector.dl_available,
-        "dl_model_loaded": detector.dl_model is not None
+        "dl_model_loaded": detector.dl_model is not None,
+        "ready": warmup_manager.is_ready()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查（模型预热完成前返回503）"""
+    status = warmup_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.get("/model-info")
 async def model_info():
     """模型信息端点"""
     info = {
         "dl_available": detector.dl_available,
         "dl_model_loaded": detector.dl_model is not None,
-        "traditional_available": True
+        "traditional_available": True,
+        "thread_budget": thread_budget.status()
     }
     
     if detector.dl_available and detector.dl_model:
         info.update({
             "model_type": "YOLOv8",
             "model_path": "models/yolov8n-seg.pt",
-            "model_exists": os.path.exists("models/yolov8n-seg.pt")
+            "model_exists": os.path.exists("models/yolov8n-seg.pt"),
+            "model_variants": detector.available_variants()
         })
     
     return info
@@ -462,4 +1041,9 @@ if __name__ == "__main__":
     print("API文档: http://localhost:8000/docs")
     print("健康检查: http://localhost:8000/health")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # 工作进程数不超过线程预算可用核数；多进程时每个进程在启动事件中各自应用预算
+    workers = compute_thread_budget(API_WORKERS, CPU_BUDGET).workers
+    if workers > 1:
+        uvicorn.run("teeth_detection_api:app", host=API_HOST, port=API_PORT, workers=workers)
+    else:
+        uvicorn.run(app, host=API_HOST, port=API_PORT)
\ No newline at end of file
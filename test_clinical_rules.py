@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+临床规则引擎单元测试
+检查编译后的规则推荐与原硬编码规则（龋齿史/牙龈炎）逐一等价，以及规则文件的热加载与出错时保留旧规则
+"""
+
+import itertools
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import CLINICAL_RULES_FILE
+from models.rule_engine import ClinicalRuleEngine, CompiledRuleSet, load_rule_spec
+
+# 迁移到规则文件之前 RecommendationEngine 内置的规则
+LEGACY_RULE_BASE = {
+    "caries_history": {"must": ["floss"], "suggest": ["fluoride_toothpaste"]},
+    "gingivitis": {"must": ["soft_bristle"], "suggest": ["mouthwash"]},
+}
+MISSING = object()
+FLAG_VALUES = [True, False, None, MISSING, 1, 0]
+
+
+def legacy_apply_rules(inputs):
+    """原 RecommendationEngine._apply_rules 的逻辑"""
+    recommendations = {"must": [], "suggest": []}
+    for flag in ("caries_history", "gingivitis"):
+        if inputs.get(flag):
+            recommendations["must"].extend(LEGACY_RULE_BASE[flag]["must"])
+            recommendations["suggest"].extend(LEGACY_RULE_BASE[flag]["suggest"])
+    return recommendations
+
+
+def _profiles():
+    for caries, gingivitis in itertools.product(FLAG_VALUES, repeat=2):
+        profile = {"cleanliness_score": 70}
+        if caries is not MISSING:
+            profile["caries_history"] = caries
+        if gingivitis is not MISSING:
+            profile["gingivitis"] = gingivitis
+        yield profile
+
+
+def _write(path, spec, mtime_ns):
+    """写入规则文件并设置mtime（避免同一时间戳内的两次写入被视为未修改）"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(spec if isinstance(spec, str) else json.dumps(spec))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _rule(rule_id, flag, must):
+    return {"id": rule_id, "all": [{"feature": flag, "op": "==", "value": True}], "must": [must]}
+
+
+def test_compiled_rules_match_legacy_logic():
+    """默认规则文件对所有标志组合的推荐与原硬编码逻辑一致（逐条与批量两种方式）"""
+    ruleset = CompiledRuleSet(load_rule_spec(CLINICAL_RULES_FILE), str(CLINICAL_RULES_FILE))
+    profiles = list(_profiles())
+    batch = ruleset.recommend(ruleset.encode_profiles(profiles))
+    for profile, batched in zip(profiles, batch):
+        expected = legacy_apply_rules(profile)
+        single = ruleset.recommend(ruleset.encode_profile(profile).reshape(1, -1))[0]
+        for result in (single, batched):
+            assert sorted(result["must"]) == sorted(expected["must"]), profile
+            assert sorted(result["suggest"]) == sorted(expected["suggest"]), profile
+            assert result["avoid"] == [], profile
+
+
+def test_rules_file_reload():
+    """规则文件修改后重新编译，推荐结果随之变化"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rules.json")
+        _write(path, {"rules": [_rule("caries", "caries_history", "floss")]}, 1_000_000_000)
+        engine = ClinicalRuleEngine(path, check_interval=0)
+        features = engine.ruleset.encode_profile({"caries_history": True, "gingivitis": True}).reshape(1, -1)
+        assert engine.ruleset.recommend(features)[0]["must"] == ["floss"]
+
+        _write(path, {"rules": [_rule("gingivitis", "gingivitis", "soft_bristle")]}, 2_000_000_000)
+        ruleset = engine.ruleset
+        assert [rule["id"] for rule in ruleset.rules] == ["gingivitis"]
+        features = ruleset.encode_profile({"caries_history": True, "gingivitis": True}).reshape(1, -1)
+        assert ruleset.recommend(features)[0]["must"] == ["soft_bristle"]
+
+        # 未修改时不重新编译
+        assert engine.ruleset is ruleset
+        assert not engine.reload()
+
+
+def test_malformed_rules_keep_previous_ruleset():
+    """新规则文件无法解析或校验失败时保留旧规则集，修正后再次加载"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rules.json")
+        _write(path, {"rules": [_rule("caries", "caries_history", "floss")]}, 1_000_000_000)
+        engine = ClinicalRuleEngine(path, check_interval=0)
+        previous = engine.ruleset
+
+        invalid_op = {"rules": [{"id": "bad", "all": [{"feature": "age", "op": "~", "value": 1}]}]}
+        for mtime_ns, spec in ((2_000_000_000, '{"rules": [ '), (3_000_000_000, invalid_op)):
+            _write(path, spec, mtime_ns)
+            assert engine.ruleset is previous
+            assert not engine.reload()
+
+        os.remove(path)
+        assert engine.ruleset is previous
+
+        _write(path, {"rules": [_rule("gingivitis", "gingivitis", "soft_bristle")]}, 4_000_000_000)
+        assert engine.ruleset is not previous
+        assert engine.ruleset.rule_ids == ["gingivitis"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+分块加密容器与批量记录加密单元测试
+检查边界大小的往返、密文/文件头篡改与末尾数据块丢弃的拒绝、跨块随机访问以及空记录批量加解密
+"""
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import encryption
+from utils.encryption import CONTAINER_HEADER, GCM_TAG_SIZE, DataEncryptor
+
+CHUNK_SIZE = 64
+encryptor = DataEncryptor(DataEncryptor.generate_key())
+
+
+def _encrypt(plaintext: bytes, chunk_size: int = CHUNK_SIZE) -> bytes:
+    dst = io.BytesIO()
+    assert encryptor.encrypt_stream(io.BytesIO(plaintext), dst, chunk_size, workers=2) == len(plaintext)
+    return dst.getvalue()
+
+
+def _decrypt(container: bytes) -> bytes:
+    dst = io.BytesIO()
+    total = encryptor.decrypt_stream(io.BytesIO(container), dst, workers=2)
+    assert total == len(dst.getvalue())
+    return dst.getvalue()
+
+
+def test_stream_round_trip_sizes():
+    """0、1、整块、整块+1 以及多块大小的明文往返一致"""
+    for size in (0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 5 * CHUNK_SIZE, 5 * CHUNK_SIZE + 7):
+        plaintext = os.urandom(size)
+        assert _decrypt(_encrypt(plaintext)) == plaintext
+
+
+def test_flipped_ciphertext_byte_rejected():
+    """任一数据块的密文或标签字节被翻转时解密失败"""
+    container = _encrypt(os.urandom(3 * CHUNK_SIZE + 5))
+    for position in (CONTAINER_HEADER.size, CONTAINER_HEADER.size + CHUNK_SIZE + GCM_TAG_SIZE + 3,
+                     len(container) - 1):
+        tampered = bytearray(container)
+        tampered[position] ^= 0x01
+        with pytest.raises(ValueError):
+            _decrypt(bytes(tampered))
+
+
+def test_flipped_header_byte_rejected():
+    """文件头任一字节（魔数、版本、保留字节、块大小、nonce前缀）被篡改时解密失败"""
+    container = _encrypt(os.urandom(2 * CHUNK_SIZE))
+    for position in range(CONTAINER_HEADER.size):
+        tampered = bytearray(container)
+        tampered[position] ^= 0x01
+        with pytest.raises(ValueError):
+            _decrypt(bytes(tampered))
+
+
+def test_dropped_trailing_frames_rejected():
+    """丢弃末尾的完整数据块或截断末块时解密失败"""
+    container = _encrypt(os.urandom(4 * CHUNK_SIZE + 10))
+    frame_size = CHUNK_SIZE + GCM_TAG_SIZE
+    for dropped in (1, 2, 3):
+        end = CONTAINER_HEADER.size + (4 - dropped + 1) * frame_size
+        with pytest.raises(ValueError):
+            _decrypt(container[:end])
+    with pytest.raises(ValueError):
+        _decrypt(container[:-1])
+    with pytest.raises(ValueError):
+        _decrypt(container[:CONTAINER_HEADER.size])
+
+
+def test_decrypt_range_across_chunks():
+    """跨数据块边界的随机访问与明文切片一致，超出末尾时截断"""
+    plaintext = os.urandom(5 * CHUNK_SIZE + 17)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.enc")
+        with open(path, "wb") as f:
+            f.write(_encrypt(plaintext))
+        for offset, length in ((0, 0), (0, 1), (CHUNK_SIZE - 1, 2), (CHUNK_SIZE - 3, 2 * CHUNK_SIZE + 6),
+                               (CHUNK_SIZE, CHUNK_SIZE), (4 * CHUNK_SIZE + 1, 100), (len(plaintext), 10),
+                               (len(plaintext) + 5, 10), (0, len(plaintext))):
+            assert encryptor.decrypt_range(path, offset, length) == plaintext[offset:offset + length]
+        with pytest.raises(ValueError):
+            encryptor.decrypt_range(path, -1, 10)
+
+
+def _batch_backends():
+    """依次在 cryptography 与 pycryptodome 两条实现路径下执行"""
+    available = encryption.AESGCM_AVAILABLE
+    try:
+        for backend in ([True] if available else []) + [False]:
+            encryption.AESGCM_AVAILABLE = backend
+            yield backend
+    finally:
+        encryption.AESGCM_AVAILABLE = available
+
+
+def test_batch_with_empty_records():
+    """空记录与空批次的批量加解密往返一致（两条实现路径的输出可互相解密）"""
+    records = [b"", b"a", b"", os.urandom(300), b""]
+    columns = []
+    for _ in _batch_backends():
+        column = encryptor.encrypt_batch(records, associated_data=b"notes")
+        assert len(column['offsets']) == len(records) + 1
+        columns.append(column)
+        for other in columns:
+            assert encryptor.decrypt_batch(other, associated_data=b"notes") == records
+
+        empty = encryptor.encrypt_batch([])
+        assert empty['data'] == b"" and empty['offsets'].tolist() == [0]
+        assert encryptor.decrypt_batch(empty) == []
+
+
+def test_batch_tampering_rejected():
+    """批量记录被篡改或附加认证数据不一致时解密失败"""
+    for _ in _batch_backends():
+        column = encryptor.encrypt_batch([b"", b"record"], associated_data=b"notes")
+        with pytest.raises(ValueError):
+            encryptor.decrypt_batch(column, associated_data=b"other")
+        tampered = bytearray(column['data'])
+        tampered[-1] ^= 0x01
+        with pytest.raises(ValueError):
+            encryptor.decrypt_batch({'data': bytes(tampered), 'offsets': column['offsets']},
+                                    associated_data=b"notes")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+加权框融合（WBF）单元测试
+检查融合得分的取值范围、成员权重的作用以及融合后的得分/成员数过滤
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.ensemble import EnsembleDetector, weighted_boxes_fusion
+
+WEIGHTS = [1.0, 1.0, 2.0, 0.5]
+BOX = [100, 100, 200, 200]
+
+
+def _fuse(boxes_list, scores_list, weights=WEIGHTS):
+    labels_list = [np.zeros(len(scores), dtype=np.int64) for scores in scores_list]
+    return weighted_boxes_fusion([np.array(b, dtype=np.float64).reshape(-1, 4) for b in boxes_list],
+                                 [np.array(s, dtype=np.float64) for s in scores_list],
+                                 labels_list, weights, iou_threshold=0.55, skip_threshold=0.0)
+
+
+def test_all_members_agree():
+    """所有成员以相同得分检测到同一个框时，融合得分等于该得分"""
+    _, scores, _, votes = _fuse([[BOX]] * 4, [[0.9]] * 4)
+    assert np.allclose(scores, [0.9])
+    assert votes.tolist() == [4]
+
+
+def test_single_heavy_member():
+    """只有高权重成员检测到的框按其权重占比降低，且不超过1"""
+    _, scores, _, votes = _fuse([[], [], [BOX], []], [[], [], [0.95], []])
+    assert np.allclose(scores, [0.95 * 2.0 / 4.5])
+    assert votes.tolist() == [1]
+
+
+def test_scores_stay_in_unit_interval():
+    """随机成员输出（含同一成员的多个重叠框、悬殊的权重）融合得分始终在[0, 1]"""
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        weights = rng.uniform(0.1, 10.0, size=4)
+        boxes_list, scores_list = [], []
+        for _ in weights:
+            n = rng.integers(0, 6)
+            xy = rng.uniform(0, 50, size=(n, 2))
+            boxes_list.append(np.hstack([xy, xy + rng.uniform(40, 60, size=(n, 2))]))
+            scores_list.append(rng.uniform(0, 1, size=n))
+        _, scores, _, _ = _fuse(boxes_list, scores_list, weights)
+        assert ((scores >= 0) & (scores <= 1 + 1e-9)).all()
+
+
+def test_post_fusion_filter():
+    """融合得分低于阈值或成员数不足的框被丢弃"""
+    ensemble = EnsembleDetector([], scheduler=None, conf_threshold=0.25, min_votes=2)
+    detection = {'class': 'incisor', 'confidence': 0.9, 'bbox': BOX}
+    lone = {'class': 'molar', 'confidence': 0.9, 'bbox': [400, 400, 500, 500]}
+    fused = ensemble.fuse([[detection, lone], [detection], [detection], []], WEIGHTS)
+    assert [d['class'] for d in fused] == ['incisor']
+    assert fused[0]['votes'] == 3
+    assert 0 <= fused[0]['confidence'] <= 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -1,4 +1,9 @@
 # 工具模块初始化文件
 from .encryption import DataEncryptor, DataAnonymizer
+from .warmup import WarmupManager, warmup_manager
+from .media_store import MediaStore
+from .catalog import ReferenceCatalog
+from .cpu_budget import ThreadBudgetManager, thread_budget
 
-__all__ = ['DataEncryptor', 'DataAnonymizer']
\ No newline at end of file
+__all__ = ['DataEncryptor', 'DataAnonymizer', 'WarmupManager', 'warmup_manager', 'MediaStore',
+           'ReferenceCatalog', 'ThreadBudgetManager', 'thread_budget']
\ No newline at end of file
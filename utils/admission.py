@@ -0,0 +1,106 @@
+"""
+过载准入控制
+根据推理通道的排队深度和近期延迟决定新请求的服务模式：
+- normal: 正常进入推理队列
+- degraded: 绕过模型队列，直接使用传统图像处理检测（便宜但精度较低）
+- shed: 直接拒绝，返回503和Retry-After
+避免过载时所有请求一起排队超时。
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict
+
+import numpy as np
+
+SERVICE_MODES = ("normal", "degraded", "shed")
+
+
+class AdmissionController:
+    """基于排队深度和近期延迟的准入控制器"""
+
+    def __init__(self, scheduler, lane: str = "interactive", degrade_queue_depth: int = 8,
+                 shed_queue_depth: int = 32, degrade_latency: float = 2.0, latency_window: int = 64,
+                 enabled: bool = True):
+        """
+        Args:
+            scheduler: LaneScheduler
+            lane: 观察的调度通道
+            degrade_queue_depth: 排队数达到该值时降级
+            shed_queue_depth: 排队数达到该值时拒绝
+            degrade_latency: 近期p95总延迟（秒）超过该值时降级
+            latency_window: 计算近期延迟的样本数
+        """
+        self.scheduler = scheduler
+        self.lane = lane
+        self.degrade_queue_depth = degrade_queue_depth
+        self.shed_queue_depth = shed_queue_depth
+        self.degrade_latency = degrade_latency
+        self.latency_window = latency_window
+        self.enabled = enabled
+        self.counts = {mode: 0 for mode in SERVICE_MODES}
+        self._recent = deque(maxlen=1024)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, float]:
+        """当前负载: 排队数、并发数、近期p95延迟、平均服务时间"""
+        lane = self.scheduler.lanes[self.lane]
+        latencies = list(lane.latencies)[-self.latency_window:]
+        waits = list(lane.wait_times)[-self.latency_window:]
+        recent_p95 = float(np.percentile(latencies, 95)) if latencies else 0.0
+        service = float(np.mean(np.subtract(latencies, waits))) if latencies else 0.0
+        return {
+            "queue_depth": len(lane.queue),
+            "inflight": lane.inflight,
+            "recent_p95": recent_p95,
+            "service_time": service
+        }
+
+    def admit(self) -> str:
+        """决定新请求的服务模式并计数"""
+        mode = "normal"
+        if self.enabled:
+            load = self.load()
+            if load["queue_depth"] >= self.shed_queue_depth:
+                mode = "shed"
+            elif load["queue_depth"] >= self.degrade_queue_depth:
+                mode = "degraded"
+            elif load["queue_depth"] + load["inflight"] > 0 and load["recent_p95"] >= self.degrade_latency:
+                # 降级请求不进入通道、不产生新样本，通道空闲后旧的延迟样本不再作数
+                mode = "degraded"
+        with self._lock:
+            self.counts[mode] += 1
+            self._recent.append(mode)
+        return mode
+
+    def expected_wait(self) -> float:
+        """新请求的预计排队时间（秒）: 队列深度 × 平均服务时间 / 推理槽数"""
+        load = self.load()
+        slots = max(1, self.scheduler.slots or 1)
+        return load["queue_depth"] * load["service_time"] / slots
+
+    def retry_after(self) -> int:
+        """按当前队列的预计排空时间估算Retry-After（秒）"""
+        load = self.load()
+        slots = max(1, self.scheduler.slots or 1)
+        return max(1, math.ceil(load["queue_depth"] * max(load["service_time"], 0.05) / slots))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.counts.values())
+            recent = list(self._recent)
+        return {
+            "enabled": self.enabled,
+            "thresholds": {
+                "degrade_queue_depth": self.degrade_queue_depth,
+                "shed_queue_depth": self.shed_queue_depth,
+                "degrade_latency": self.degrade_latency
+            },
+            "load": self.load(),
+            "counts": dict(self.counts),
+            "fractions": {mode: (self.counts[mode] / total if total else 0.0) for mode in SERVICE_MODES},
+            "recent_fractions": {
+                mode: (recent.count(mode) / len(recent) if recent else 0.0) for mode in SERVICE_MODES
+            }
+        }
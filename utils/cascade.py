@@ -0,0 +1,125 @@
+"""
+置信度门控的模型级联
+先用小模型（yolov8n-seg）检测，只有结果不确定的图像（牙齿数过少，或大量得分落在
+不确定区间）才升级到大模型（yolov8x-seg）。并发请求的升级图像在短时间窗口内合并为
+一个批次，一次前向完成，减少大模型的单张调用开销。
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def needs_escalation(regions: List[Dict], min_teeth: int = 4, uncertain_band: Tuple[float, float] = (0.3, 0.6),
+                     max_uncertain_fraction: float = 0.5) -> Optional[str]:
+    """
+    判断小模型结果是否需要升级
+
+    Returns:
+        升级原因（too_few_teeth / uncertain_scores），无需升级时返回None
+    """
+    if len(regions) < min_teeth:
+        return "too_few_teeth"
+    scores = np.fromiter((region['confidence'] for region in regions), dtype=np.float64, count=len(regions))
+    uncertain = np.count_nonzero((scores >= uncertain_band[0]) & (scores < uncertain_band[1]))
+    if uncertain / len(scores) > max_uncertain_fraction:
+        return "uncertain_scores"
+    return None
+
+
+class EscalationBatcher:
+    """
+    升级请求合并器
+
+    第一个请求到达后最多等待max_wait秒或凑满max_batch个，再把整批提交到推理调度通道。
+    """
+
+    def __init__(self, scheduler, lane: str, run_batch: Callable[[List[Any]], List[Any]],
+                 max_batch: int = 4, max_wait: float = 0.02):
+        self.scheduler = scheduler
+        self.lane = lane
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_sizes = deque(maxlen=1024)
+        self._pending: List[Tuple[Any, Future]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="cascade-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.perf_counter() + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self.batch_sizes.append(len(batch))
+            futures = [future for _, future in batch]
+            self.scheduler.submit(self.lane, self.run_batch, [item for item, _ in batch]).add_done_callback(
+                lambda done, futures=futures: self._distribute(done, futures)
+            )
+
+    @staticmethod
+    def _distribute(done: Future, futures: List[Future]):
+        if done.exception() is not None:
+            for future in futures:
+                future.set_exception(done.exception())
+            return
+        for future, result in zip(futures, done.result()):
+            future.set_result(result)
+
+
+class CascadeMetrics:
+    """级联的升级率、升级原因和端到端延迟分布"""
+
+    def __init__(self, window: int = 2048):
+        self.requests = 0
+        self.escalated = 0
+        self.reasons = Counter()
+        self.latencies = {"direct": deque(maxlen=window), "escalated": deque(maxlen=window)}
+        self._lock = threading.Lock()
+
+    def record(self, reason: Optional[str], latency: float):
+        with self._lock:
+            self.requests += 1
+            if reason is not None:
+                self.escalated += 1
+                self.reasons[reason] += 1
+            self.latencies["escalated" if reason else "direct"].append(latency)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = {name: list(values) for name, values in self.latencies.items()}
+            report = {
+                "requests": self.requests,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.requests if self.requests else 0.0,
+                "reasons": dict(self.reasons)
+            }
+        samples["all"] = samples["direct"] + samples["escalated"]
+        report["latency_ms"] = {
+            name: ({key: round(float(value), 2) for key, value in
+                    zip(("p50", "p95", "p99"), np.percentile(values, [50, 95, 99]) * 1000)}
+                   if values else {"p50": 0.0, "p95": 0.0, "p99": 0.0})
+            for name, values in samples.items()
+        }
+        return report
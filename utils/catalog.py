@@ -0,0 +1,206 @@
+"""
+参考文件元数据目录
+上传时把大小、哈希、尺寸、上传时间和标签写入嵌入式SQLite索引，
+列表查询只访问索引（游标分页+过滤+排序），不再逐个访问文件系统。
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 可排序字段（均建有 (字段, id) 复合索引，支持键集分页）
+SORT_FIELDS = ("uploaded_at", "size", "filename")
+MAX_PAGE_SIZE = 500
+# 已完成一次性导入旧文件时写入的 PRAGMA user_version
+BACKFILL_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    content_type TEXT,
+    uploaded_at REAL NOT NULL,
+    uploaded_by TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_refs_uploaded_at ON refs (uploaded_at, id);
+CREATE INDEX IF NOT EXISTS idx_refs_size ON refs (size, id);
+CREATE INDEX IF NOT EXISTS idx_refs_filename ON refs (filename, id);
+CREATE TABLE IF NOT EXISTS ref_tags (
+    ref_id INTEGER NOT NULL REFERENCES refs (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, ref_id)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = "id, sha256, filename, size, width, height, content_type, uploaded_at, uploaded_by"
+
+
+def encode_cursor(sort_value: Any, ref_id: int) -> str:
+    """游标 = 上一页最后一行的 (排序字段值, id)"""
+    raw = json.dumps([sort_value, ref_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, ref_id = json.loads(raw)
+        return sort_value, int(ref_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+class ReferenceCatalog:
+    """参考文件元数据索引（SQLite，线程安全）"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, sha256: str, filename: str, size: int, width: int = None, height: int = None,
+            content_type: str = None, uploaded_by: str = None, tags: Iterable[str] = (),
+            uploaded_at: float = None) -> Dict[str, Any]:
+        """
+        登记一个参考文件；相同哈希已存在时保留原记录，只合并新标签
+
+        Returns:
+            登记后的记录
+        """
+        tags = sorted({t.strip() for t in tags if t and t.strip()})
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO refs (sha256, filename, size, width, height, content_type,"
+                " uploaded_at, uploaded_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, filename, size, width, height, content_type,
+                 time.time() if uploaded_at is None else uploaded_at, uploaded_by)
+            )
+            ref_id = self._conn.execute("SELECT id FROM refs WHERE sha256 = ?", (sha256,)).fetchone()[0]
+            self._conn.executemany("INSERT OR IGNORE INTO ref_tags (ref_id, tag) VALUES (?, ?)",
+                                   [(ref_id, tag) for tag in tags])
+            return self._fetch([ref_id])[0]
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM refs WHERE sha256 = ?", (sha256,)).fetchone()
+            return self._fetch([row[0]])[0] if row else None
+
+    def list(self, cursor: str = None, limit: int = 50, sort: str = "uploaded_at", order: str = "desc",
+             tag: str = None, filename: str = None, content_type: str = None,
+             min_size: int = None, max_size: int = None) -> Dict[str, Any]:
+        """
+        分页查询
+
+        Args:
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数（最大 MAX_PAGE_SIZE）
+            sort: 排序字段，见 SORT_FIELDS
+            order: asc 或 desc
+            tag / filename / content_type / min_size / max_size: 过滤条件（filename为子串匹配）
+
+        Returns:
+            {'items': [...], 'next_cursor': str或None}
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"不支持的排序方向: {order}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        where, params = [], []
+        if tag:
+            where.append("id IN (SELECT ref_id FROM ref_tags WHERE tag = ?)")
+            params.append(tag)
+        if filename:
+            where.append("instr(filename, ?) > 0")
+            params.append(filename)
+        if content_type:
+            where.append("content_type = ?")
+            params.append(content_type)
+        if min_size is not None:
+            where.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            where.append("size <= ?")
+            params.append(max_size)
+        if cursor:
+            # 键集分页: 从上一页最后一行之后继续，不使用OFFSET
+            sort_value, last_id = decode_cursor(cursor)
+            where.append(f"({sort}, id) {'<' if order == 'desc' else '>'} (?, ?)")
+            params.extend([sort_value, last_id])
+
+        direction = order.upper()
+        sql = (f"SELECT id, {sort} FROM refs"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f" ORDER BY {sort} {direction}, id {direction} LIMIT ?")
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            items = self._fetch([row[0] for row in rows])
+
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    @property
+    def needs_backfill(self) -> bool:
+        """是否还没有导入元数据目录建立之前已有的参考文件"""
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0] < BACKFILL_VERSION
+
+    def mark_backfilled(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"PRAGMA user_version = {BACKFILL_VERSION}")
+
+    @contextmanager
+    def backfill_lock(self):
+        """导入已有文件的进程间排他锁（多个工作进程同时启动时只有一个执行导入，其余等待后跳过）"""
+        with open(self.db_path.with_name(self.db_path.name + ".backfill.lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+    def _fetch(self, ref_ids: List[int]) -> List[Dict[str, Any]]:
+        """按给定顺序取出记录及其标签（调用方需持有锁）"""
+        if not ref_ids:
+            return []
+        placeholders = ",".join("?" * len(ref_ids))
+        records = {
+            row["id"]: dict(row, tags=[])
+            for row in self._conn.execute(f"SELECT {_COLUMNS} FROM refs WHERE id IN ({placeholders})", ref_ids)
+        }
+        for ref_id, tag in self._conn.execute(
+                f"SELECT ref_id, tag FROM ref_tags WHERE ref_id IN ({placeholders}) ORDER BY tag", ref_ids):
+            records[ref_id]["tags"].append(tag)
+        return [records[ref_id] for ref_id in ref_ids]
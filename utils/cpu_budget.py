@@ -0,0 +1,219 @@
+"""
+CPU线程预算
+按可用核数（CPU亲和性与cgroup配额）在uvicorn工作进程之间切分核心，再在进程内
+分配torch intra-op/inter-op线程、OpenCV线程和推理调度槽位，避免多进程×多线程的超额订阅。
+可选把每个工作进程绑定到独立的CPU集合。
+"""
+
+import math
+import os
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import cv2
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 工作进程序号抢占锁文件（未显式指定序号时用于CPU绑定）
+_SLOT_LOCK_PATTERN = os.path.join(tempfile.gettempdir(), "ibrushpal-worker-{}.lock")
+
+
+def available_cpus() -> List[int]:
+    """当前进程可用的逻辑CPU编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """cgroup限制的CPU核数（容器内），未限制时返回None"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def physical_core_of(cpu: int) -> tuple:
+    """逻辑CPU所属的 (封装, 物理核)；读取失败时视为独立物理核"""
+    base = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+    try:
+        with open(f"{base}/physical_package_id") as f:
+            package = int(f.read())
+        with open(f"{base}/core_id") as f:
+            core = int(f.read())
+        return package, core
+    except (OSError, ValueError):
+        return 0, cpu
+
+
+class ThreadBudget:
+    """一个工作进程的线程分配结果"""
+
+    def __init__(self, total_cpus: int, workers: int, cpuset: List[int], torch_threads: int,
+                 torch_interop_threads: int, opencv_threads: int, executor_threads: int):
+        self.total_cpus = total_cpus
+        self.workers = workers
+        self.cpuset = cpuset
+        self.torch_threads = torch_threads
+        self.torch_interop_threads = torch_interop_threads
+        self.opencv_threads = opencv_threads
+        self.executor_threads = executor_threads
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def compute_thread_budget(workers: int, cpu_budget: int = 0, torch_threads: int = 0,
+                          torch_interop_threads: int = 1, opencv_threads: int = 0,
+                          executor_threads: int = 0, worker_index: int = 0) -> ThreadBudget:
+    """
+    计算线程预算（参数为0表示自动）
+
+    - 可用核数 = min(亲和性CPU数, cgroup配额)，可由 cpu_budget 覆盖
+    - 工作进程数不超过可用核数，每个进程分得连续的一组CPU（超线程兄弟核放在同一组）
+    - torch intra-op 默认等于本组的物理核数；OpenCV 默认等于本组逻辑核数
+    - 推理槽位（并发推理数）默认使 并发推理数 × torch线程数 不超过本组核数
+    """
+    cpus = available_cpus()
+    quota = cgroup_cpu_quota()
+    total = len(cpus)
+    if quota is not None:
+        total = min(total, max(1, math.ceil(quota)))
+    if cpu_budget > 0:
+        total = min(cpu_budget, len(cpus))
+
+    workers = max(1, min(workers, total))
+    per_worker = max(1, total // workers)
+
+    # 按物理核排序，使兄弟超线程相邻，再切分给各工作进程
+    ordered = sorted(cpus, key=physical_core_of)[:total]
+    start = (worker_index % workers) * per_worker
+    cpuset = ordered[start:start + per_worker] or ordered[:per_worker]
+    physical = len({physical_core_of(cpu) for cpu in cpuset})
+
+    torch_threads = torch_threads or max(1, physical)
+    opencv_threads = opencv_threads or per_worker
+    executor_threads = executor_threads or max(1, per_worker // torch_threads)
+    return ThreadBudget(total, workers, cpuset, torch_threads, torch_interop_threads,
+                        opencv_threads, executor_threads)
+
+
+class ThreadBudgetManager:
+    """线程预算管理器（每个工作进程一个全局实例）"""
+
+    def __init__(self):
+        self.budget: Optional[ThreadBudget] = None
+        self.worker_index: Optional[int] = None
+        self.pinned = False
+        self._torch_configured = False
+        self._slot_lock = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers: int, cpu_budget: int = 0, torch_threads: int = 0,
+                  torch_interop_threads: int = 1, opencv_threads: int = 0,
+                  executor_threads: int = 0, pin: bool = False) -> ThreadBudget:
+        """
+        计算并应用本进程的线程预算（重复调用只生效一次）
+
+        torch尚未导入时只设置 OMP/MKL 环境变量，模型懒加载导入torch后
+        需调用 configure_torch() 完成设置。
+        """
+        with self._lock:
+            if self.budget is not None:
+                return self.budget
+            self.worker_index = self._claim_worker_slot(workers) if pin else 0
+            budget = compute_thread_budget(workers, cpu_budget, torch_threads, torch_interop_threads,
+                                           opencv_threads, executor_threads, self.worker_index)
+
+            if pin and hasattr(os, "sched_setaffinity"):
+                try:
+                    os.sched_setaffinity(0, budget.cpuset)
+                    self.pinned = True
+                except OSError as e:
+                    print(f"⚠️  CPU绑定失败: {e}")
+
+            for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+                os.environ[name] = str(budget.torch_threads)
+            cv2.setNumThreads(budget.opencv_threads)
+            self.budget = budget
+
+        if "torch" in sys.modules:
+            self.configure_torch()
+        return budget
+
+    def configure_torch(self):
+        """
+        在导入ultralytics/torch之后调用：设置torch线程数并重新应用OpenCV线程数
+        （ultralytics导入时会把OpenCV线程数改为0）
+        """
+        if self.budget is None:
+            return
+        cv2.setNumThreads(self.budget.opencv_threads)
+        with self._lock:
+            if self._torch_configured or "torch" not in sys.modules:
+                return
+            import torch
+            torch.set_num_threads(self.budget.torch_threads)
+            try:
+                torch.set_num_interop_threads(self.budget.torch_interop_threads)
+            except RuntimeError:
+                # inter-op线程池已启动后无法再修改
+                pass
+            self._torch_configured = True
+
+    def status(self) -> Dict[str, Any]:
+        """配置值与实际生效值（供 /model-info 展示）"""
+        effective = {"opencv_threads": cv2.getNumThreads()}
+        if hasattr(os, "sched_getaffinity"):
+            effective["affinity"] = sorted(os.sched_getaffinity(0))
+        if "torch" in sys.modules:
+            torch = sys.modules["torch"]
+            effective["torch_threads"] = torch.get_num_threads()
+            effective["torch_interop_threads"] = torch.get_num_interop_threads()
+        return {
+            "configured": self.budget.as_dict() if self.budget else None,
+            "worker_index": self.worker_index,
+            "pid": os.getpid(),
+            "pinned": self.pinned,
+            "effective": effective
+        }
+
+    def _claim_worker_slot(self, workers: int) -> int:
+        """确定本进程的工作进程序号：优先读取环境变量，否则用文件锁抢占空闲序号"""
+        if "IBRUSHPAL_WORKER_INDEX" in os.environ:
+            return int(os.environ["IBRUSHPAL_WORKER_INDEX"])
+        if fcntl is None:
+            return os.getpid() % workers
+        for index in range(workers):
+            handle = open(_SLOT_LOCK_PATTERN.format(index), "w")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            # 持有锁直到进程退出
+            self._slot_lock = handle
+            return index
+        return os.getpid() % workers
+
+
+# 全局线程预算管理器
+thread_budget = ThreadBudgetManager()
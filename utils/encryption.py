@@ -1,8 +1,36 @@
 from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Sequence
 import base64
 import hashlib
+import json
 import os
+import struct
+import cv2
+import numpy as np
+from .masks import decode_rle
+
+# cryptography 的 AESGCM 对象复用密钥扩展，批量小记录加密时明显快于逐条新建 pycryptodome 密码对象
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    AESGCM_AVAILABLE = True
+except ImportError:
+    AESGCM_AVAILABLE = False
+
+# 分块加密容器格式:
+#   文件头: MAGIC(4) | 版本(1) | 保留(3) | 块大小(4, 大端) | 随机nonce前缀(8)
+#   数据帧: 每块 密文(与明文等长) | GCM标签(16)，除最后一块外长度固定，可按偏移直接定位
+# 每块nonce = nonce前缀 || 块序号(4)，AAD = 文件头 || 块序号(8) || 是否末块(1)，
+# 因此块的重排、截断和文件头篡改都会导致认证失败。
+CONTAINER_MAGIC = b"IBPE"
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct(">4sB3xI8s")
+GCM_TAG_SIZE = 16
+GCM_NONCE_SIZE = 12
+DEFAULT_CHUNK_SIZE = 1 << 20
 
 class DataEncryptor:
     """AES-256数据加密处理器"""
@@ -35,6 +63,204 @@ class DataEncryptor:
         decrypted = cipher.decrypt(ciphertext)
         return self._unpad(decrypted)
     
+    def encrypt_batch(self, records: Sequence[bytes], associated_data: bytes = None) -> Dict[str, object]:
+        """
+        批量加密小记录，输出Arrow风格的二进制列
+
+        每条记录独立使用AES-GCM（随机nonce），密文记录为 nonce(12) | 密文 | 标签(16)，
+        全部写入一个连续缓冲区，offsets[i]:offsets[i+1] 为第i条记录。
+
+        Args:
+            records: 明文记录列表
+            associated_data: 可选的整列附加认证数据（如字段名）
+
+        Returns:
+            {'data': bytes, 'offsets': np.ndarray(int64, N+1)}
+        """
+        count = len(records)
+        nonces = get_random_bytes(GCM_NONCE_SIZE * count)
+        parts = []
+        if AESGCM_AVAILABLE:
+            aead = AESGCM(self.key)
+            for i, record in enumerate(records):
+                nonce = nonces[i * GCM_NONCE_SIZE:(i + 1) * GCM_NONCE_SIZE]
+                parts.append(nonce)
+                parts.append(aead.encrypt(nonce, record, associated_data))
+        else:
+            for i, record in enumerate(records):
+                nonce = nonces[i * GCM_NONCE_SIZE:(i + 1) * GCM_NONCE_SIZE]
+                cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+                if associated_data:
+                    cipher.update(associated_data)
+                ciphertext, tag = cipher.encrypt_and_digest(record)
+                parts.append(nonce)
+                parts.append(ciphertext + tag)
+
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum([len(record) for record in records], out=offsets[1:])
+        offsets += np.arange(count + 1, dtype=np.int64) * (GCM_NONCE_SIZE + GCM_TAG_SIZE)
+        return {'data': b"".join(parts), 'offsets': offsets}
+
+    def decrypt_batch(self, column: Dict[str, object], associated_data: bytes = None) -> List[bytes]:
+        """批量解密 encrypt_batch 输出的二进制列"""
+        data = memoryview(column['data'])
+        offsets = np.asarray(column['offsets'], dtype=np.int64).tolist()
+        records = []
+        if AESGCM_AVAILABLE:
+            aead = AESGCM(self.key)
+            try:
+                for start, end in zip(offsets[:-1], offsets[1:]):
+                    nonce = data[start:start + GCM_NONCE_SIZE]
+                    records.append(aead.decrypt(nonce, data[start + GCM_NONCE_SIZE:end], associated_data))
+            except Exception:
+                # 统一与pycryptodome路径一致的异常类型
+                raise ValueError(f"记录 {len(records)} 认证失败（数据被篡改或密钥错误）")
+        else:
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                cipher = AES.new(self.key, AES.MODE_GCM, nonce=bytes(data[start:start + GCM_NONCE_SIZE]))
+                if associated_data:
+                    cipher.update(associated_data)
+                records.append(cipher.decrypt_and_verify(data[start + GCM_NONCE_SIZE:end - GCM_TAG_SIZE],
+                                                         data[end - GCM_TAG_SIZE:end]))
+        return records
+
+    def encrypt_stream(self, src: BinaryIO, dst: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       workers: int = None) -> int:
+        """
+        分块AES-GCM流式加密（多线程并行，内存占用与 workers × chunk_size 成正比）
+
+        Args:
+            src: 明文输入流
+            dst: 密文输出流
+            chunk_size: 明文块大小
+            workers: 并行加密线程数，默认CPU核数
+
+        Returns:
+            明文总字节数
+        """
+        workers = workers or os.cpu_count() or 1
+        header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, chunk_size, get_random_bytes(8))
+        dst.write(header)
+
+        total = 0
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            index = 0
+            chunk = src.read(chunk_size)
+            while True:
+                # 预读一块以判断当前块是否为末块（空输入也写出一个空的末块）
+                next_chunk = src.read(chunk_size) if len(chunk) == chunk_size else b""
+                is_last = not next_chunk
+                pending.append(executor.submit(self._encrypt_chunk, header, index, chunk, is_last))
+                total += len(chunk)
+
+                # 限制在途块数量，按顺序写出
+                while len(pending) >= workers * 2 or (is_last and pending):
+                    dst.write(pending.popleft().result())
+                if is_last:
+                    break
+                chunk = next_chunk
+                index += 1
+        return total
+
+    def decrypt_stream(self, src: BinaryIO, dst: BinaryIO, workers: int = None) -> int:
+        """分块AES-GCM流式解密，返回明文总字节数"""
+        return self._decrypt_frames(src, dst, 0, None, workers)
+
+    def encrypt_file(self, src_path: str, dst_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     workers: int = None) -> int:
+        """加密文件为分块容器"""
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            return self.encrypt_stream(src, dst, chunk_size, workers)
+
+    def decrypt_file(self, src_path: str, dst_path: str, workers: int = None) -> int:
+        """解密分块容器到文件（认证失败时删除不完整的输出）"""
+        try:
+            with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+                return self.decrypt_stream(src, dst, workers)
+        except ValueError:
+            if os.path.exists(dst_path):
+                os.remove(dst_path)
+            raise
+
+    def decrypt_range(self, src_path: str, offset: int, length: int) -> bytes:
+        """随机访问解密：只读取并验证覆盖 [offset, offset+length) 的数据块"""
+        if offset < 0 or length < 0:
+            raise ValueError("offset和length不能为负")
+        with open(src_path, "rb") as src:
+            return self._read_range(src, offset, length)
+
+    def _read_range(self, src: BinaryIO, offset: int, length: int) -> bytes:
+        header, chunk_size, num_chunks, plaintext_size = self._read_container_layout(src)
+        end = min(offset + length, plaintext_size)
+        if offset >= end:
+            return b""
+
+        first, last = offset // chunk_size, (end - 1) // chunk_size
+        frame_size = chunk_size + GCM_TAG_SIZE
+        src.seek(CONTAINER_HEADER.size + first * frame_size)
+        parts = []
+        for index in range(first, last + 1):
+            frame = src.read(frame_size)
+            parts.append(self._decrypt_chunk(header, index, frame, index == num_chunks - 1))
+        data = b"".join(parts)
+        start = offset - first * chunk_size
+        return data[start:start + (end - offset)]
+
+    def _decrypt_frames(self, src: BinaryIO, dst: BinaryIO, first: int, last: int, workers: int) -> int:
+        workers = workers or os.cpu_count() or 1
+        header, chunk_size, num_chunks, _ = self._read_container_layout(src)
+        last = num_chunks - 1 if last is None else last
+        frame_size = chunk_size + GCM_TAG_SIZE
+        src.seek(CONTAINER_HEADER.size + first * frame_size)
+
+        total = 0
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index in range(first, last + 1):
+                frame = src.read(frame_size)
+                pending.append(executor.submit(
+                    self._decrypt_chunk, header, index, frame, index == num_chunks - 1
+                ))
+                while len(pending) >= workers * 2 or (index == last and pending):
+                    plaintext = pending.popleft().result()
+                    dst.write(plaintext)
+                    total += len(plaintext)
+        return total
+
+    @staticmethod
+    def _read_container_layout(src: BinaryIO) -> tuple:
+        """读取文件头并根据容器大小推算块数和明文大小"""
+        src.seek(0)
+        header = src.read(CONTAINER_HEADER.size)
+        if len(header) != CONTAINER_HEADER.size:
+            raise ValueError("加密容器文件头不完整")
+        magic, version, chunk_size, _ = CONTAINER_HEADER.unpack(header)
+        if magic != CONTAINER_MAGIC or version != CONTAINER_VERSION:
+            raise ValueError("不是有效的加密容器")
+
+        body_size = src.seek(0, os.SEEK_END) - CONTAINER_HEADER.size
+        frame_size = chunk_size + GCM_TAG_SIZE
+        num_chunks = -(-body_size // frame_size)
+        last_size = body_size - (num_chunks - 1) * frame_size - GCM_TAG_SIZE
+        if num_chunks == 0 or last_size < 0:
+            raise ValueError("加密容器已被截断")
+        return header, chunk_size, num_chunks, (num_chunks - 1) * chunk_size + last_size
+
+    def _encrypt_chunk(self, header: bytes, index: int, chunk: bytes, is_last: bool) -> bytes:
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=header[-8:] + struct.pack(">I", index))
+        cipher.update(header + struct.pack(">Q?", index, is_last))
+        ciphertext, tag = cipher.encrypt_and_digest(chunk)
+        return ciphertext + tag
+
+    def _decrypt_chunk(self, header: bytes, index: int, frame: bytes, is_last: bool) -> bytes:
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=header[-8:] + struct.pack(">I", index))
+        cipher.update(header + struct.pack(">Q?", index, is_last))
+        try:
+            return cipher.decrypt_and_verify(frame[:-GCM_TAG_SIZE], frame[-GCM_TAG_SIZE:])
+        except ValueError:
+            raise ValueError(f"数据块 {index} 认证失败（数据被篡改、截断或密钥错误）")
+
     def _pad(self, s: bytes) -> bytes:
         """PKCS#7填充"""
         pad_len = self.bs - len(s) % self.bs
@@ -48,11 +274,124 @@ class DataEncryptor:
 class DataAnonymizer:
     """医疗数据脱敏处理器"""
     
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+    
+    @staticmethod
+    def anonymize_image(image: bytes, detections: List[Dict] = None, bbox_format: str = 'xyxy',
+                        keep: str = 'mouth', mode: str = 'blur', margin: float = 0.15,
+                        working_size: int = 96, quality: int = 90) -> bytes:
+        """
+        图像脱敏处理（保留牙齿/口腔区域，其余区域模糊或像素化）
+        
+        直接复用检测结果中的框和掩码，不再运行额外模型。模糊在缩小后的低分辨率图上完成，
+        放大后与原图按保留区域合成。没有检测结果时整张图脱敏。
+        
+        Args:
+            image: 编码后的图像字节
+            detections: 检测结果列表（含 bbox，可选 mask 为RLE或多边形）
+            bbox_format: bbox格式，xyxy 或 xywh（teeth_detection_api 的检测结果为 xywh）
+            keep: mouth 保留所有牙齿外接框扩展后的口腔区域；teeth 只保留每颗牙齿的掩码/框
+            mode: blur 高斯模糊；pixelate 马赛克
+            margin: 口腔区域向外扩展的比例
+            working_size: 低分辨率工作图的长边像素数
+            quality: JPEG编码质量
+        """
+        frame = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("无法解码图像数据")
+        
+        anonymized = DataAnonymizer.anonymize_frame(frame, detections, bbox_format, keep,
+                                                    mode, margin, working_size)
+        success, encoded = cv2.imencode('.jpg', anonymized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise ValueError("无法编码脱敏图像")
+        return encoded.tobytes()
+    
+    @staticmethod
+    def anonymize_frame(frame: np.ndarray, detections: List[Dict] = None, bbox_format: str = 'xyxy',
+                        keep: str = 'mouth', mode: str = 'blur', margin: float = 0.15,
+                        working_size: int = 96) -> np.ndarray:
+        """对已解码的BGR图像脱敏，参数同 anonymize_image"""
+        height, width = frame.shape[:2]
+        
+        # 低分辨率模糊/像素化后放大
+        scale = working_size / max(height, width)
+        small_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        small = cv2.resize(frame, small_size, interpolation=cv2.INTER_AREA)
+        if mode == 'pixelate':
+            small = cv2.resize(small, (max(1, small_size[0] // 4), max(1, small_size[1] // 4)),
+                               interpolation=cv2.INTER_AREA)
+            result = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+        else:
+            small = cv2.GaussianBlur(small, (0, 0), sigmaX=3)
+            result = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+        
+        keep_mask = DataAnonymizer._keep_mask((height, width), detections or [], bbox_format, keep, margin)
+        cv2.copyTo(frame, keep_mask, result)
+        return result
+    
     @staticmethod
-    def anonymize_image(image: bytes) -> bytes:
-        """图像脱敏处理（保留牙齿区域）"""
-        # TODO: 实现基于CV的牙齿区域保留算法
-        return image
+    def _keep_mask(shape: tuple, detections: List[Dict], bbox_format: str, keep: str,
+                   margin: float) -> np.ndarray:
+        """根据检测框/掩码生成保留区域掩码"""
+        height, width = shape
+        keep_mask = np.zeros((height, width), dtype=np.uint8)
+        if not detections:
+            return keep_mask
+        
+        boxes = np.array([det['bbox'] for det in detections], dtype=np.float64).reshape(-1, 4)
+        if bbox_format == 'xywh':
+            boxes[:, 2:] += boxes[:, :2]
+        
+        if keep == 'mouth':
+            x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+            x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+            pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+            x1, x2 = int(max(0, x1 - pad_x)), int(min(width, x2 + pad_x))
+            y1, y2 = int(max(0, y1 - pad_y)), int(min(height, y2 + pad_y))
+            keep_mask[y1:y2, x1:x2] = 1
+            return keep_mask
+        
+        for det, (x1, y1, x2, y2) in zip(detections, boxes.astype(int)):
+            mask = det.get('mask')
+            if isinstance(mask, dict):
+                # RLE掩码（原型或原图分辨率）
+                decoded = decode_rle(mask)
+                if decoded.shape != (height, width):
+                    decoded = cv2.resize(decoded, (width, height), interpolation=cv2.INTER_NEAREST)
+                keep_mask |= decoded
+            elif isinstance(mask, list) and mask:
+                # 多边形掩码（原图坐标）
+                polygons = [np.array(p, dtype=np.float32).reshape(-1, 2).round().astype(np.int32) for p in mask]
+                cv2.fillPoly(keep_mask, polygons, 1)
+            else:
+                keep_mask[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = 1
+        return keep_mask
+    
+    @staticmethod
+    def anonymize_directory(src_dir: str, dst_dir: str, workers: int = None, **options) -> Dict[str, int]:
+        """
+        批量脱敏整个目录（多进程）
+        
+        每张图片的检测结果从同名的 .json 旁车文件读取（detect-teeth 接口的响应，
+        取 teeth_regions 或 detections 字段）；没有旁车文件的图片整张脱敏。
+        
+        Returns:
+            {'processed': 成功数, 'failed': 失败数}
+        """
+        src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        tasks = [
+            (str(path), str(dst_dir / (path.stem + '.jpg')), options)
+            for path in sorted(src_dir.iterdir())
+            if path.suffix.lower() in DataAnonymizer.IMAGE_EXTENSIONS
+        ]
+        
+        stats = {'processed': 0, 'failed': 0}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for ok in executor.map(_anonymize_file, tasks, chunksize=8):
+                stats['processed' if ok else 'failed'] += 1
+        return stats
         
     @staticmethod
     def anonymize_metadata(metadata: dict) -> dict:
@@ -61,4 +400,25 @@ class DataAnonymizer:
             'age_range': f"{metadata['age']//10*10}-{metadata['age']//10*10+9}",
             'gender': metadata['gender'][0] if metadata['gender'] else 'U',
             'location': metadata['location'][:3] + '****'
-        }
\ No newline at end of file
+        }
+
+
+def _anonymize_file(task: tuple) -> bool:
+    """进程池任务：脱敏单个文件"""
+    src_path, dst_path, options = task
+    try:
+        detections = None
+        sidecar = Path(src_path).with_suffix('.json')
+        if sidecar.exists():
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            detections = result.get('teeth_regions') or result.get('detections')
+        
+        with open(src_path, 'rb') as f:
+            anonymized = DataAnonymizer.anonymize_image(f.read(), detections, **options)
+        with open(dst_path, 'wb') as f:
+            f.write(anonymized)
+        return True
+    except Exception as e:
+        print(f"❌ 脱敏失败 {src_path}: {e}")
+        return False
\ No newline at end of file
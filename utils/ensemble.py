@@ -0,0 +1,200 @@
+"""
+多模型并行集成检测
+各成员检测器作为独立任务提交到推理调度通道，在多个推理槽上并行执行，
+推理槽数不少于成员数时集成延迟接近最慢的成员而不是各成员之和（槽数由 IBRUSHPAL_EXECUTOR_THREADS 配置，
+默认按 核数 // torch线程数 计算，通常小于成员数，此时部分成员排队串行）；结果用加权框融合（WBF）合并，
+融合框坐标为簇内各框按得分加权的平均，而不是像NMS那样只保留最高分的框。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def _pairwise_iou(boxes: np.ndarray) -> np.ndarray:
+    """框两两之间的IoU矩阵（xyxy）"""
+    x1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(areas[:, None] + areas[None, :] - inter, 1e-9)
+
+
+def weighted_boxes_fusion(boxes_list: Sequence[np.ndarray], scores_list: Sequence[np.ndarray],
+                          labels_list: Sequence[np.ndarray], weights: Sequence[float] = None,
+                          iou_threshold: float = 0.55, skip_threshold: float = 0.0,
+                          class_agnostic: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    加权框融合
+
+    先向量化计算两两IoU，再按得分从高到低贪心聚类（每个簇一次吸收与簇中心IoU超过阈值的框）；
+    簇坐标为（乘以成员权重后的）得分加权平均；簇得分为各参与成员的原始得分（同一成员的多个框取平均）
+    按成员权重加权求和再除以全部成员的权重之和，取值保持在[0, 1]，
+    只被少数或低权重成员检测到的框得分相应降低。
+
+    Args:
+        boxes_list: 每个成员的框 (N_i, 4)，xyxy
+        scores_list: 每个成员的得分 (N_i,)
+        labels_list: 每个成员的类别 (N_i,)
+        weights: 成员权重（默认均为1）
+        class_agnostic: 为True时不区分类别融合，融合框类别取簇内得分最高的框
+    Returns:
+        (boxes (K, 4), scores (K,), labels (K,), votes (K,) 簇内成员数)
+    """
+    weights = np.ones(len(boxes_list)) if weights is None else np.asarray(weights, dtype=np.float64)
+    empty = np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if not len(boxes_list) or not sum(len(b) for b in boxes_list):
+        return empty
+    boxes = np.concatenate([np.asarray(b, dtype=np.float64).reshape(-1, 4) for b in boxes_list])
+    members = np.concatenate([np.full(len(b), i) for i, b in enumerate(boxes_list)])
+    raw_scores = np.concatenate([np.asarray(s, dtype=np.float64).reshape(-1) for s in scores_list])
+    scores = raw_scores * weights[members]
+    labels = np.concatenate([np.asarray(l, dtype=np.int64).reshape(-1) for l in labels_list])
+    keep = scores >= skip_threshold
+    boxes, scores, raw_scores, labels, members = (boxes[keep], scores[keep], raw_scores[keep], labels[keep],
+                                                  members[keep])
+    if not keep.any():
+        return empty
+
+    groups = np.zeros(len(labels), dtype=np.int64) if class_agnostic else labels
+    out = []
+    for group in np.unique(groups):
+        index = np.flatnonzero(groups == group)
+        index = index[np.argsort(-scores[index], kind="stable")]
+        iou = _pairwise_iou(boxes[index])
+        # 贪心聚类: 剩余框中得分最高的框作为簇中心，一次吸收与其IoU超过阈值的所有剩余框
+        cluster = np.full(len(index), -1)
+        seeds = []
+        for k in range(len(index)):
+            if cluster[k] >= 0:
+                continue
+            joined = (cluster < 0) & (iou[k] > iou_threshold)
+            joined[k] = True
+            cluster[joined] = len(seeds)
+            seeds.append(k)
+        n = len(seeds)
+
+        weighted_sum = np.zeros((n, 4))
+        np.add.at(weighted_sum, cluster, scores[index, None] * boxes[index])
+        score_sum = np.bincount(cluster, weights=scores[index], minlength=n)
+        # 每个 (簇, 成员) 的原始平均得分，同一成员的多个框只计一票
+        pairs, inverse = np.unique(np.stack([cluster, members[index]], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        pair_scores = np.bincount(inverse, weights=raw_scores[index]) / np.bincount(inverse)
+        votes = np.bincount(pairs[:, 0], minlength=n)
+        fused_scores = np.bincount(pairs[:, 0], weights=weights[pairs[:, 1]] * pair_scores, minlength=n) / weights.sum()
+        out.append((weighted_sum / score_sum[:, None], fused_scores, labels[index[seeds]], votes))
+
+    boxes, scores, labels, votes = (np.concatenate(parts) for parts in zip(*out))
+    order = np.argsort(-scores, kind="stable")
+    return boxes[order], scores[order], labels[order], votes[order]
+
+
+class EnsembleDetector:
+    """并行集成检测器（成员输出ToothDetector格式: class/confidence/bbox(xyxy)）"""
+
+    def __init__(self, members: List[Tuple[str, Callable[[np.ndarray], List[Dict]], float]], scheduler,
+                 lane: str = "interactive", iou_threshold: float = 0.55, skip_threshold: float = 0.1,
+                 conf_threshold: float = 0.0, min_votes: int = 1, window: int = 1024):
+        """
+        Args:
+            members: [(名称, 检测函数, 权重)]
+            scheduler: LaneScheduler，成员作为独立任务提交以并行执行
+            conf_threshold: 融合后得分低于该值的框被丢弃
+            min_votes: 融合框至少需要的成员数
+        """
+        self.members = members
+        self.scheduler = scheduler
+        self.lane = lane
+        self.iou_threshold = iou_threshold
+        self.skip_threshold = skip_threshold
+        self.conf_threshold = conf_threshold
+        self.min_votes = min_votes
+        self._latencies = {name: deque(maxlen=window) for name in ["ensemble", "fusion"] + [m[0] for m in members]}
+        self._failures = {name: 0 for name, _, _ in members}
+        self._lock = threading.Lock()
+
+    async def detect(self, image: np.ndarray) -> List[Dict]:
+        """并行运行所有成员并融合结果（失败的成员被跳过，全部失败时抛出RuntimeError）"""
+        start = time.perf_counter()
+
+        async def run(name, func):
+            started = time.perf_counter()
+            detections = await self.scheduler.run(self.lane, func, image)
+            return detections, time.perf_counter() - started
+
+        outcomes = await asyncio.gather(*(run(name, func) for name, func, _ in self.members),
+                                        return_exceptions=True)
+        detections, weights = [], []
+        with self._lock:
+            for (name, _, weight), outcome in zip(self.members, outcomes):
+                if isinstance(outcome, BaseException):
+                    self._failures[name] += 1
+                    continue
+                detections.append(outcome[0])
+                weights.append(weight)
+                self._latencies[name].append(outcome[1])
+        if not detections:
+            raise RuntimeError("集成检测的所有成员均失败")
+
+        fusion_start = time.perf_counter()
+        fused = self.fuse(detections, weights)
+        finished = time.perf_counter()
+        with self._lock:
+            self._latencies["fusion"].append(finished - fusion_start)
+            self._latencies["ensemble"].append(finished - start)
+        return fused
+
+    def fuse(self, detections: List[List[Dict]], weights: List[float]) -> List[Dict]:
+        """将各成员的检测结果做加权框融合，并按融合得分和成员数过滤"""
+        classes: Dict[str, int] = {}
+        boxes, scores, labels = [], [], []
+        for member in detections:
+            boxes.append(np.array([d['bbox'] for d in member], dtype=np.float64).reshape(-1, 4))
+            scores.append(np.array([d['confidence'] for d in member], dtype=np.float64))
+            labels.append(np.array([classes.setdefault(d['class'], len(classes)) for d in member], dtype=np.int64))
+        names = {index: name for name, index in classes.items()}
+        fused_boxes, fused_scores, fused_labels, votes = weighted_boxes_fusion(
+            boxes, scores, labels, weights, self.iou_threshold, self.skip_threshold, class_agnostic=True
+        )
+        keep = (fused_scores >= self.conf_threshold) & (votes >= self.min_votes)
+        fused_boxes, fused_scores, fused_labels, votes = (fused_boxes[keep], fused_scores[keep],
+                                                          fused_labels[keep], votes[keep])
+        results = []
+        for box, score, label, vote in zip(np.rint(fused_boxes).astype(int).tolist(), fused_scores.tolist(),
+                                          fused_labels.tolist(), votes.tolist()):
+            x1, y1, x2, y2 = box
+            results.append({
+                'class': names[label],
+                'confidence': score,
+                'bbox': box,
+                'center': [(x1 + x2) // 2, (y1 + y2) // 2],
+                'votes': vote
+            })
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        各成员/融合/整体延迟均值与p95，成员串行执行时的延迟之和（用于对比并行收益），
+        以及当前推理槽数下最多能同时运行的成员数
+        """
+        with self._lock:
+            report = {}
+            for name, samples in self._latencies.items():
+                if samples:
+                    values = np.fromiter(samples, dtype=np.float64)
+                    report[name] = {"mean_ms": round(float(values.mean()) * 1000, 2),
+                                    "p95_ms": round(float(np.percentile(values, 95)) * 1000, 2)}
+            member_means = [report[name]["mean_ms"] for name, _, _ in self.members if name in report]
+            return {
+                "latency": report,
+                "sequential_estimate_ms": round(sum(member_means), 2),
+                "parallel_members": min(self.scheduler.slots or 1, len(self.members)),
+                "failures": dict(self._failures)
+            }
@@ -0,0 +1,230 @@
+"""
+原始数据增量导入
+扫描原始上传目录（RAW_DATA_DIR）中的图像，在进程池中并行完成
+解码 → 校验 → SHA-256去重 → 脱敏 → 缩放，处理后的样本以样本键（原始内容哈希、处理参数和
+检测结果旁车文件内容共同的哈希）命名写入 processed/samples/，
+并在 processed/manifest.json 中记录每个原始文件的处理结果。
+
+再次运行时按清单中记录的大小和修改时间（含检测结果旁车文件）跳过未变化的文件，
+只处理新增或修改的文件；原始文件被删除后清单条目随之移除，
+不再被任何条目引用的样本一并删除。处理参数变化时全部重新处理。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .encryption import DataAnonymizer
+
+MANIFEST_VERSION = 2
+MANIFEST_SAVE_INTERVAL = 200  # 每处理多少个文件保存一次清单（中断后已完成的部分不必重做）
+
+
+def _signature(path: Path) -> Dict:
+    """文件变化判断依据: 原始文件和检测结果旁车文件的大小与修改时间"""
+    stat = path.stat()
+    sidecar = path.with_suffix('.json')
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sidecar_mtime': sidecar.stat().st_mtime if sidecar.exists() else None
+    }
+
+
+def _sidecar_detections(sidecar: Optional[bytes]) -> Optional[List[Dict]]:
+    """解析同名 .json 旁车文件中的检测结果（与 DataAnonymizer.anonymize_directory 约定一致）"""
+    if sidecar is None:
+        return None
+    result = json.loads(sidecar.decode('utf-8'))
+    return result.get('teeth_regions') or result.get('detections')
+
+
+def sample_key(digest: str, options: Dict, sidecar: Optional[bytes]) -> str:
+    """样本键: 相同内容在相同处理参数和旁车检测结果下的输出相同，可直接复用已有样本"""
+    h = hashlib.sha256(digest.encode())
+    h.update(json.dumps(options, sort_keys=True).encode())
+    if sidecar is not None:
+        h.update(hashlib.sha256(sidecar).digest())
+    return h.hexdigest()
+
+
+def _ingest_file(task: Tuple[str, str, Dict]) -> Dict:
+    """进程池任务：处理单个原始文件，返回清单条目（不含去重归属，由主进程判定）"""
+    src_path, samples_dir, options = task
+    path = Path(src_path)
+    entry = {'status': 'ok'}
+    try:
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        sidecar_path = path.with_suffix('.json')
+        sidecar = sidecar_path.read_bytes() if sidecar_path.exists() else None
+        key = sample_key(digest, options, sidecar)
+        entry.update({'sha256': digest, 'sample': key})
+        output = Path(samples_dir) / f"{key}.jpg"
+        if output.exists():
+            # 相同内容、参数和旁车检测结果已处理过（重复上传或改名），跳过解码和脱敏
+            return entry
+
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return {**entry, 'status': 'invalid', 'reason': '无法解码图像'}
+        height, width = frame.shape[:2]
+        if min(height, width) < options['min_side']:
+            return {**entry, 'status': 'invalid', 'reason': f"分辨率 {width}x{height} 过低"}
+
+        # 脱敏: 优先使用旁车文件中的检测结果，否则用传统方法定位牙齿以保留口腔区域
+        detections, bbox_format = _sidecar_detections(sidecar), options['bbox_format']
+        if detections is None:
+            from models.tooth_detection import TraditionalToothDetector
+            detections, bbox_format = TraditionalToothDetector().detect(frame), 'xyxy'
+        frame = DataAnonymizer.anonymize_frame(frame, detections, bbox_format, options['keep'],
+                                               options['mode'])
+
+        scale = options['max_side'] / max(height, width)
+        if scale < 1:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        success, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, options['quality']])
+        if not success:
+            raise ValueError("无法编码图像")
+
+        # 先写临时文件再原子替换（并发处理相同内容时结果一致）
+        fd, tmp_path = tempfile.mkstemp(dir=samples_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, output)
+        entry.update({'width': frame.shape[1], 'height': frame.shape[0], 'teeth': len(detections)})
+        return entry
+    except Exception as e:
+        return {**entry, 'status': 'failed', 'reason': str(e)}
+
+
+class IngestionPipeline:
+    """原始数据 → 处理后样本的增量导入流水线"""
+
+    def __init__(self, raw_dir, processed_dir, max_side: int = 1280, min_side: int = 320,
+                 quality: int = 90, mode: str = 'blur', keep: str = 'mouth', bbox_format: str = 'xywh',
+                 workers: int = None):
+        """
+        Args:
+            max_side: 处理后样本的最大长边（只缩小不放大）
+            min_side: 短边低于该值的图像视为无效
+            mode/keep: 脱敏方式，见 DataAnonymizer.anonymize_image
+            bbox_format: 旁车文件中检测框的格式（detect-teeth 的结果为 xywh）
+            workers: 进程数，None为CPU核数
+        """
+        self.raw_dir = Path(raw_dir)
+        self.processed_dir = Path(processed_dir)
+        self.samples_dir = self.processed_dir / 'samples'
+        self.manifest_path = self.processed_dir / 'manifest.json'
+        self.workers = workers
+        self.options = {'max_side': max_side, 'min_side': min_side, 'quality': quality, 'mode': mode,
+                        'keep': keep, 'bbox_format': bbox_format}
+        os.makedirs(self.samples_dir, exist_ok=True)
+
+    def scan(self) -> Dict[str, Dict]:
+        """递归扫描原始目录，返回 {相对路径: 文件签名}"""
+        return {
+            path.relative_to(self.raw_dir).as_posix(): _signature(path)
+            for path in sorted(self.raw_dir.rglob('*'))
+            if path.is_file() and path.suffix.lower() in DataAnonymizer.IMAGE_EXTENSIONS
+        }
+
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            manifest = None
+        if (manifest is None or manifest.get('version') != MANIFEST_VERSION
+                or manifest.get('options') != self.options):
+            return {'version': MANIFEST_VERSION, 'options': self.options, 'files': {}}
+        return manifest
+
+    def save_manifest(self, manifest: Dict):
+        """先写临时文件再原子替换"""
+        manifest['updated_at'] = time.time()
+        fd, tmp_path = tempfile.mkstemp(dir=self.processed_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.manifest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def run(self) -> Dict[str, float]:
+        """
+        执行一次增量导入
+
+        Returns:
+            统计: 扫描/跳过(未变化)/处理/重复/无效/失败/移除的文件数和耗时
+        """
+        start = time.perf_counter()
+        manifest = self.load_manifest()
+        entries = manifest['files']
+        current = self.scan()
+        stats = {'scanned': len(current), 'skipped': 0, 'processed': 0, 'duplicate': 0, 'invalid': 0,
+                 'failed': 0, 'removed': 0}
+
+        for name in set(entries) - set(current):
+            del entries[name]
+            stats['removed'] += 1
+        pending = []
+        for name, signature in current.items():
+            entry = entries.get(name)
+            if entry is not None and entry['source'] == signature and entry['status'] != 'failed':
+                stats['skipped'] += 1
+            else:
+                pending.append(name)
+
+        # 样本键 -> 拥有该样本的原始文件（按路径顺序，先出现者为准）
+        owners = {}
+        pending_names = set(pending)
+        for name in sorted(entries):
+            if name not in pending_names and entries[name]['status'] == 'ok':
+                owners.setdefault(entries[name]['sample'], name)
+
+        tasks = [(str(self.raw_dir / name), str(self.samples_dir), self.options) for name in pending]
+        if tasks:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(_ingest_file, tasks, chunksize=max(1, min(16, len(tasks) // 64)))
+                for count, (name, entry) in enumerate(zip(pending, results), 1):
+                    entry['source'] = current[name]
+                    if entry['status'] == 'ok':
+                        owner = owners.setdefault(entry['sample'], name)
+                        if owner != name:
+                            entry['status'], entry['duplicate_of'] = 'duplicate', owner
+                    stats['processed' if entry['status'] == 'ok' else entry['status']] += 1
+                    if entry['status'] == 'failed':
+                        print(f"❌ 导入失败 {name}: {entry['reason']}")
+                    entries[name] = entry
+                    if count % MANIFEST_SAVE_INTERVAL == 0:
+                        self.save_manifest(manifest)
+
+        # 原拥有者被删除或内容已变化的重复条目接管样本
+        for name in sorted(entries):
+            entry = entries[name]
+            if entry['status'] == 'duplicate':
+                owner = owners.setdefault(entry['sample'], name)
+                if owner == name:
+                    entry['status'] = 'ok'
+                    del entry['duplicate_of']
+                else:
+                    entry['duplicate_of'] = owner
+
+        # 清理不再被引用的样本
+        referenced = {entry.get('sample') for entry in entries.values() if entry['status'] == 'ok'}
+        for path in self.samples_dir.glob('*.jpg'):
+            if path.stem not in referenced:
+                path.unlink()
+        self.save_manifest(manifest)
+        stats['elapsed'] = time.perf_counter() - start
+        return stats
@@ -0,0 +1,143 @@
+"""
+分割掩码的紧凑编码
+默认在原型分辨率（输入尺寸的1/4）下编码为RLE或简化多边形，
+仅当客户端要求时才上采样到原图分辨率。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# YOLOv8-seg 原型掩码相对输入图像的步长
+MASK_STRIDE = 4
+MASK_FORMATS = ("rle", "polygon")
+# cv2.resize 单次最多处理512个通道
+_RESIZE_MAX_CHANNELS = 512
+
+
+def extract_masks(result, stride: int = MASK_STRIDE) -> Optional[np.ndarray]:
+    """
+    从YOLO结果中取出二值掩码 (N, h, w)
+
+    去除letterbox填充后按步长降采样到原型分辨率。切片和阈值在张量所在设备上完成，
+    只把降采样后的布尔掩码拷回CPU。
+    """
+    masks = getattr(result, 'masks', None)
+    if masks is None:
+        return None
+
+    data = masks.data
+    input_h, input_w = data.shape[1:]
+    orig_h, orig_w = result.orig_shape[:2]
+
+    # 计算letterbox的有效区域
+    gain = min(input_h / orig_h, input_w / orig_w)
+    pad_x = int(round((input_w - orig_w * gain) / 2 - 0.1))
+    pad_y = int(round((input_h - orig_h * gain) / 2 - 0.1))
+    data = data[:, pad_y:input_h - pad_y:stride, pad_x:input_w - pad_x:stride] > 0.5
+
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    return np.ascontiguousarray(data, dtype=np.uint8)
+
+
+def upsample_masks(masks: np.ndarray, image_shape: Tuple[int, int]) -> np.ndarray:
+    """将掩码批量上采样到原图分辨率（掩码作为通道一次性resize）"""
+    height, width = image_shape[:2]
+    if len(masks) == 0:
+        return np.zeros((0, height, width), dtype=np.uint8)
+
+    upsampled = []
+    for start in range(0, len(masks), _RESIZE_MAX_CHANNELS):
+        chunk = masks[start:start + _RESIZE_MAX_CHANNELS].transpose(1, 2, 0)
+        resized = cv2.resize(chunk, (width, height), interpolation=cv2.INTER_NEAREST)
+        upsampled.append(resized.reshape(height, width, -1).transpose(2, 0, 1))
+    return np.ascontiguousarray(np.concatenate(upsampled))
+
+
+def encode_rle(masks: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    批量RLE编码（COCO未压缩格式，按列优先展开，counts从0值游程开始）
+    """
+    if len(masks) == 0:
+        return []
+
+    count, height, width = masks.shape
+    flat = masks.transpose(0, 2, 1).reshape(count, -1).astype(bool)
+
+    # 一次性找出所有掩码中值发生变化的位置
+    rows, cols = np.nonzero(flat[:, 1:] != flat[:, :-1])
+    splits = np.searchsorted(rows, np.arange(1, count))
+    size = height * width
+
+    encoded = []
+    for i, change in enumerate(np.split(cols + 1, splits)):
+        bounds = np.concatenate(([0], change, [size]))
+        counts = np.diff(bounds)
+        if flat[i, 0]:
+            counts = np.concatenate(([0], counts))
+        encoded.append({'size': [height, width], 'counts': counts.tolist()})
+    return encoded
+
+
+def decode_rle(rle: Dict[str, Any]) -> np.ndarray:
+    """RLE解码为二值掩码"""
+    height, width = rle['size']
+    counts = np.asarray(rle['counts'], dtype=np.int64)
+    values = (np.arange(len(counts)) % 2).astype(np.uint8)
+    return np.repeat(values, counts).reshape(width, height).T
+
+
+def encode_polygons(masks: np.ndarray, scale: Tuple[float, float] = (1.0, 1.0),
+                    epsilon: float = 1.0) -> List[List[List[float]]]:
+    """
+    将掩码编码为简化多边形
+
+    Args:
+        masks: 二值掩码 (N, h, w)
+        scale: 多边形坐标缩放系数 (sx, sy)，用于映射回原图坐标
+        epsilon: approxPolyDP 简化容差（掩码像素）
+
+    Returns:
+        每个掩码的多边形列表，每个多边形为展平的 [x1, y1, x2, y2, ...]
+    """
+    factor = np.array(scale, dtype=np.float32)
+    encoded = []
+    for mask in masks:
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        polygons = []
+        for contour in contours:
+            approx = cv2.approxPolyDP(contour, epsilon, True)
+            if len(approx) < 3:
+                continue
+            points = approx.reshape(-1, 2).astype(np.float32) * factor
+            polygons.append(np.round(points, 1).ravel().tolist())
+        encoded.append(polygons)
+    return encoded
+
+
+def encode_masks(masks: Optional[np.ndarray], image_shape: Tuple[int, int],
+                 mask_format: str = "rle", full_resolution: bool = False) -> List[Any]:
+    """
+    按请求格式编码掩码
+
+    Args:
+        masks: extract_masks 返回的原型分辨率掩码
+        image_shape: 原图尺寸 (h, w)
+        mask_format: rle 或 polygon
+        full_resolution: rle 是否上采样到原图分辨率（polygon 坐标始终映射到原图）
+    """
+    if mask_format not in MASK_FORMATS:
+        raise ValueError(f"不支持的掩码格式: {mask_format}")
+    if masks is None:
+        return []
+
+    if mask_format == "polygon":
+        height, width = image_shape[:2]
+        mask_h, mask_w = masks.shape[1:]
+        return encode_polygons(masks, (width / max(mask_w, 1), height / max(mask_h, 1)))
+
+    if full_resolution:
+        masks = upsample_masks(masks, image_shape)
+    return encode_rle(masks)
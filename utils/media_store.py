@@ -0,0 +1,156 @@
+"""
+内容寻址媒体存储
+上传文件边写入边计算SHA-256，以哈希作为对象名分片存放，相同内容只保存一份；
+分析结果同样以内容哈希为键缓存，重复上传的相同字节直接复用结果。
+
+目录结构:
+    root/objects/ab/cd/abcd...   原始字节
+    root/results/ab/abcd.../<key>.json   分析结果
+    root/tmp/   上传中的临时文件
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .serialization import _to_builtin
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class MediaStore:
+    """基于SHA-256的去重媒体存储"""
+
+    def __init__(self, root, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.objects_dir = self.root / "objects"
+        self.results_dir = self.root / "results"
+        self.tmp_dir = self.root / "tmp"
+        for directory in (self.objects_dir, self.results_dir, self.tmp_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        """对象路径（两级分片，避免单目录文件过多）"""
+        return self.objects_dir / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def read(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+    def put_stream(self, chunks: Iterable[bytes]) -> Tuple[str, int, bool]:
+        """
+        写入字节流
+
+        Returns:
+            (sha256十六进制, 字节数, 是否为新对象)
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    buffer.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            return digest, size, self._commit(tmp_path, digest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_bytes(self, data: bytes) -> Tuple[str, int, bool]:
+        """写入内存中的字节"""
+        return self.put_stream([data])
+
+    async def save_upload(self, upload, inspect: Callable[[bytes], None] = None) -> Tuple[str, int, bool]:
+        """分块读取FastAPI UploadFile并写入（不把整个文件读入内存）"""
+        async def chunks():
+            while True:
+                chunk = await upload.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        return await self.save_async_stream(chunks(), inspect)
+
+    async def save_async_stream(self, chunks: AsyncIterable[bytes],
+                                inspect: Callable[[bytes], None] = None) -> Tuple[str, int, bool]:
+        """
+        写入异步字节流（如 Request.stream()）
+
+        Args:
+            inspect: 每块写入前调用，抛出异常即中止写入（临时文件被删除，剩余数据不再读取）
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                async for chunk in chunks:
+                    if inspect is not None:
+                        inspect(chunk)
+                    hasher.update(chunk)
+                    buffer.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            return digest, size, self._commit(tmp_path, digest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _commit(self, tmp_path: str, digest: str) -> bool:
+        """把临时文件移动到对象位置；已存在相同内容时丢弃临时文件"""
+        target = self.path(digest)
+        if target.exists():
+            return False
+        os.makedirs(target.parent, exist_ok=True)
+        os.replace(tmp_path, target)
+        return True
+
+    def iter_objects(self) -> Iterator[Tuple[str, Path]]:
+        """遍历所有对象 (digest, path)"""
+        for path in self.objects_dir.glob("*/*/*"):
+            yield path.name, path
+
+    @staticmethod
+    def result_key(name: str, **params) -> str:
+        """由分析类型和参数生成结果键（参数不同的结果分别缓存）"""
+        if not params:
+            return name
+        encoded = json.dumps(params, sort_keys=True, default=str).encode()
+        return f"{name}-{hashlib.sha1(encoded).hexdigest()[:16]}"
+
+    def _result_path(self, digest: str, key: str) -> Path:
+        return self.results_dir / digest[:2] / digest / f"{key}.json"
+
+    def has_result(self, digest: str, key: str) -> bool:
+        """结果是否存在（不读取内容）"""
+        return self._result_path(digest, key).exists()
+
+    def get_result(self, digest: str, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的分析结果，不存在时返回None"""
+        path = self._result_path(digest, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put_result(self, digest: str, key: str, result: Dict[str, Any]):
+        """保存分析结果（先写临时文件再原子替换）"""
+        path = self._result_path(digest, key)
+        os.makedirs(path.parent, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(_to_builtin(result), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,201 @@
+"""
+按延迟预算选择检测方案
+请求携带质量分级（fast/balanced/accurate）或延迟预算，服务端根据在线延迟模型
+选择模型变体、输入尺寸和切片数：在剩余预算内选择精度最高的方案。
+延迟模型按实测推理时间持续更新，并统计各分级的SLA达成率。
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 方案: (模型变体, 输入尺寸, 每边切片数)
+Plan = Tuple[str, int, int]
+
+
+def plan_megapixels(plan: Plan) -> float:
+    """方案实际送入模型的像素量（百万）"""
+    _, imgsz, tiles = plan
+    return imgsz * imgsz * tiles * tiles / 1e6
+
+
+def plan_dict(plan: Plan) -> Dict[str, Any]:
+    variant, imgsz, tiles = plan
+    return {"variant": variant, "imgsz": imgsz, "tiles": tiles}
+
+
+class LatencyModel:
+    """
+    在线延迟模型（每个模型变体: 延迟 ≈ a + b × 百万像素）
+
+    用指数衰减的加权最小二乘拟合，初始以先验延迟作为伪观测，
+    实测数据逐渐取代先验；同时跟踪残差方差以给出高分位预测。
+    """
+
+    def __init__(self, prior_latency: Dict[str, float], decay: float = 0.97, prior_weight: float = 2.0):
+        """
+        Args:
+            prior_latency: 各变体在640输入下的先验延迟（秒）
+            decay: 每次观测对历史统计量的衰减系数
+            prior_weight: 先验伪观测的权重
+        """
+        self.decay = decay
+        self._stats: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        for variant, latency in prior_latency.items():
+            # 先验: 固定开销约占10%，其余与像素量成正比
+            p640 = plan_megapixels((variant, 640, 1))
+            for p in (p640 / 4, p640):
+                self._update(variant, p, 0.1 * latency + 0.9 * latency * p / p640, prior_weight)
+
+    def observe(self, plan: Plan, latency: float):
+        """记录一次实测推理时间"""
+        with self._lock:
+            stats = self._stats.get(plan[0])
+            if stats is not None:
+                stats *= self.decay
+            self._update(plan[0], plan_megapixels(plan), latency, 1.0)
+
+    def _update(self, variant: str, x: float, y: float, weight: float):
+        # 充分统计量: [Σw, Σwx, Σwy, Σwxx, Σwxy, Σwyy]
+        stats = self._stats.setdefault(variant, np.zeros(6))
+        stats += weight * np.array([1.0, x, y, x * x, x * y, y * y])
+
+    def coefficients(self, variant: str) -> Optional[Tuple[float, float, float]]:
+        """返回 (a, b, 残差标准差)，未知变体返回None"""
+        with self._lock:
+            stats = self._stats.get(variant)
+            if stats is None:
+                return None
+            w, sx, sy, sxx, sxy, syy = stats
+        var_x = sxx / w - (sx / w) ** 2
+        b = (sxy / w - sx * sy / w / w) / var_x if var_x > 1e-12 else 0.0
+        b = max(b, 0.0)
+        a = sy / w - b * sx / w
+        # 残差平方和 = Σw(y - a - bx)^2
+        sse = syy - 2 * a * sy - 2 * b * sxy + a * a * w + 2 * a * b * sx + b * b * sxx
+        return float(a), float(b), math.sqrt(max(float(sse / w), 0.0))
+
+    def predict(self, plan: Plan, quantile_z: float = 1.28) -> Optional[float]:
+        """预测方案延迟的高分位值（默认约p90），未知变体返回None"""
+        coefficients = self.coefficients(plan[0])
+        if coefficients is None:
+            return None
+        a, b, sigma = coefficients
+        return max(a + b * plan_megapixels(plan), 0.0) + quantile_z * sigma
+
+
+class SLATracker:
+    """各分级的端到端延迟和SLA达成率"""
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self._tiers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, latency: float, budget: float):
+        with self._lock:
+            stats = self._tiers.setdefault(tier, {"requests": 0, "met": 0,
+                                                  "latencies": deque(maxlen=self.window)})
+            stats["requests"] += 1
+            stats["met"] += latency <= budget
+            stats["latencies"].append(latency)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for tier, stats in self._tiers.items():
+                p50, p95 = (float(v) for v in np.percentile(stats["latencies"], [50, 95]) * 1000)
+                report[tier] = {
+                    "requests": stats["requests"],
+                    "sla_attainment": stats["met"] / stats["requests"],
+                    "latency_ms": {"p50": round(p50, 2), "p95": round(p95, 2)}
+                }
+            return report
+
+
+class QualityPlanner:
+    """按分级/延迟预算选择检测方案"""
+
+    def __init__(self, tiers: Dict[str, Dict[str, Any]], prior_latency: Dict[str, float],
+                 default_tier: str = "balanced"):
+        """
+        Args:
+            tiers: {分级: {"budget": 默认延迟预算(秒), "plans": [按精度从低到高的方案]}}
+            prior_latency: 各变体在640输入下的先验延迟（秒）
+            default_tier: 分级和预算都未指定时使用的分级
+        """
+        self.tiers = {name: {"budget": float(options["budget"]),
+                             "plans": [tuple(plan) for plan in options["plans"]]}
+                      for name, options in tiers.items()}
+        self.default_tier = default_tier
+        self.latency_model = LatencyModel(prior_latency)
+        self.sla = SLATracker()
+
+    def resolve(self, tier: Optional[str], budget: Optional[float]) -> Tuple[str, float, List[Plan]]:
+        """
+        解析请求的分级和预算
+
+        只给出预算时在所有分级的方案中选择（按预测成本排序），标记为custom；
+        分级未知时抛出ValueError。
+        """
+        if tier is None and budget is not None:
+            plans = {plan for options in self.tiers.values() for plan in options["plans"]}
+            ordered = sorted(plans, key=lambda plan: self.latency_model.predict(plan, 0.0) or math.inf)
+            return "custom", float(budget), ordered
+        tier = tier or self.default_tier
+        if tier not in self.tiers:
+            raise ValueError(f"未知的质量分级: {tier}")
+        options = self.tiers[tier]
+        return tier, float(budget if budget is not None else options["budget"]), options["plans"]
+
+    def select(self, plans: Iterable[Plan], remaining: float, available: Iterable[str]) -> Optional[Plan]:
+        """
+        在剩余预算内选择精度最高的方案；都超出预算时退回最便宜的可用方案
+
+        Args:
+            plans: 按精度从低到高排列的候选方案
+            remaining: 扣除已用时间和预计排队时间后的剩余预算（秒）
+            available: 已加载的模型变体
+        Returns:
+            方案，无可用变体时返回None（仅传统检测）
+        """
+        available = set(available)
+        candidates = [plan for plan in plans if plan[0] in available]
+        if not candidates:
+            return None
+        chosen = candidates[0]
+        for plan in candidates:
+            predicted = self.latency_model.predict(plan)
+            if predicted is not None and predicted <= remaining:
+                chosen = plan
+        return chosen
+
+    def observe(self, plan: Plan, latency: float):
+        self.latency_model.observe(plan, latency)
+
+    def metrics(self, available: Iterable[str] = ()) -> Dict[str, Any]:
+        available = set(available)
+        variants = {plan[0] for options in self.tiers.values() for plan in options["plans"]}
+        model = {}
+        for variant in sorted(variants):
+            coefficients = self.latency_model.coefficients(variant)
+            if coefficients is not None:
+                a, b, sigma = coefficients
+                model[variant] = {"available": variant in available, "fixed_s": round(a, 4),
+                                  "per_megapixel_s": round(b, 4), "residual_std_s": round(sigma, 4)}
+        return {
+            "latency_model": model,
+            "tiers": {
+                name: {
+                    "budget": options["budget"],
+                    "plans": [dict(plan_dict(plan), predicted_s=round(self.latency_model.predict(plan) or 0.0, 4))
+                              for plan in options["plans"]]
+                }
+                for name, options in self.tiers.items()
+            },
+            "sla": self.sla.metrics()
+        }
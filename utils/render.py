@@ -0,0 +1,176 @@
+"""
+检测结果叠加渲染
+复用检测请求中已解码的图像（缓存显示分辨率副本），在显示分辨率下绘制检测框，
+按WebP/JPEG质量参数编码，渲染结果按结果ID缓存并提供ETag。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# 格式 -> (扩展名, 质量参数, MIME类型)
+RENDER_FORMATS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+}
+
+DEFAULT_COLOR = (255, 255, 255)
+METHOD_COLORS = {
+    "deep_learning": (0, 255, 0),
+    "traditional": (0, 165, 255),
+}
+
+
+def to_display(image: np.ndarray, max_width: int) -> Tuple[np.ndarray, float]:
+    """缩放到不超过max_width的显示分辨率，返回 (图像, 缩放系数)"""
+    width = image.shape[1]
+    if width <= max_width:
+        return image, 1.0
+    scale = max_width / width
+    height = max(1, int(round(image.shape[0] * scale)))
+    return cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA), scale
+
+
+def draw_overlays(frame: np.ndarray, boxes: np.ndarray, colors: Sequence[Tuple[int, int, int]],
+                  labels: Optional[Sequence[str]] = None, thickness: int = 2) -> np.ndarray:
+    """
+    在frame上原地绘制检测框
+
+    Args:
+        boxes: (N, 4) xyxy，已换算到frame坐标
+        colors: 每个框的BGR颜色；同色框合并为一次polylines调用
+        labels: 可选的每框标签文字
+    """
+    if len(boxes) == 0:
+        return frame
+    boxes = np.round(np.asarray(boxes, dtype=np.float32)).astype(np.int32)
+    x1, y1, x2, y2 = boxes.T
+    corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                        np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1)
+
+    by_color: Dict[Tuple[int, int, int], List[np.ndarray]] = {}
+    for corner, color in zip(corners, colors):
+        by_color.setdefault(tuple(color), []).append(corner.reshape(-1, 1, 2))
+    for color, polygons in by_color.items():
+        cv2.polylines(frame, polygons, True, color, thickness, cv2.LINE_8)
+
+    if labels is not None:
+        font_scale = max(0.35, frame.shape[1] / 1600)
+        for (bx, by), color, label in zip(boxes[:, :2], colors, labels):
+            cv2.putText(frame, label, (int(bx), max(int(by) - 4, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, tuple(color), 1, cv2.LINE_8)
+    return frame
+
+
+def encode_image(frame: np.ndarray, fmt: str = "webp", quality: int = 80) -> Tuple[bytes, str]:
+    """按格式和质量编码，返回 (字节, MIME类型)"""
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"不支持的渲染格式: {fmt}")
+    ext, quality_flag, media_type = RENDER_FORMATS[fmt]
+    success, encoded = cv2.imencode(ext, frame, [quality_flag, int(quality)])
+    if not success:
+        raise ValueError("无法编码渲染图像")
+    return encoded.tobytes(), media_type
+
+
+class OverlayRenderer:
+    """
+    检测叠加图渲染器
+
+    - 帧缓存: 检测时记录显示分辨率的解码帧（按帧ID，即内容哈希），渲染时无需重新解码
+    - 渲染缓存: 按ETag（结果ID+宽度+格式+质量）缓存编码后的字节，受字节预算约束
+    """
+
+    def __init__(self, max_width: int = 1080, frame_cache_size: int = 32,
+                 overlay_cache_bytes: int = 64 * 1024 * 1024):
+        self.max_width = max_width
+        self.frame_cache_size = frame_cache_size
+        self.overlay_cache_bytes = overlay_cache_bytes
+        self._frames = OrderedDict()
+        self._overlays = OrderedDict()
+        self._overlay_bytes = 0
+        self._lock = threading.Lock()
+
+    def remember_frame(self, frame_id: str, image: np.ndarray):
+        """记录检测请求已解码的图像（只保留显示分辨率副本）"""
+        display, scale = to_display(image, self.max_width)
+        if display is image:
+            display = image.copy()
+        with self._lock:
+            self._frames[frame_id] = (display, scale)
+            self._frames.move_to_end(frame_id)
+            while len(self._frames) > self.frame_cache_size:
+                self._frames.popitem(last=False)
+
+    def _get_frame(self, frame_id: str, loader: Callable[[], Optional[np.ndarray]]):
+        with self._lock:
+            cached = self._frames.get(frame_id)
+            if cached is not None:
+                self._frames.move_to_end(frame_id)
+                return cached
+        image = loader()
+        if image is None:
+            return None
+        self.remember_frame(frame_id, image)
+        with self._lock:
+            return self._frames[frame_id]
+
+    @staticmethod
+    def etag(result_id: str, width: int, fmt: str, quality: int, labels: bool) -> str:
+        """结果不可变，ETag可直接由渲染参数计算，无需先渲染"""
+        key = f"{result_id}|{width}|{fmt}|{quality}|{int(labels)}".encode()
+        return '"' + hashlib.sha1(key).hexdigest() + '"'
+
+    def render(self, result_id: str, frame_id: str, regions: List[Dict[str, Any]],
+               loader: Callable[[], Optional[np.ndarray]], width: int = 720, fmt: str = "webp",
+               quality: int = 80, labels: bool = True, bbox_format: str = "xywh") -> Tuple[bytes, str, str]:
+        """
+        渲染检测叠加图
+
+        Args:
+            result_id: 检测结果ID（缓存键的一部分）
+            frame_id: 原图帧ID
+            regions: 检测结果列表（bbox为原图坐标）
+            loader: 帧缓存未命中时解码原图的函数
+            bbox_format: xywh 或 xyxy
+
+        Returns:
+            (图像字节, MIME类型, ETag)
+        """
+        etag = self.etag(result_id, width, fmt, quality, labels)
+        with self._lock:
+            cached = self._overlays.get(etag)
+            if cached is not None:
+                self._overlays.move_to_end(etag)
+                return cached[0], cached[1], etag
+
+        frame = self._get_frame(frame_id, loader)
+        if frame is None:
+            raise ValueError("无法解码原始图像")
+        display, scale = frame
+        canvas, extra_scale = to_display(display, min(width, self.max_width))
+        canvas = canvas.copy() if canvas is display else canvas
+        scale *= extra_scale
+
+        boxes = np.array([r['bbox'] for r in regions], dtype=np.float32).reshape(-1, 4)
+        if bbox_format == "xywh":
+            boxes[:, 2:] += boxes[:, :2]
+        boxes *= scale
+        colors = [METHOD_COLORS.get(r.get('method'), DEFAULT_COLOR) for r in regions]
+        texts = [f"{r.get('class_name', r.get('method', ''))} {r.get('confidence', 0):.2f}"
+                 for r in regions] if labels else None
+        draw_overlays(canvas, boxes, colors, texts)
+
+        content, media_type = encode_image(canvas, fmt, quality)
+        with self._lock:
+            if etag not in self._overlays and len(content) <= self.overlay_cache_bytes:
+                self._overlays[etag] = (content, media_type)
+                self._overlay_bytes += len(content)
+                while self._overlay_bytes > self.overlay_cache_bytes:
+                    _, (old, _) = self._overlays.popitem(last=False)
+                    self._overlay_bytes -= len(old)
+        return content, media_type, etag
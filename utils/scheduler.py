@@ -0,0 +1,190 @@
+"""
+推理优先级通道调度
+交互式照片、后台视频帧、管理批处理分别排队，空闲推理槽按通道份额做加权公平调度
+（虚拟时间最小的非空通道优先）。长任务按批次逐个提交，每个批次结束即让出推理槽，
+实现批次边界的抢占：交互请求最多等待一个批次。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import INFERENCE_LANES
+
+# 每个通道保留的最近样本数（用于延迟分位数）
+METRICS_WINDOW = 2048
+
+
+class Lane:
+    """调度通道"""
+
+    def __init__(self, name: str, share: float, max_inflight: Optional[int] = None):
+        self.name = name
+        self.share = share
+        self.max_inflight = max_inflight
+        self.queue = deque()
+        self.inflight = 0
+        self.virtual_time = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_times = deque(maxlen=METRICS_WINDOW)
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "share": self.share,
+            "max_inflight": self.max_inflight,
+            "queue_depth": len(self.queue),
+            "inflight": self.inflight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms": _percentiles(self.wait_times),
+            "latency_ms": _percentiles(self.latencies)
+        }
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 95, 99]) * 1000
+    return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+
+
+class LaneScheduler:
+    """多通道加权公平推理调度器（固定数量的推理线程）"""
+
+    def __init__(self, lanes: Dict[str, Dict[str, Any]], slots: int = None):
+        self.lanes = {name: Lane(name, **options) for name, options in lanes.items()}
+        self.slots = slots
+        self.min_slots = 1
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def start(self, slots: int = None):
+        """启动推理线程（首次提交时自动调用；slots默认取线程预算的推理线程数）"""
+        with self._cond:
+            if self._threads:
+                return
+            if slots is not None:
+                self.slots = slots
+            if self.slots is None:
+                from .cpu_budget import thread_budget
+                self.slots = thread_budget.budget.executor_threads if thread_budget.budget else 1
+            self.slots = max(self.slots, self.min_slots)
+            for lane in self.lanes.values():
+                # max_inflight为负数时表示为其他通道保留的推理槽数
+                if lane.max_inflight is not None:
+                    limit = lane.max_inflight if lane.max_inflight > 0 else self.slots + lane.max_inflight
+                    lane.max_inflight = max(1, min(limit, self.slots))
+            for i in range(self.slots):
+                thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def require_slots(self, slots: int):
+        """
+        保证推理槽数不少于slots（如集成检测的成员数，成员才能真正并行）；
+        已启动时补充推理线程，已按槽数换算的通道并发上限不变
+        """
+        with self._cond:
+            self.min_slots = max(self.min_slots, slots)
+            if not self._threads or self.slots >= slots:
+                return
+            for i in range(self.slots, slots):
+                thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self.slots = slots
+
+    def submit(self, lane: str, func: Callable, *args, **kwargs) -> Future:
+        """提交一个任务（一个批次）到指定通道"""
+        if lane not in self.lanes:
+            raise ValueError(f"未知的调度通道: {lane}")
+        if not self._threads:
+            self.start()
+        future = Future()
+        with self._cond:
+            target = self.lanes[lane]
+            if not target.queue and target.inflight == 0:
+                # 通道从空闲变为活跃时不累积额度，避免长时间空闲后独占推理槽
+                active = [l.virtual_time for l in self.lanes.values() if l.queue or l.inflight]
+                if active:
+                    target.virtual_time = max(target.virtual_time, min(active))
+            target.queue.append((future, func, args, kwargs, time.perf_counter()))
+            target.submitted += 1
+            self._cond.notify()
+        return future
+
+    async def run(self, lane: str, func: Callable, *args, **kwargs) -> Any:
+        """在事件循环中等待任务完成"""
+        return await asyncio.wrap_future(self.submit(lane, func, *args, **kwargs))
+
+    async def run_batches(self, lane: str, func: Callable, batches: Iterable) -> List[Any]:
+        """
+        逐批执行长任务：每个批次单独排队，批次之间让出推理槽
+
+        Returns:
+            每个批次的结果
+        """
+        return [await self.run(lane, func, batch) for batch in batches]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "busy": sum(lane.inflight for lane in self.lanes.values()),
+                "lanes": {name: lane.metrics() for name, lane in self.lanes.items()}
+            }
+
+    def _next_lane(self) -> Optional[Lane]:
+        """选择虚拟时间最小且未达到并发上限的非空通道（调用方持有锁）"""
+        best = None
+        for lane in self.lanes.values():
+            if not lane.queue:
+                continue
+            if lane.max_inflight is not None and lane.inflight >= lane.max_inflight:
+                continue
+            if best is None or lane.virtual_time < best.virtual_time:
+                best = lane
+        return best
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                lane = self._next_lane()
+                while lane is None:
+                    self._cond.wait()
+                    lane = self._next_lane()
+                future, func, args, kwargs, enqueued = lane.queue.popleft()
+                lane.inflight += 1
+
+            started = time.perf_counter()
+            ok = True
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    ok = False
+                    future.set_exception(e)
+            finished = time.perf_counter()
+
+            with self._cond:
+                lane.inflight -= 1
+                # 按实际占用时间推进虚拟时间，份额越大推进越慢
+                lane.virtual_time += (finished - started) / lane.share
+                lane.completed += ok
+                lane.failed += not ok
+                lane.wait_times.append(started - enqueued)
+                lane.latencies.append(finished - enqueued)
+                self._cond.notify_all()
+
+
+# 全局推理调度器
+inference_scheduler = LaneScheduler(INFERENCE_LANES)
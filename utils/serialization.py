@@ -0,0 +1,88 @@
+"""
+检测结果的列式表示与快速序列化
+列式格式将逐框的字典列表转换为平行数组（框、置信度、类别等），
+按Accept头选择MessagePack或JSON（优先使用orjson）编码。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# 检测方法 -> 类别编号（列式格式中用整数代替重复的字符串）
+METHOD_IDS = {"deep_learning": 0, "traditional": 1}
+
+
+def to_columnar(teeth_regions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """将逐框字典列表转换为列式平行数组"""
+    count = len(teeth_regions)
+    columns = {
+        'count': count,
+        'boxes': np.array([r['bbox'] for r in teeth_regions], dtype=np.int32).reshape(count, 4),
+        'scores': np.fromiter((r['confidence'] for r in teeth_regions), dtype=np.float32, count=count),
+        'class_ids': np.fromiter((r.get('class_id', -1) for r in teeth_regions), dtype=np.int16, count=count),
+        'method_ids': np.fromiter((METHOD_IDS.get(r.get('method'), -1) for r in teeth_regions),
+                                  dtype=np.int8, count=count),
+        'areas': np.fromiter((r.get('area', 0) for r in teeth_regions), dtype=np.int32, count=count),
+        'method_names': list(METHOD_IDS)
+    }
+    # 掩码只存在于深度学习结果中，缺失的位置用None占位以保持列对齐
+    if any('mask' in r for r in teeth_regions):
+        columns['masks'] = [r.get('mask') for r in teeth_regions]
+    return columns
+
+
+def _to_builtin(value: Any) -> Any:
+    """将numpy数组/标量递归转换为Python内置类型（供不支持numpy的编码器使用）"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    return value
+
+
+def dumps_json(payload: Dict[str, Any]) -> bytes:
+    """JSON编码（orjson可用时直接序列化numpy数组）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_to_builtin(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(payload: Dict[str, Any]) -> bytes:
+    """MessagePack编码"""
+    if not MSGPACK_AVAILABLE:
+        raise RuntimeError("未安装msgpack")
+    return msgpack.packb(_to_builtin(payload), use_bin_type=True)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """根据Accept头判断客户端是否要求MessagePack"""
+    if not accept or not MSGPACK_AVAILABLE:
+        return False
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def encode_payload(payload: Dict[str, Any], accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """按Accept头编码响应，返回 (字节内容, 媒体类型)"""
+    if wants_msgpack(accept):
+        return dumps_msgpack(payload), MSGPACK_MEDIA_TYPES[0]
+    return dumps_json(payload), JSON_MEDIA_TYPE
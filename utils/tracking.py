@@ -0,0 +1,92 @@
+"""
+检测框跟踪
+按IoU贪心匹配相邻帧的检测框，为每个框分配跨帧稳定的track_id；
+另提供检测结果之间的IoU匹配F1，用于评估跳帧/级联等近似方法对精度的影响。
+框格式与teeth_detection_api一致: bbox = [x, y, w, h]。
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def _xywh_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组xywh框的IoU矩阵"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[:, None, 2] * a[:, None, 3] + b[None, :, 2] * b[None, :, 3] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def greedy_match(a: List[Dict], b: List[Dict], iou_threshold: float) -> List[Tuple[int, int]]:
+    """按IoU从高到低贪心匹配两组检测框，返回 [(a下标, b下标)]"""
+    if not a or not b:
+        return []
+    iou = _xywh_iou(np.array([r['bbox'] for r in a], dtype=np.float64),
+                    np.array([r['bbox'] for r in b], dtype=np.float64))
+    rows, cols = np.nonzero(iou >= iou_threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_a, used_b, pairs = set(), set(), []
+    for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+            pairs.append((i, j))
+    return pairs
+
+
+def detection_f1(regions: List[Dict], reference: List[Dict], iou_threshold: float = 0.5) -> float:
+    """相对参照结果的F1（两者都为空时为1）"""
+    if not regions and not reference:
+        return 1.0
+    matched = len(greedy_match(regions, reference, iou_threshold))
+    return 2 * matched / (len(regions) + len(reference))
+
+
+def shift_regions(regions: List[Dict], dx: float, dy: float) -> List[Dict]:
+    """按估计的画面位移平移检测框（返回新的区域列表，不含掩码）"""
+    shifted = []
+    for region in regions:
+        x, y, w, h = region['bbox']
+        moved = {key: value for key, value in region.items() if key != 'mask'}
+        moved['bbox'] = [int(round(x + dx)), int(round(y + dy)), w, h]
+        shifted.append(moved)
+    return shifted
+
+
+class IoUTracker:
+    """IoU贪心匹配跟踪器"""
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 2):
+        """
+        Args:
+            iou_threshold: 与上一帧轨迹匹配所需的最小IoU
+            max_age: 轨迹连续未匹配多少帧后丢弃
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._tracks: List[Dict] = []
+        self._next_id = 0
+
+    def update(self, regions: List[Dict]) -> List[Dict]:
+        """为当前帧的检测框分配track_id（原地写入并返回regions）"""
+        pairs = greedy_match(regions, self._tracks, self.iou_threshold)
+        matched = dict(pairs)
+        for i, region in enumerate(regions):
+            if i in matched:
+                track = self._tracks[matched[i]]
+            else:
+                track = {'track_id': self._next_id}
+                self._next_id += 1
+                self._tracks.append(track)
+            track.update(bbox=region['bbox'], age=0)
+            region['track_id'] = track['track_id']
+        seen = {region['track_id'] for region in regions}
+        for track in self._tracks:
+            if track['track_id'] not in seen:
+                track['age'] += 1
+        self._tracks = [track for track in self._tracks if track['age'] <= self.max_age]
+        return regions
@@ -0,0 +1,99 @@
+"""
+模型懒加载与后台预热
+服务启动时只注册预热任务，重型依赖（ultralytics/torch/xgboost）和模型加载
+在后台线程中完成，并用代表性尺寸的输入跑一遍推理以完成算子初始化。
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 进程启动基准时间（入口模块应尽早导入本模块，以获得准确的导入耗时）
+PROCESS_START = time.perf_counter()
+
+
+class WarmupManager:
+    """后台预热管理器"""
+
+    def __init__(self):
+        self._tasks: List[Tuple[str, Callable[[], None]]] = []
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.import_time: Optional[float] = None
+        self.warmup_time: Optional[float] = None
+        self.first_inference_time: Optional[float] = None
+        self.task_timings: Dict[str, float] = {}
+        self.task_errors: Dict[str, str] = {}
+
+    def register(self, name: str, task: Callable[[], None]):
+        """注册预热任务（按注册顺序执行）"""
+        self._tasks.append((name, task))
+
+    def mark_imported(self):
+        """记录应用模块导入完成的时间点"""
+        self.import_time = time.perf_counter() - PROCESS_START
+
+    def mark_first_inference(self):
+        """记录第一次真实推理完成的时间点（仅记录一次）"""
+        if self.first_inference_time is not None:
+            return
+        with self._lock:
+            if self.first_inference_time is None:
+                self.first_inference_time = time.perf_counter() - PROCESS_START
+
+    def start(self):
+        """在后台线程中启动预热"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+
+    def skip(self):
+        """跳过预热直接标记就绪（模型将在首次请求时懒加载）"""
+        self.warmup_time = 0.0
+        self._ready.set()
+
+    def _run(self):
+        start_time = time.perf_counter()
+        for name, task in self._tasks:
+            task_start = time.perf_counter()
+            try:
+                task()
+                print(f"✅ 预热完成: {name}")
+            except Exception as e:
+                # 单个模型预热失败不阻塞服务就绪，由各检测器自行降级
+                self.task_errors[name] = str(e)
+                print(f"❌ 预热失败: {name}: {e}")
+            self.task_timings[name] = time.perf_counter() - task_start
+        self.warmup_time = time.perf_counter() - start_time
+        self._ready.set()
+
+    def is_ready(self) -> bool:
+        """预热是否已完成"""
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """阻塞等待预热完成"""
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict:
+        """返回预热状态与启动耗时统计"""
+        return {
+            "ready": self.is_ready(),
+            "import_time": self.import_time,
+            "warmup_time": self.warmup_time,
+            "first_inference_time": self.first_inference_time,
+            "tasks": {
+                name: {
+                    "time": self.task_timings.get(name),
+                    "error": self.task_errors.get(name)
+                }
+                for name, _ in self._tasks
+            }
+        }
+
+
+# 全局预热管理器实例
+warmup_manager = WarmupManager()